@@ -18,4 +18,43 @@
 # limitations under the License.
 #
 
-from typecode.contenttype import get_type
+import importlib
+
+"""
+The public functions are imported from their module on first use and the
+libraries used for detection are loaded on first use too, such that
+``import typecode`` is fast. Call ``typecode.warmup()`` to load these upfront.
+"""
+
+# {public name: module name} of the functions imported on first use
+LAZY_IMPORTS = {
+    "get_type": "typecode.contenttype",
+    "get_types": "typecode.batch",
+    "scan_tree": "typecode.batch",
+}
+
+
+def __getattr__(name):
+    module_name = LAZY_IMPORTS.get(name)
+    if not module_name:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    value = getattr(importlib.import_module(module_name), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_IMPORTS))
+
+
+def warmup():
+    """
+    Import the typecode modules and load the libraries used for detection that
+    are otherwise loaded on first use: libmagic and its magic database,
+    pdfminer, binaryornot, extractcode and the Pygments lexers index. Call this
+    once in long-lived processes, for instance before forking worker processes
+    such that these share this loaded state.
+    """
+    from typecode import contenttype
+
+    contenttype.warmup()
@@ -0,0 +1,170 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import asyncio
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from typecode import contenttype
+from typecode import magic2
+from typecode.batch import check_attributes
+from typecode.batch import get_type_mapping
+
+"""
+Detect file types from asyncio code without blocking the event loop.
+
+The blocking work (file reads, libmagic, Pygments and pdfminer) runs in a
+bounded pool of threads shared by all the callers of a process. libmagic
+releases the GIL and each thread uses its own libmagic detectors.
+"""
+
+# Maximum number of threads of the shared executor
+MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Default maximum number of detections running at once in a get_types() call
+MAX_CONCURRENCY = MAX_WORKERS * 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """
+    Return the ThreadPoolExecutor shared by the asyncio detection functions,
+    creating it if needed.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_WORKERS,
+                thread_name_prefix="typecode",
+            )
+        return _executor
+
+
+def shutdown_executor(wait=True):
+    """
+    Shutdown the shared executor. A new one is created on the next use.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def get_computed_type(location, attributes=None, profile=None):
+    """
+    Return a contenttype.Type for `location` with its `attributes` (or all
+    its exportable attributes) already computed, using the libmagic Profile
+    named `profile` if provided.
+    """
+    with magic2.profile_scope(profile):
+        T = contenttype.get_type(location)
+        T.to_dict(attributes=attributes)
+    return T
+
+
+async def run_in_executor(func, *args, executor=None, limiter=None):
+    """
+    Run the blocking `func` callable with `args` in `executor` or the shared
+    executor and return its result. Acquire the `limiter` asyncio.Semaphore
+    first if provided. If the calling task is cancelled before `func` started,
+    `func` is not run.
+    """
+    executor = executor or get_executor()
+    loop = asyncio.get_running_loop()
+    if limiter is None:
+        return await loop.run_in_executor(executor, func, *args)
+    async with limiter:
+        return await loop.run_in_executor(executor, func, *args)
+
+
+async def get_type(location, attributes=None, executor=None, limiter=None, profile=None):
+    """
+    Return a contenttype.Type for `location` with its `attributes` list of
+    attribute names (or all the exportable attributes) already computed such
+    that accessing them does not block. Raise the same exceptions as
+    contenttype.get_type(), such as an IOError for a missing location.
+
+    Use the `executor` ThreadPoolExecutor or the shared executor. If provided,
+    acquire the `limiter` asyncio.Semaphore to cap the number of concurrent
+    detections across calls. Use the libmagic Profile named `profile` or the
+    current Profile of the calling thread.
+    """
+    attributes = check_attributes(attributes)
+    profile = magic2.get_profile(profile).name
+    return await run_in_executor(
+        get_computed_type,
+        location,
+        attributes,
+        profile,
+        executor=executor,
+        limiter=limiter,
+    )
+
+
+async def get_types(
+    locations,
+    attributes=None,
+    include_date=True,
+    ordered=True,
+    concurrency=MAX_CONCURRENCY,
+    executor=None,
+    profile=None,
+):
+    """
+    Asynchronously yield tuples of (location, mapping of Type attributes) for
+    each of the `locations` iterable of file paths. The mapping is None if the
+    type of a location cannot be detected. See batch.get_types() for the
+    `attributes`, `include_date` and `profile` arguments.
+
+    Run at most `concurrency` detections at once in the `executor` or the
+    shared executor. Results are yielded in the `locations` order if `ordered`
+    is True or as soon as they are available otherwise. Locations are consumed
+    lazily. If the consuming task is cancelled or stops iterating, the
+    detections not yet started are cancelled.
+    """
+    attributes = check_attributes(attributes)
+    profile = magic2.get_profile(profile).name
+    executor = executor or get_executor()
+    concurrency = max(1, concurrency or 1)
+    loop = asyncio.get_running_loop()
+
+    pending = deque()
+
+    async def next_results():
+        if ordered:
+            future = pending.popleft()
+            return [await future]
+        done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+        return [future.result() for future in done]
+
+    def detect(location):
+        with magic2.profile_scope(profile):
+            return location, get_type_mapping(location, attributes, include_date)
+
+    try:
+        for location in locations:
+            pending.append(loop.run_in_executor(executor, detect, location))
+            if len(pending) >= concurrency:
+                for result in await next_results():
+                    yield result
+
+        while pending:
+            for result in await next_results():
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
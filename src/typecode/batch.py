@@ -0,0 +1,356 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import wait
+from itertools import islice
+import os
+
+from typecode import magic2
+from typecode.cache import get_cache
+from typecode.contenttype import get_type
+from typecode.dedup import get_content_index
+from typecode.contenttype import Type
+
+"""
+Detect the types of many files or of a whole directory tree at once,
+optionally using a pool of worker processes or threads.
+"""
+
+# Tracing flag
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+# Number of locations sent at once to a worker process
+CHUNK_SIZE = 64
+
+
+def get_types(
+    locations,
+    workers=0,
+    attributes=None,
+    include_date=True,
+    ordered=True,
+    chunk_size=CHUNK_SIZE,
+    use_threads=False,
+    cache_location=None,
+    dedup=False,
+    profile=None,
+):
+    """
+    Yield tuples of (location, mapping of Type attributes) for each of the
+    `locations` iterable of file paths. The mapping is None if the type of a
+    location cannot be detected, such as for a missing file.
+
+    Only compute and return the `attributes` list of Type attribute names if
+    provided, or all the Type.exportable_attributes otherwise. Skip the date
+    if `include_date` is False.
+
+    If `workers` is zero, detect types in the current process. Otherwise, use
+    a pool of `workers` processes (or threads if `use_threads` is True), each
+    receiving chunks of `chunk_size` locations. Each thread uses its own
+    libmagic detectors and libmagic runs without holding the GIL. Results are
+    yielded in the `locations` order if `ordered` is True or as soon as they
+    are available otherwise. Locations are consumed lazily such that only a
+    few chunks per worker are pending at any time.
+
+    If `cache_location` is provided, use the persistent SQLite DetectionCache
+    stored at this location to avoid detecting again the types of files that
+    did not change since they were cached.
+
+    If `dedup` is True, compute the content-derived attributes only once for
+    files with identical content (in each worker).
+
+    If `profile` is provided, use the libmagic detection Profile with this
+    name, such as "full", "bounded" or "fast" (see typecode.magic2.PROFILES),
+    instead of the current Profile. This Profile is used only for the
+    detections of this call: other threads and callers are not affected.
+    """
+    items = ((location, None) for location in locations)
+    return get_mappings(
+        items=items,
+        workers=workers,
+        attributes=attributes,
+        include_date=include_date,
+        ordered=ordered,
+        chunk_size=chunk_size,
+        use_threads=use_threads,
+        cache_location=cache_location,
+        dedup=dedup,
+        profile=profile,
+    )
+
+
+def scan_tree(
+    root,
+    workers=0,
+    attributes=None,
+    include_date=True,
+    follow_symlinks=False,
+    ordered=True,
+    chunk_size=CHUNK_SIZE,
+    use_threads=False,
+    cache_location=None,
+    dedup=False,
+    profile=None,
+):
+    """
+    Yield tuples of (location, mapping of Type attributes) for each file,
+    directory, symlink or special file in the directory tree at `root`
+    (excluding `root` itself). The tree is walked with os.scandir() and the
+    cached stat data of each directory entry is reused to create its Type.
+    Files are yielded incrementally as the tree is walked. Directory entries
+    are sorted by name.
+
+    Symlinks to directories are not walked unless `follow_symlinks` is True,
+    in which case symlink loops are detected and each directory is walked
+    only once.
+
+    See get_types() for the other arguments.
+    """
+    items = walk_tree(root, follow_symlinks=follow_symlinks)
+    return get_mappings(
+        items=items,
+        workers=workers,
+        attributes=attributes,
+        include_date=include_date,
+        ordered=ordered,
+        chunk_size=chunk_size,
+        use_threads=use_threads,
+        cache_location=cache_location,
+        dedup=dedup,
+        profile=profile,
+    )
+
+
+def walk_tree(root, follow_symlinks=False):
+    """
+    Yield tuples of (location, os.lstat() result) for each entry of the
+    directory tree at `root` in a depth-first pre-order, with the entries of
+    each directory sorted by name.
+    """
+    try:
+        st = os.stat(root)
+    except OSError:
+        return
+
+    # (device, inode) of the directories already walked to detect loops
+    visited = {(st.st_dev, st.st_ino)}
+
+    # a stack of iterators on the sorted entries of the directories being walked
+    stack = [iter(list_dir(root))]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+
+        try:
+            stat_result = entry.stat(follow_symlinks=False)
+            is_dir = entry.is_dir(follow_symlinks=follow_symlinks)
+            if is_dir:
+                target_stat = entry.stat(follow_symlinks=follow_symlinks)
+        except OSError as e:
+            if TRACE:
+                logger_debug("walk_tree: cannot stat:", entry.path, e)
+            continue
+
+        yield entry.path, stat_result
+
+        if is_dir:
+            key = target_stat.st_dev, target_stat.st_ino
+            if key not in visited:
+                visited.add(key)
+                stack.append(iter(list_dir(entry.path)))
+
+
+def list_dir(location):
+    """
+    Return a list of os.DirEntry for the directory at `location` sorted by
+    name or an empty list if this directory cannot be read.
+    """
+    try:
+        with os.scandir(location) as entries:
+            return sorted(entries, key=lambda e: e.name)
+    except OSError as e:
+        if TRACE:
+            logger_debug("list_dir: cannot list:", location, e)
+        return []
+
+
+def get_mappings(
+    items,
+    workers=0,
+    attributes=None,
+    include_date=True,
+    ordered=True,
+    chunk_size=CHUNK_SIZE,
+    use_threads=False,
+    cache_location=None,
+    dedup=False,
+    profile=None,
+):
+    """
+    Yield tuples of (location, mapping of Type attributes) for each of the
+    `items` iterable of (location, os.lstat() result or None) tuples. See
+    get_types() for the other arguments.
+    """
+    attributes = check_attributes(attributes)
+    profile = magic2.get_profile(profile).name
+    if not workers or workers <= 0:
+        try:
+            for location, stat_result in items:
+                # only use the profile while detecting, not while suspended
+                with magic2.profile_scope(profile):
+                    mapping = get_type_mapping(
+                        location, attributes, include_date, cache_location, dedup, stat_result
+                    )
+                yield location, mapping
+        finally:
+            if cache_location:
+                get_cache(cache_location, profile=profile).flush()
+        return
+
+    chunks = iter_chunks(items, chunk_size)
+    max_pending = workers * 2
+
+    executor_class = use_threads and ThreadPoolExecutor or ProcessPoolExecutor
+    with executor_class(max_workers=workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            future = executor.submit(
+                get_types_chunk, chunk, attributes, include_date, cache_location, dedup, profile
+            )
+            pending.append(future)
+            if len(pending) >= max_pending:
+                yield from next_results(pending, ordered)
+
+        while pending:
+            yield from next_results(pending, ordered)
+
+
+def next_results(pending, ordered=True):
+    """
+    Yield the results of the next done futures removed from a `pending` deque
+    of futures: the oldest if `ordered` or the first completed ones otherwise.
+    """
+    if ordered:
+        yield from pending.popleft().result()
+    else:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield from future.result()
+
+
+def check_attributes(attributes):
+    """
+    Return a list of Type attribute names from an `attributes` list or all
+    the exportable attributes if empty. Raise a ValueError on unknown names.
+    """
+    if not attributes:
+        return None
+    attributes = list(attributes)
+    Type.get_attributes_closure(attributes)
+    return attributes
+
+
+def iter_chunks(iterable, chunk_size=CHUNK_SIZE):
+    """
+    Yield lists of up to `chunk_size` items from an `iterable`.
+    """
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def get_types_chunk(
+    items,
+    attributes=None,
+    include_date=True,
+    cache_location=None,
+    dedup=False,
+    profile=None,
+):
+    """
+    Return a list of (location, mapping) for a list of (location, os.lstat()
+    result or None) `items`, detected with the libmagic Profile named
+    `profile` if provided. This runs in a worker process or thread.
+    """
+    with magic2.profile_scope(profile):
+        results = [
+            (
+                location,
+                get_type_mapping(
+                    location, attributes, include_date, cache_location, dedup, stat_result
+                ),
+            )
+            for location, stat_result in items
+        ]
+        if cache_location:
+            # worker processes do not write the pending cache entries on exit
+            get_cache(cache_location).flush()
+    return results
+
+
+def get_type_mapping(
+    location,
+    attributes=None,
+    include_date=True,
+    cache_location=None,
+    dedup=False,
+    stat_result=None,
+):
+    """
+    Return a mapping of Type `attributes` for `location` or None if the type
+    cannot be detected. Use the DetectionCache at `cache_location` if provided.
+    Share content-derived attributes between identical files if `dedup` is True.
+    Use the optional os.lstat() `stat_result` for `location` if available.
+    """
+    try:
+        if cache_location:
+            cache = get_cache(cache_location)
+            return cache.get_type_mapping(
+                location, attributes, include_date, dedup, stat_result=stat_result
+            )
+
+        if dedup:
+            index = get_content_index()
+            return index.get_type_mapping(
+                location, attributes, include_date, stat_result=stat_result
+            )
+
+        T = get_type(location, stat_result=stat_result)
+        return T.to_dict(include_date=include_date, attributes=attributes)
+    except Exception as e:
+        if TRACE:
+            logger_debug("get_type_mapping: failed for:", location, e)
+        return None
@@ -0,0 +1,281 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import stat
+import threading
+
+from typecode import contenttype
+from typecode import magic2
+from typecode.contenttype import get_type
+from typecode.contenttype import Type
+from typecode.dedup import get_content_index
+
+"""
+A persistent SQLite cache of the exportable attributes of contenttype.Type
+objects, such that files that have not changed between two scans are answered
+from the cache with a single stat.
+
+Cached entries are keyed by libmagic detection profile and path and validated
+against the file device, inode, size and modification time. The entries of a
+profile are invalidated when the libmagic version, the magic database checksum
+or the use of the signatures engine change.
+
+New entries are written in batches of COMMIT_BATCH_SIZE entries in a single
+transaction, and when the cache is flushed or closed.
+"""
+
+# Bump this when the cached data format or the detection logic changes
+CACHE_SCHEMA_VERSION = "1"
+
+# Number of new cached entries written to the database in a single transaction
+COMMIT_BATCH_SIZE = 500
+
+
+def get_magicdb_checksum(location=None):
+    """
+    Return a SHA1 checksum of the magic database file at `location` or of the
+    magic database of the current libmagic profile, or an empty string if
+    there is no such file.
+    """
+    location = location or magic2.get_profile().get_magicdb_location()
+    if not location or not os.path.isfile(location):
+        return ""
+    sha1 = hashlib.sha1()
+    with open(location, "rb") as mdb:
+        for chunk in iter(lambda: mdb.read(1024 * 1024), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def get_cache_stamp():
+    """
+    Return a string identifying the detection setup that produced cached data.
+    """
+    return ":".join(
+        [
+            CACHE_SCHEMA_VERSION,
+            str(magic2.libmagic_version()),
+            get_magicdb_checksum(),
+            magic2.get_profile().name,
+            contenttype.USE_SIGNATURES and "signatures" or "libmagic",
+        ]
+    )
+
+
+def get_cache_key(location, stat_result=None):
+    """
+    Return a (device, inode, size, mtime_ns) tuple for the file at `location`
+    or None if this file cannot be cached, such as for a symlink whose target
+    could change without the link changing. Use the optional os.lstat()
+    `stat_result` for `location` if available.
+    """
+    st = stat_result
+    if st is None:
+        try:
+            st = os.lstat(location)
+        except OSError:
+            return
+    if not stat.S_ISREG(st.st_mode):
+        return
+    return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class DetectionCache(object):
+    """
+    A persistent cache of Type attribute mappings detected with the libmagic
+    profile named `profile` (or the current profile) stored in an SQLite
+    database at `location`. It can be shared by multiple threads and
+    processes, and the caches of several profiles can share a database.
+    """
+
+    def __init__(self, location, stamp=None, profile=None):
+        self.location = location
+        self.profile = profile or magic2.get_profile().name
+        with magic2.profile_scope(self.profile):
+            self.stamp = stamp or get_cache_stamp()
+        self.hits = 0
+        self.misses = 0
+        # {path: (device, inode, size, mtime_ns, data)} of entries not written yet
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(location, timeout=60, check_same_thread=False)
+        self._setup()
+
+    def __repr__(self):
+        return "DetectionCache(location=%r, profile=%r, hits=%r, misses=%r)" % (
+            self.location,
+            self.profile,
+            self.hits,
+            self.misses,
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _setup(self):
+        """
+        Create the cache tables if needed and clear the entries of this cache
+        profile if its stamp does not match.
+        """
+        stamp_key = "stamp:" + self.profile
+        with self._lock, self.conn as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS types ("
+                "profile TEXT, "
+                "path TEXT, "
+                "device INTEGER, "
+                "inode INTEGER, "
+                "size INTEGER, "
+                "mtime_ns INTEGER, "
+                "data TEXT, "
+                "PRIMARY KEY (profile, path))"
+            )
+            row = conn.execute("SELECT value FROM metadata WHERE key = ?", (stamp_key,)).fetchone()
+            if not row or row[0] != self.stamp:
+                conn.execute("DELETE FROM types WHERE profile = ?", (self.profile,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)",
+                    (stamp_key, self.stamp),
+                )
+
+    def close(self):
+        if self.conn:
+            self.flush()
+            self.conn.close()
+            self.conn = None
+
+    def flush(self):
+        """
+        Write the pending new entries to the database.
+        """
+        with self._lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        """
+        Write the pending new entries in a single transaction. The caller must
+        hold the lock.
+        """
+        if not self._pending or not self.conn:
+            return
+        with self.conn as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO types "
+                "(profile, path, device, inode, size, mtime_ns, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(self.profile, path) + row for path, row in self._pending.items()],
+            )
+        self._pending.clear()
+
+    def get(self, location, key=None):
+        """
+        Return a cached mapping of Type attributes for the file at `location`
+        or None if not cached or if the file changed since it was cached. Use
+        the `key` tuple as returned by get_cache_key() if provided.
+        """
+        key = key or get_cache_key(location)
+        if not key:
+            return
+        with self._lock:
+            row = self._pending.get(location)
+            if not row:
+                row = self.conn.execute(
+                    "SELECT device, inode, size, mtime_ns, data FROM types "
+                    "WHERE profile = ? AND path = ?",
+                    (self.profile, location),
+                ).fetchone()
+        if not row or tuple(row[:4]) != key:
+            self.misses += 1
+            return
+        self.hits += 1
+        return json.loads(row[4])
+
+    def put(self, location, mapping, key=None):
+        """
+        Cache the `mapping` of Type attributes for the file at `location`. Use
+        the `key` tuple as returned by get_cache_key() if provided. The entry
+        is written to the database with the next batch of new entries.
+        """
+        key = key or get_cache_key(location)
+        if not key:
+            return
+        with self._lock:
+            self._pending[location] = tuple(key) + (json.dumps(mapping),)
+            if len(self._pending) >= COMMIT_BATCH_SIZE:
+                self._write_pending()
+
+    def clear(self):
+        with self._lock, self.conn as conn:
+            self._pending.clear()
+            conn.execute("DELETE FROM types WHERE profile = ?", (self.profile,))
+
+    def get_type_mapping(
+        self,
+        location,
+        attributes=None,
+        include_date=True,
+        dedup=False,
+        stat_result=None,
+    ):
+        """
+        Return a mapping of Type `attributes` (or all exportable attributes)
+        for the file at `location` from the cache or computed with the profile
+        of this cache and cached.
+        Share content-derived attributes between identical files if `dedup` is
+        True. Use the optional os.lstat() `stat_result` for `location` if
+        available. Raise an IOError if the location does not exists.
+        """
+        location = os.path.abspath(location)
+        key = get_cache_key(location, stat_result)
+        mapping = self.get(location, key=key)
+        if mapping is None:
+            with magic2.profile_scope(self.profile):
+                if dedup:
+                    index = get_content_index()
+                    mapping = index.get_type_mapping(location, stat_result=stat_result)
+                else:
+                    T = get_type(location, stat_result=stat_result)
+                    mapping = T.to_dict(include_date=True)
+            self.put(location, mapping, key=key)
+
+        if attributes:
+            mapping = {name: mapping[name] for name in attributes}
+        if not include_date:
+            for name in Type.date_attributes:
+                mapping.pop(name, None)
+        return mapping
+
+
+def get_cache(location, profile=None, _caches={}):
+    """
+    Return a DetectionCache for the SQLite database at `location`, shared by
+    all the callers of the current process and libmagic profile named
+    `profile` (or the current profile of this thread). SQLite
+    connections must not be shared across a fork, so a forked worker process
+    gets its own cache. Its pending entries are written when the process
+    exits, except in worker processes that must flush it explicitly.
+    """
+    profile = magic2.get_profile(profile).name
+    key = location, os.getpid(), profile
+    try:
+        return _caches[key]
+    except KeyError:
+        cache = _caches[key] = DetectionCache(location, profile=profile)
+        atexit.register(cache.close)
+        return cache
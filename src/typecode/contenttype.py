@@ -7,33 +7,34 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from collections import OrderedDict
+from datetime import datetime
+from datetime import timezone
+import codecs
 import contextlib
+import functools
 import io
+import locale
 import os
+import re
+import stat
+import threading
 
 import attr
-from binaryornot.helpers import get_starting_chunk
-from binaryornot.helpers import is_binary_string
-from pdfminer.pdfparser import PDFParser
-from pdfminer.pdfdocument import PDFDocument
-from pdfminer.pdfparser import PDFSyntaxError
-from pdfminer.psparser import PSSyntaxError
-from pdfminer.pdfdocument import PDFEncryptionError
-from pdfminer.pdftypes import PDFException
 
 from commoncode import filetype
 from commoncode import fileutils
+from commoncode.system import on_posix
 from commoncode.datautils import Boolean
 from commoncode.datautils import List
 from commoncode.datautils import String
-from commoncode import text
 from typecode import entropy
+from typecode import elf
 from typecode import extractible
 from typecode import magic2
 from typecode import mimetypes
-from typecode.pygments_lexers import ClassNotFound as LexerClassNotFound
-from typecode.pygments_lexers import get_lexer_for_filename
-from typecode.pygments_lexers import guess_lexer
+from typecode import pe
+from typecode import signatures
 
 """
 Utilities to detect and report the type of a file or path based on its name,
@@ -103,24 +104,384 @@ MAKEFILE_EXTENSIONS = (
     "Makefile.inc",
 )
 
-# Global registry of Type objects, keyed by location
-# FIXME: can this be a memory hog for very large scans?
-_registry = {}
+# Files with these extensions are always considered as binaries
+BINARY_EXTENSIONS = (
+    ".pyc",
+    ".pgm",
+    ".mp3",
+    ".mp4",
+    ".mpeg",
+    ".mpg",
+    ".emf",
+    ".pgm",
+    ".pbm",
+    ".ppm",
+)
+
+# Number of bytes read once from the start of a file and shared by all the
+# content detectors of a Type: binary check, entropy, Pygments content guess,
+# libmagic (for files that fit entirely in this size) and pdfminer.
+HEAD_SIZE = 16 * 1024
+
+# Number of bytes used to compute the entropy of a file
+ENTROPY_SIZE = 5000
+
+# Number of characters used for Pygments content-based lexer guessing
+TEXT_START_SIZE = 4096
+
+# libmagic cannot use the end of the file when fed a buffer: for these it must
+# read the file itself. For instance the gzip original size is stored in the
+# last bytes of a gzip file and the ELF sections are read by seeking the file.
+MAGIC_BUFFER_EXCLUDED_HEADS = (b"\x1f\x8b", elf.ELF_MAGIC)
+
+# Set this environment variable to "yes" to recognize a few common formats with
+# the typecode.signatures engine and skip the libmagic calls for these files.
+TYPECODE_USE_SIGNATURES_ENVVAR = "TYPECODE_USE_SIGNATURES"
+USE_SIGNATURES = os.environ.get(TYPECODE_USE_SIGNATURES_ENVVAR, "").lower() in ("yes", "true", "1")
+
+
+# Keywords found in lowercased libmagic filetypes, mapped to the names of the
+# FiletypeFlags flags they set
+FILETYPE_KEYWORDS = {
+    "data": ("has_data",),
+    "long lines": ("has_long_lines",),
+    "archive": ("has_archive",),
+    "(zip)": ("has_zip",),
+    "compressed": ("has_compressed",),
+    "squashfs filesystem": ("has_compressed", "is_filesystem"),
+    "debian binary package": ("is_debian_package",),
+    "script": ("has_script",),
+    "makefile": ("has_makefile",),
+    "for ms windows": ("is_winexe",),
+    "not stripped": ("is_not_stripped",),
+    # media
+    "image data": ("is_media",),
+    "graphics image": ("is_media",),
+    "ms-windows metafont .wmf": ("is_media",),
+    "windows enhanced metafile": ("is_media",),
+    "png image": ("is_media",),
+    "interleaved image": ("is_media",),
+    "microsoft asf": ("is_media",),
+    "image text": ("is_media",),
+    "photoshop image": ("is_media",),
+    "shop pro image": ("is_media",),
+    "ogg data": ("is_media",),
+    "vorbis": ("is_media",),
+    "mpeg": ("is_media",),
+    "theora": ("is_media",),
+    "bitmap": ("is_media",),
+    "audio": ("is_media",),
+    "video": ("is_media",),
+    "sound": ("is_media",),
+    "riff": ("is_media",),
+    "icon": ("is_media",),
+    "pc bitmap": ("is_media",),
+    "netpbm": ("is_media",),
+}
+
+# Keywords found in libmagic mimetypes of media files
+MEDIA_MIMETYPE_KEYWORDS = (
+    "image",
+    "picture",
+    "audio",
+    "video",
+    "graphic",
+    "sound",
+)
+
+# Filetype prefixes of media files that are known to not contain text metadata
+MEDIA_WITHOUT_META_PREFIXES = (
+    "gif image",
+    "png image",
+    "jpeg image",
+    "netpbm",
+    "mpeg",
+)
+
+# Maximum number of distinct libmagic filetype and mimetype strings memoized
+CLASSIFIER_CACHE_SIZE = 16 * 1024
+
+# Number of bytes read from the end of a PDF to find its trailer
+PDF_TAIL_SIZE = 16 * 1024
+
+# pdfminer scans a whole PDF to rebuild its cross-reference table if it is
+# broken: only do this for PDFs up to this size
+PDF_FALLBACK_MAX_SIZE = 32 * 1024 * 1024
+
+
+def build_keywords_matcher(keywords):
+    """
+    Return a tuple of (compiled regex, {keyword: flags}) to find all the
+    `keywords` {keyword: flags} in a string at once, including overlapping
+    keywords. A keyword that is the prefix of another keyword has its flags
+    added to this longer keyword as they may start at the same position.
+    """
+    flags_by_keyword = {}
+    for keyword in keywords:
+        flags = set()
+        for other, other_flags in keywords.items():
+            if keyword.startswith(other):
+                flags.update(other_flags)
+        flags_by_keyword[keyword] = frozenset(flags)
+    # longest first such that the longest keyword at a position is matched
+    alternatives = sorted(keywords, key=lambda k: (-len(k), k))
+    pattern = "(?=(%s))" % "|".join(re.escape(k) for k in alternatives)
+    return re.compile(pattern), flags_by_keyword
+
+
+_filetype_matcher, _filetype_flags_by_keyword = build_keywords_matcher(FILETYPE_KEYWORDS)
+
+
+@attr.s(slots=True, frozen=True)
+class FiletypeFlags(object):
+    """
+    Flags derived from a libmagic filetype string.
+    """
+
+    is_data = attr.ib(default=False)
+    has_data = attr.ib(default=False)
+    has_long_lines = attr.ib(default=False)
+    is_gem_image = attr.ib(default=False)
+    has_archive = attr.ib(default=False)
+    has_zip = attr.ib(default=False)
+    is_zip_archive = attr.ib(default=False)
+    has_compressed = attr.ib(default=False)
+    is_filesystem = attr.ib(default=False)
+    is_2007 = attr.ib(default=False)
+    is_office_2007 = attr.ib(default=False)
+    is_debian_package = attr.ib(default=False)
+    is_rpm = attr.ib(default=False)
+    is_posix_tar = attr.ib(default=False)
+    is_media = attr.ib(default=False)
+    is_media_without_meta = attr.ib(default=False)
+    has_script = attr.ib(default=False)
+    has_makefile = attr.ib(default=False)
+    is_winexe = attr.ib(default=False)
+    elf_type = attr.ib(default="")
+    is_not_stripped = attr.ib(default=False)
+
+
+@functools.lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def classify_filetype(filetype):
+    """
+    Return a FiletypeFlags for a libmagic `filetype` string. This is memoized
+    as a scan has only a few thousands distinct filetypes.
+    """
+    ft = filetype.lower()
+    flags = dict.fromkeys(
+        (
+            flag
+            for match in _filetype_matcher.finditer(ft)
+            for flag in _filetype_flags_by_keyword[match.group(1)]
+        ),
+        True,
+    )
+
+    is_2007 = ft.endswith("2007+")
+    elf_type = ""
+    if ft.startswith("elf"):
+        for etype in elf_types:
+            if etype in ft:
+                elf_type = etype
+                break
+
+    return FiletypeFlags(
+        is_data=ft == "data",
+        is_gem_image=ft.startswith("gem image data"),
+        is_zip_archive=ft.startswith(("zip archive", "java archive")),
+        is_2007=is_2007,
+        is_office_2007=is_2007 and ft.startswith("microsoft"),
+        is_rpm=ft.startswith("rpm "),
+        is_posix_tar=ft == "posix tar archive",
+        is_media_without_meta=ft.startswith(MEDIA_WITHOUT_META_PREFIXES),
+        is_winexe=flags.pop("is_winexe", False) or ft.startswith("pe32"),
+        elf_type=elf_type,
+        **flags,
+    )
+
+
+@functools.lru_cache(maxsize=CLASSIFIER_CACHE_SIZE)
+def is_media_mimetype(mimetype):
+    """
+    Return True if a libmagic `mimetype` string is for a media file.
+    """
+    return any(m in mimetype for m in MEDIA_MIMETYPE_KEYWORDS)
+
+
+# Default maximum number of Type objects kept in the global registry.
+REGISTRY_MAX_SIZE = 1024
+
+
+class TypeRegistry(object):
+    """
+    A bounded mapping of {(absolute location, libmagic profile name): Type}
+    used to memoize Type objects.
+    The least recently used Type is evicted when the registry is full. A
+    `max_size` of None or 0 means no bound.
+
+    Lookups and insertions are guarded by a lock and the registry tracks hits,
+    misses and evictions counters.
+    """
+
+    def __init__(self, max_size=REGISTRY_MAX_SIZE):
+        self.max_size = max_size
+        self._types = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return "TypeRegistry(max_size=%r, size=%r, hits=%r, misses=%r, evictions=%r)" % (
+            self.max_size,
+            len(self),
+            self.hits,
+            self.misses,
+            self.evictions,
+        )
+
+    def __len__(self):
+        return len(self._types)
+
+    def __contains__(self, location):
+        return location in self._types
+
+    def __getitem__(self, location):
+        """
+        Return the Type for `location`. Raise a KeyError if not registered.
+        """
+        with self._lock:
+            try:
+                typ = self._types[location]
+            except KeyError:
+                self.misses += 1
+                raise
+            self._types.move_to_end(location)
+            self.hits += 1
+            return typ
+
+    def __setitem__(self, location, typ):
+        with self._lock:
+            types = self._types
+            types[location] = typ
+            types.move_to_end(location)
+            max_size = self.max_size
+            if max_size:
+                while len(types) > max_size:
+                    types.popitem(last=False)
+                    self.evictions += 1
+
+    def get(self, location, default=None):
+        try:
+            return self[location]
+        except KeyError:
+            return default
+
+    def clear(self):
+        """
+        Remove all registered Type objects and reset the counters.
+        """
+        with self._lock:
+            self._types.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+        Return a mapping of registry counters.
+        """
+        return dict(
+            size=len(self),
+            max_size=self.max_size,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
+
+
+# Global registry of Type objects, keyed by absolute location and name of the
+# libmagic profile used to detect their types
+_registry = TypeRegistry()
 
 
-def get_type(location):
+def get_registry():
     """
-    Return a Type object for location.
+    Return the current global TypeRegistry.
+    """
+    return _registry
+
+
+def set_registry(registry):
+    """
+    Replace the global TypeRegistry with `registry` and return the previous one.
+    `registry` can be any mapping-like object supporting item get and set.
+    """
+    global _registry
+    previous = _registry
+    _registry = registry
+    return previous
+
+
+def clear_registry():
+    """
+    Clear the global TypeRegistry.
+    """
+    _registry.clear()
+
+
+@contextlib.contextmanager
+def registry_scope(max_size=REGISTRY_MAX_SIZE):
+    """
+    Context manager using a new TypeRegistry with `max_size` as the global
+    registry for the duration of the block, for instance for the files of a
+    single scanned codebase. The previous registry is restored on exit.
+    """
+    registry = TypeRegistry(max_size=max_size)
+    previous = set_registry(registry)
+    try:
+        yield registry
+    finally:
+        set_registry(previous)
+        registry.clear()
+
+
+def get_type(location, stat_result=None):
+    """
+    Return a Type object for location detected with the current libmagic
+    profile of this thread. Use the optional `stat_result` of an os.lstat()
+    call for this location if available.
     """
     abs_loc = os.path.abspath(location)
+    profile = magic2.get_profile().name
     try:
-        return _registry[abs_loc]
+        return _registry[abs_loc, profile]
     except KeyError:
-        t = Type(abs_loc)
-        _registry[abs_loc] = t
+        t = Type(abs_loc, stat_result=stat_result, profile=profile)
+        _registry[abs_loc, profile] = t
         return t
 
 
+def warmup():
+    """
+    Load the libraries and modules used for detection that are otherwise
+    loaded on first use, map the libmagic database in memory and create the
+    libmagic detector of the current thread. Call this before forking worker
+    processes such that they share these.
+    """
+    import binaryornot.helpers  # NOQA
+    import pdfminer.pdfdocument  # NOQA
+    import pdfminer.pdfparser  # NOQA
+    from commoncode import text  # NOQA
+    from typecode import pygments_lexers
+
+    magic2.warmup()
+    extractible.get_can_extract()
+    pygments_lexers.get_filename_index()
+    if USE_SIGNATURES:
+        signatures.get_verified_signatures()
+
+
 # TODO: simplify code using a cached property decorator
 
 
@@ -138,6 +499,9 @@ class Type(object):
 
     __slots__ = (
         "location",
+        "head_size",
+        "profile",
+        "_head",
         "is_file",
         "is_dir",
         "is_regular",
@@ -160,6 +524,9 @@ class Type(object):
         "_is_data",
         "_is_archive",
         "_contains_text",
+        "_entropy",
+        "_elf_info",
+        "_pe_info",
     )
 
     # FIXME: we should use an introspectable attrs class instead
@@ -220,20 +587,147 @@ class Type(object):
         text_attributes + numeric_attributes + date_attributes + boolean_attributes
     )
 
-    def __init__(self, location):
-        if not location or (not os.path.exists(location) and not filetype.is_broken_link(location)):
+    # Mapping of {attribute name: tuple of the attributes names used to compute
+    # this attribute}. Attributes without dependencies are computed when the
+    # Type is created, or from the file itself.
+    # ATTENTION: keep this in sync with the properties
+    attribute_dependencies = {
+        "filetype_file": ("is_file",),
+        "mimetype_file": ("is_file",),
+        "mimetype_python": ("is_file",),
+        "filetype_pygment": ("is_text", "is_media"),
+        "elf_type": ("is_elf",),
+        "programming_language": ("is_source", "filetype_pygment"),
+        "link_target": ("is_link", "is_broken_link"),
+        "size": ("is_file", "is_dir"),
+        "date": (),
+        "is_file": (),
+        "is_dir": (),
+        "is_regular": (),
+        "is_special": (),
+        "is_link": (),
+        "is_broken_link": (),
+        "is_pdf_with_text": ("is_file", "is_pdf"),
+        "is_text": ("is_file", "is_binary"),
+        "is_text_with_long_lines": ("is_text", "filetype_file"),
+        "is_compact_js": ("is_js_map", "is_text", "filetype_file", "programming_language"),
+        "is_js_map": ("is_text",),
+        "is_binary": ("is_file",),
+        "is_data": ("is_file", "filetype_file", "mimetype_file", "size", "is_text"),
+        "is_archive": (
+            "is_text",
+            "filetype_file",
+            "is_compressed",
+            "is_package",
+            "is_filesystem",
+            "is_office_doc",
+        ),
+        "contains_text": (
+            "is_file",
+            "is_media",
+            "is_text",
+            "is_pdf",
+            "is_pdf_with_text",
+            "is_compressed",
+            "is_archive",
+        ),
+        "is_compressed": ("is_text", "filetype_file", "is_package", "is_office_doc"),
+        "is_c_source": ("is_text",),
+        "is_elf": ("is_file", "filetype_file"),
+        "is_filesystem": ("filetype_file",),
+        "is_java_class": ("is_file",),
+        "is_java_source": ("is_file",),
+        "is_media": ("mimetype_file", "filetype_file"),
+        "is_media_with_meta": ("is_media", "filetype_file"),
+        "is_office_doc": ("filetype_file",),
+        "is_package": ("filetype_file",),
+        "is_pdf": ("mimetype_file",),
+        "is_script": ("is_text", "filetype_file"),
+        "is_source": (
+            "is_text",
+            "is_makefile",
+            "is_js_map",
+            "is_java_source",
+            "is_c_source",
+            "filetype_pygment",
+            "is_script",
+        ),
+        "is_stripped_elf": ("is_elf",),
+        "is_winexe": ("is_file", "filetype_file"),
+        "is_makefile": (),
+    }
+
+    # Mapping of {detector name: attributes computed with this detector}
+    detector_attributes = {
+        "libmagic": ("filetype_file", "mimetype_file"),
+        "pygments": ("filetype_pygment",),
+        "pdfminer": ("is_pdf_with_text",),
+        "extractible": ("is_archive",),
+    }
+
+    @classmethod
+    def get_attributes_closure(cls, attributes):
+        """
+        Return a list of attribute names with all the `attributes` names and
+        all the attributes they depend on, in the order they should be
+        computed, e.g. dependencies first. Raise a ValueError on unknown names.
+        """
+        dependencies = cls.attribute_dependencies
+        closure = {}
+
+        def visit(name):
+            if name in closure:
+                return
+            try:
+                depends_on = dependencies[name]
+            except KeyError:
+                raise ValueError(f"Unknown Type attribute: {name!r}")
+            # mark as seen before visiting dependencies to avoid cycles
+            closure[name] = False
+            for dependency in depends_on:
+                visit(dependency)
+            # move to the end, after its dependencies
+            del closure[name]
+            closure[name] = True
+
+        for attribute in attributes:
+            visit(attribute)
+        return list(closure)
+
+    @classmethod
+    def get_detectors(cls, attributes):
+        """
+        Return a set of the detector names that may be used to compute the
+        `attributes` names.
+        """
+        closure = set(cls.get_attributes_closure(attributes))
+        return set(
+            detector
+            for detector, detected in cls.detector_attributes.items()
+            if closure.intersection(detected)
+        )
+
+    def __init__(self, location, head_size=HEAD_SIZE, stat_result=None, profile=None):
+        """
+        Create a Type for `location`. Use the optional `stat_result` of an
+        os.lstat() call for this location if available or stat the location.
+        All the file system flags and the date are derived from this single
+        lstat (and one extra stat to check the target of symlinks).
+
+        Detect the libmagic types with the libmagic profile named `profile` or
+        the current profile of the thread creating this Type.
+        """
+        if not location:
             raise IOError("[Errno 2] No such file or directory: '%(location)r'" % locals())
-        self.location = location
-        # flags and values
-        self.is_file = filetype.is_file(location)
-        self.is_dir = filetype.is_dir(location)
-        self.is_regular = filetype.is_regular(location)
-        self.is_special = filetype.is_special(location)
 
-        self.date = filetype.get_last_modified_date(location)
+        if stat_result is None:
+            try:
+                stat_result = os.lstat(location)
+            except OSError:
+                raise IOError("[Errno 2] No such file or directory: '%(location)r'" % locals())
 
-        self.is_link = filetype.is_link(location)
-        self.is_broken_link = bool(filetype.is_broken_link(location))
+        self.location = location
+        self.profile = profile or magic2.get_profile().name
 
         # FIXME: the way the True and False values are checked in properties is verbose and contrived at best
         # and is due to use None/True/False as different values
@@ -241,6 +735,30 @@ class Type(object):
         self._size = None
         self._link_target = None
 
+        # flags and values
+        mode = stat_result.st_mode
+        self.is_link = stat.S_ISLNK(mode)
+        self.is_broken_link = False
+        if self.is_link and on_posix:
+            try:
+                os.stat(location)
+            except OSError:
+                self.is_broken_link = True
+
+        self.is_file = stat.S_ISREG(mode)
+        self.is_dir = stat.S_ISDIR(mode)
+        self.is_regular = self.is_file or self.is_dir
+        self.is_special = not self.is_regular
+
+        self.date = ""
+        if self.is_file:
+            self._size = stat_result.st_size
+            utc_date = datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc)
+            self.date = utc_date.isoformat()[:10]
+
+        self.head_size = head_size
+        self._head = None
+
         self._mimetype_python = None
         self._filetype_file = None
         self._mimetype_file = None
@@ -254,6 +772,17 @@ class Type(object):
         self._is_data = None
         self._is_archive = None
         self._contains_text = None
+        self._entropy = None
+        self._elf_info = None
+        self._pe_info = None
+
+    @classmethod
+    def from_dir_entry(cls, entry, head_size=HEAD_SIZE):
+        """
+        Return a Type created from an os.DirEntry `entry` as returned by
+        os.scandir(), reusing its cached stat data.
+        """
+        return cls(entry.path, head_size=head_size, stat_result=entry.stat(follow_symlinks=False))
 
     def __repr__(self):
         return "Type(ftf=%r, mtf=%r, ftpyg=%r, mtpy=%r)" % (
@@ -263,11 +792,21 @@ class Type(object):
             self.mimetype_python,
         )
 
-    def to_dict(self, include_date=True):
+    def to_dict(self, include_date=True, attributes=None):
         """
-        Return a mapping of attributes.
+        Return a mapping of attributes. Only include and compute the
+        `attributes` list of attribute names and their dependencies if
+        provided or all the exportable attributes otherwise. Raise a ValueError
+        on unknown names.
         """
-        nv = ((n, getattr(self, n)) for n in self.exportable_attributes)
+        if attributes:
+            attributes = list(attributes)
+            # validate names
+            self.get_attributes_closure(attributes)
+        else:
+            attributes = self.exportable_attributes
+
+        nv = ((n, getattr(self, n)) for n in attributes)
         if not include_date:
             nv = ((n, v) for n, v in nv if n not in self.date_attributes)
 
@@ -284,6 +823,38 @@ class Type(object):
                 self._size = filetype.get_size(self.location)
         return self._size
 
+    @property
+    def head(self):
+        """
+        Return a byte string with up to `head_size` bytes read once from the
+        start of this file and shared by all content detectors. Return empty
+        bytes if this is not a file or cannot be read.
+        """
+        if self._head is None:
+            self._head = b""
+            if self.is_file is True:
+                try:
+                    self._head = read_file_start(self.location, self.head_size)
+                except (IOError, OSError):
+                    pass
+        return self._head
+
+    @property
+    def head_is_content(self):
+        """
+        Return True if the head of this file is its whole (non-empty) content.
+        """
+        head = self.head
+        return 0 < len(head) < self.head_size
+
+    def _magic_buffer(self):
+        """
+        Return the file head bytes for libmagic to use instead of reading the
+        file, or None if libmagic should read the file.
+        """
+        if self.head_is_content and not self.head.startswith(MAGIC_BUFFER_EXCLUDED_HEADS):
+            return self.head
+
     @property
     def link_target(self):
         """
@@ -314,7 +885,7 @@ class Type(object):
         if self._filetype_file is None:
             self._filetype_file = ""
             if self.is_file is True:
-                self._filetype_file = magic2.file_type(self.location)
+                self._set_file_types()
         return self._filetype_file
 
     @property
@@ -325,9 +896,38 @@ class Type(object):
         if self._mimetype_file is None:
             self._mimetype_file = ""
             if self.is_file is True:
-                self._mimetype_file = magic2.mime_type(self.location)
+                self._set_file_types()
         return self._mimetype_file
 
+    def _set_file_types(self):
+        """
+        Set both the filetype and mimetype of this file, from the signatures or
+        else from libmagic with a single open of the file.
+        """
+        types = self._signature_types()
+        if not types:
+            with magic2.profile_scope(self.profile):
+                filetype, mimetype, _encoding = magic2.file_info(
+                    self.location, buf=self._magic_buffer(), with_encoding=False
+                )
+            types = filetype, mimetype
+        self._filetype_file, self._mimetype_file = types
+
+    def _signature_types(self):
+        """
+        Return a tuple of (filetype, mimetype) recognized from the file head
+        with the signatures engine or None if not enabled or not confident.
+        """
+        if USE_SIGNATURES:
+            return signatures.get_signature_types(self.head)
+
+    @property
+    def filetype_flags(self):
+        """
+        Return a FiletypeFlags derived from the libmagic filetype.
+        """
+        return classify_filetype(self.filetype_file)
+
     @property
     def filetype_pygment(self):
         """
@@ -336,9 +936,9 @@ class Type(object):
         if self._filetype_pygment is None:
             self._filetype_pygment = ""
             if self.is_text and not self.is_media:
-                lexer = get_pygments_lexer(self.location)
-                if lexer and not lexer.name.startswith("JSON"):
-                    self._filetype_pygment = lexer.name or ""
+                lexer_name = get_pygments_lexer_name(self.location, head=self.head)
+                if lexer_name and not lexer_name.startswith("JSON"):
+                    self._filetype_pygment = lexer_name
                 else:
                     self._filetype_pygment = ""
         return self._filetype_pygment
@@ -361,7 +961,7 @@ class Type(object):
         if self._is_binary is None:
             self._is_binary = False
             if self.is_file is True:
-                self._is_binary = is_binary(self.location)
+                self._is_binary = is_binary(self.location, head=self.head)
         return self._is_binary
 
     @property
@@ -380,7 +980,7 @@ class Type(object):
         """
         if self._is_text_with_long_lines is None:
             self._is_text_with_long_lines = (
-                self.is_text is True and "long lines" in self.filetype_file.lower()
+                self.is_text is True and self.filetype_flags.has_long_lines
             )
         return self._is_text_with_long_lines
 
@@ -402,7 +1002,7 @@ class Type(object):
                 self.is_js_map
                 or (self.is_text is True and self.location.endswith(extensions))
                 or (
-                    self.filetype_file.lower() == "data"
+                    self.filetype_flags.is_data
                     and (
                         self.programming_language == "JavaScript"
                         or self.location.endswith(json_ext)
@@ -435,28 +1035,28 @@ class Type(object):
             return self._is_archive
 
         self._is_archive = False
-        docx_type_end = "2007+"
-
-        ft = self.filetype_file.lower()
 
         if self.is_text:
             self._is_archive = False
-        elif ft.startswith("gem image data"):
+            return self._is_archive
+
+        flags = self.filetype_flags
+        if flags.is_gem_image:
             self._is_archive = False
         elif self.is_compressed:
             self._is_archive = True
-        elif "archive" in ft:
+        elif flags.has_archive:
             self._is_archive = True
         elif self.is_package:
             self._is_archive = True
         elif self.is_filesystem:
             self._is_archive = True
-        elif self.is_office_doc and ft.endswith(docx_type_end):
+        elif self.is_office_doc and flags.is_2007:
             self._is_archive = True
-        elif "(zip)" in ft:
+        elif flags.has_zip:
             # FIXME: is this really correct???
             self._is_archive = True
-        elif extractible.can_extract(self.location):
+        elif self.is_file and extractible.can_extract(self.location):
             self._is_archive = True
 
         return self._is_archive
@@ -477,10 +1077,7 @@ class Type(object):
         if loc.endswith(msoffice_exts):
             return True
         else:
-            ft = self.filetype_file.lower()
-            if ft.startswith("microsoft") and ft.endswith("2007+"):
-                return True
-            return False
+            return self.filetype_flags.is_office_2007
 
     @property
     def is_package(self):
@@ -488,20 +1085,17 @@ class Type(object):
         Return True if the file is some kind of packaged archive.
         """
         # FIXME: this should beased on proper package recognition, not this simplistic check
-        ft = self.filetype_file.lower()
+        flags = self.filetype_flags
         loc = self.location.lower()
         package_archive_extensions = ".jar", ".war", ".ear", ".zip", ".whl", ".egg"
         gem_extension = ".gem"
 
         # FIXME: this is grossly under specified and is missing many packages
         if (
-            "debian binary package" in ft
-            or ft.startswith("rpm ")
-            or (ft == "posix tar archive" and loc.endswith(gem_extension))
-            or (
-                ft.startswith(("zip archive", "java archive"))
-                and loc.endswith(package_archive_extensions)
-            )
+            flags.is_debian_package
+            or flags.is_rpm
+            or (flags.is_posix_tar and loc.endswith(gem_extension))
+            or (flags.is_zip_archive and loc.endswith(package_archive_extensions))
         ):
             return True
         else:
@@ -512,15 +1106,17 @@ class Type(object):
         """
         Return True if the file is some kind of compressed file.
         """
-        ft = self.filetype_file.lower()
-
         docx_ext = "x"
 
-        if not self.is_text and (
-            "(zip)" in ft
-            or ft.startswith(("zip archive", "java archive"))
+        if self.is_text:
+            return False
+
+        flags = self.filetype_flags
+        if (
+            flags.has_zip
+            or flags.is_zip_archive
             or self.is_package
-            or any(x in ft for x in ("squashfs filesystem", "compressed"))
+            or flags.has_compressed
             or (self.is_office_doc and self.location.endswith(docx_ext))
         ):
             return True
@@ -532,11 +1128,7 @@ class Type(object):
         """
         Return True if the file is some kind of file system or disk image.
         """
-        ft = self.filetype_file.lower()
-        if "squashfs filesystem" in ft:
-            return True
-        else:
-            return False
+        return self.filetype_flags.is_filesystem
 
     @property
     def is_media(self):
@@ -545,49 +1137,15 @@ class Type(object):
         """
         # TODO: fonts?
         mt = self.mimetype_file
-        mimes = (
-            "image",
-            "picture",
-            "audio",
-            "video",
-            "graphic",
-            "sound",
-        )
+        flags = self.filetype_flags
 
-        ft = self.filetype_file.lower()
-        types = (
-            "image data",
-            "graphics image",
-            "ms-windows metafont .wmf",
-            "windows enhanced metafile",
-            "png image",
-            "interleaved image",
-            "microsoft asf",
-            "image text",
-            "photoshop image",
-            "shop pro image",
-            "ogg data",
-            "vorbis",
-            "mpeg",
-            "theora",
-            "bitmap",
-            "audio",
-            "video",
-            "sound",
-            "riff",
-            "icon",
-            "pc bitmap",
-            "image data",
-            "netpbm",
-        )
-
-        if any(m in mt for m in mimes) or any(t in ft for t in types):
+        if is_media_mimetype(mt) or flags.is_media:
             return True
 
         tga_ext = ".tga"
 
         if (
-            ft == "data"
+            flags.is_data
             and mt == "application/octet-stream"
             and self.location.lower().endswith(tga_ext)
         ):
@@ -609,9 +1167,7 @@ class Type(object):
         # FIXME: only include types that are known to have metadata
         if not self.is_media:
             return False
-        if self.filetype_file.lower().startswith(
-            ("gif image", "png image", "jpeg image", "netpbm", "mpeg")
-        ):
+        if self.filetype_flags.is_media_without_meta:
             return False
         else:
             return True
@@ -633,18 +1189,52 @@ class Type(object):
         """
         if self._is_pdf_with_text is None:
             self._is_pdf_with_text = False
-            if not self.is_file is True and not self.is_pdf is True:
+            if self.is_file is not True or self.is_pdf is not True:
                 self._is_pdf_with_text = False
             else:
-                with open(self.location, "rb") as pf:
-                    try:
-                        parser = PDFParser(pf)
-                        doc = PDFDocument(parser)
-                        self._is_pdf_with_text = doc.is_extractable
-                    except (PDFSyntaxError, PSSyntaxError, PDFException, PDFEncryptionError):
-                        self._is_pdf_with_text = False
+                self._is_pdf_with_text = self._check_pdf_trailer()
+                if self._is_pdf_with_text is None:
+                    self._is_pdf_with_text = self._parse_pdf_extractable()
         return self._is_pdf_with_text
 
+    def _check_pdf_trailer(self):
+        """
+        Return True if this PDF text is extractable as found quickly from its
+        trailer or None if pdfminer is needed to decide.
+        """
+        if self.head_is_content:
+            tail = self.head
+        else:
+            try:
+                tail = read_file_end(self.location, PDF_TAIL_SIZE)
+            except (IOError, OSError):
+                return
+        return check_pdf_trailer(self.head, tail)
+
+    def _parse_pdf_extractable(self):
+        """
+        Return True if this PDF text is extractable using pdfminer.
+        """
+        from pdfminer.pdfparser import PDFParser
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfparser import PDFSyntaxError
+        from pdfminer.psparser import PSSyntaxError
+        from pdfminer.pdfdocument import PDFEncryptionError
+        from pdfminer.pdftypes import PDFException
+
+        if self.head_is_content:
+            pdf_file = io.BytesIO(self.head)
+        else:
+            pdf_file = open(self.location, "rb")
+        with pdf_file as pf:
+            try:
+                parser = PDFParser(pf)
+                fallback = self.size <= PDF_FALLBACK_MAX_SIZE
+                doc = PDFDocument(parser, fallback=fallback)
+                return doc.is_extractable
+            except (PDFSyntaxError, PSSyntaxError, PDFException, PDFEncryptionError):
+                return False
+
     @property
     def contains_text(self):
         """
@@ -688,35 +1278,48 @@ class Type(object):
         if self._is_data is None:
             if not self.is_file:
                 self._is_data = False
+                return self._is_data
 
             large_file = 5 * 1000 * 1000
             large_text_file = 2 * 1000 * 1000
 
-            ft = self.filetype_file.lower()
+            flags = self.filetype_flags
 
             size = self.size
             max_entropy = 1.3
 
             if (
-                ft == "data"
-                or is_data(self.location)
-                or ("data" in ft and size > large_file)
+                flags.is_data
+                or is_data_type(self)
+                or (flags.has_data and size > large_file)
                 or (self.is_text and size > large_text_file)
                 or (self.is_text and size > large_text_file)
-                or (entropy.entropy(self.location, length=5000) < max_entropy)
+                or (self.entropy < max_entropy)
             ):
                 self._is_data = True
             else:
                 self._is_data = False
         return self._is_data
 
+    @property
+    def entropy(self):
+        """
+        Return the Shannon entropy of the first ENTROPY_SIZE bytes of this file.
+        """
+        if self._entropy is None:
+            if self.head_size >= ENTROPY_SIZE:
+                self._entropy = entropy.shannon_entropy(self.head[:ENTROPY_SIZE])
+            else:
+                self._entropy = entropy.entropy(self.location, length=ENTROPY_SIZE)
+        return self._entropy
+
     @property
     def is_script(self):
         """
         Return True if the file is script-like.
         """
-        ft = self.filetype_file.lower()
-        if self.is_text is True and "script" in ft and not "makefile" in ft:
+        flags = self.filetype_flags
+        if self.is_text is True and flags.has_script and not flags.has_makefile:
             return True
         else:
             return False
@@ -792,13 +1395,56 @@ class Type(object):
         """
         Return True if a the file is a windows executable.
         """
-        ft = self.filetype_file.lower()
-        return "for ms windows" in ft or ft.startswith("pe32")
+        if self.is_file is not True or not self.head.startswith(pe.DOS_MAGIC):
+            return False
+        if self.pe_info:
+            return True
+        # use libmagic for other DOS executables such as NE or LE executables
+        return self.filetype_flags.is_winexe
+
+    @property
+    def pe_info(self):
+        """
+        Return a pe.PeInfo read from the headers of this file or None if this
+        is not a PE executable or DLL or its headers cannot be read.
+        """
+        if self._pe_info is None:
+            self._pe_info = False
+            if self.is_file is True and self.head.startswith(pe.DOS_MAGIC):
+                self._pe_info = pe.get_pe_info(self.location, head=self.head) or False
+        return self._pe_info or None
+
+    @property
+    def elf_info(self):
+        """
+        Return an elf.ElfInfo read from the headers of this file or None if
+        this is not an ELF file or its headers cannot be read.
+        """
+        if self._elf_info is None:
+            self._elf_info = False
+            if self.is_file is True and self.head.startswith(elf.ELF_MAGIC):
+                self._elf_info = elf.get_elf_info(self.location, head=self.head) or False
+        return self._elf_info or None
+
+    def _get_elf_type(self):
+        """
+        Return one of the `elf_types` for this file or an empty string.
+        """
+        if not self.head.startswith(elf.ELF_MAGIC):
+            return ""
+        info = self.elf_info
+        if not info:
+            # use libmagic for invalid or truncated ELF headers
+            return self.filetype_flags.elf_type
+        type_name = info.type_name
+        for etype in elf_types:
+            if etype in type_name:
+                return etype
+        return ""
 
     @property
     def is_elf(self):
-        ft = self.filetype_file.lower()
-        if ft.startswith("elf") and (ELF_EXE in ft or ELF_SHARED in ft or ELF_RELOC in ft):
+        if self.is_file is True and self._get_elf_type():
             return True
         else:
             return False
@@ -806,18 +1452,17 @@ class Type(object):
     @property
     def elf_type(self):
         if self.is_elf is True:
-            ft = self.filetype_file.lower()
-            for t in elf_types:
-                if t in ft:
-                    return t
-            return ELF_UNKNOWN
+            return self._get_elf_type() or ELF_UNKNOWN
         else:
             return ""
 
     @property
     def is_stripped_elf(self):
         if self.is_elf is True:
-            return "not stripped" not in self.filetype_file.lower()
+            info = self.elf_info
+            if info and info.is_stripped is not None:
+                return info.is_stripped
+            return not self.filetype_flags.is_not_stripped
         else:
             return False
 
@@ -869,13 +1514,19 @@ def is_data(location, definitions=DATA_TYPE_DEFINITIONS):
     if not filetype.is_file(location):
         return False
 
-    T = get_type(location)
+    return is_data_type(get_type(location), definitions=definitions)
+
+
+def is_data_type(T, definitions=DATA_TYPE_DEFINITIONS):
+    """
+    Return True is the file of the `T` Type is a data file.
+    """
+    location = T.location
     ftype = T.filetype_file.lower()
-    mtype = T.mimetype_file.lower()
 
     for ddef in definitions:
         type_matched = ddef.filetypes and any(t in ftype for t in ddef.filetypes)
-        mime_matched = ddef.mimetypes and any(m in mtype for m in ddef.mimetypes)
+        mime_matched = ddef.mimetypes and any(m in T.mimetype_file.lower() for m in ddef.mimetypes)
 
         exts = ddef.extensions
         if exts:
@@ -899,18 +1550,52 @@ def is_data(location, definitions=DATA_TYPE_DEFINITIONS):
     return False
 
 
-def get_pygments_lexer(location):
+def get_pygments_lexer(location, head=None):
     """
     Given an input file location, return a Pygments lexer appropriate for
-    lexing this file content.
+    lexing this file content. Use the optional `head` bytes as the start of the
+    file content instead of reading the file.
     """
-    try:
-        T = _registry[location]
+    lexer_class = get_pygments_lexer_class(location, head=head)
+    if lexer_class:
+        return lexer_class()
+
+
+def get_pygments_lexer_class(location, head=None):
+    """
+    Given an input file location, return a Pygments lexer class appropriate for
+    lexing this file content or None. Use the optional `head` bytes as the
+    start of the file content instead of reading the file.
+
+    The lexer class is not instantiated such that its token regexes are not
+    compiled.
+    """
+    from typecode.pygments_lexers import find_lexer_class
+
+    lexer_name = get_pygments_lexer_name(location, head=head)
+    if lexer_name:
+        return find_lexer_class(lexer_name)
+
+
+def get_pygments_lexer_name(location, head=None):
+    """
+    Given an input file location, return the name of a Pygments lexer
+    appropriate for lexing this file content or None. Use the optional `head`
+    bytes as the start of the file content instead of reading the file.
+
+    The lexer module is not loaded unless its lexer needs to analyse the file
+    content.
+    """
+    from typecode.pygments_lexers import ClassNotFound as LexerClassNotFound
+    from typecode.pygments_lexers import find_lexer_name_for_filename
+    from typecode.pygments_lexers import guess_lexer_name
+
+    T = _registry.get((location, magic2.get_profile().name))
+    if T is not None:
         if T.is_binary:
             return
-    except KeyError:
-        if is_binary(location):
-            return
+    elif is_binary(location, head=head):
+        return
 
     # We first try to get a lexer using
     #  - the filename
@@ -918,21 +1603,24 @@ def get_pygments_lexer(location):
     #  - and finally the begining of the file content.
     # We try with lowercase as detection is skewed otherwise (e.g. .java vs .JAVA)
 
-    try:
-        return get_lexer_for_filename(location)
-    except LexerClassNotFound:
+    lexer_name = find_lexer_name_for_filename(location)
+    if not lexer_name:
+        lexer_name = find_lexer_name_for_filename(location.lower())
+    if lexer_name:
+        return lexer_name
+
+    # only try content-based detection if we do not have an extension
+    ext = fileutils.file_extension(location)
+    if not ext:
         try:
-            return get_lexer_for_filename(location.lower())
+            # if Pygments does not guess we should not carry forward
+            if head is not None:
+                content = get_text_start(head)
+            else:
+                content = get_text_file_start(location)
+            return guess_lexer_name(content)
         except LexerClassNotFound:
-            # only try content-based detection if we do not have an extension
-            ext = fileutils.file_extension(location)
-            if not ext:
-                try:
-                    # if Pygments does not guess we should not carry forward
-                    content = get_text_file_start(location)
-                    return guess_lexer(content)
-                except LexerClassNotFound:
-                    return
+            return
 
 
 def get_text_file_start(location, length=4096):
@@ -946,6 +1634,8 @@ def get_text_file_start(location, length=4096):
         with io.open(location, "r") as f:
             content = f.read(length)
     except:
+        from commoncode import text
+
         # try again as bytes and force unicode
         with open(location, "rb") as f:
             content = text.as_unicode(f.read(length))
@@ -953,6 +1643,87 @@ def get_text_file_start(location, length=4096):
         return content
 
 
+def read_file_start(location, length=HEAD_SIZE, _buffers=threading.local()):
+    """
+    Return a byte string with up to the first `length` bytes of the file at
+    `location`. The file is read into a reusable per-thread buffer.
+    """
+    buf = getattr(_buffers, "buf", None)
+    if buf is None or len(buf) < length:
+        buf = _buffers.buf = bytearray(length)
+    with open(location, "rb", buffering=0) as f:
+        view = memoryview(buf)[:length]
+        read = 0
+        while read < length:
+            count = f.readinto(view[read:])
+            if not count:
+                break
+            read += count
+    return bytes(buf[:read])
+
+
+def read_file_end(location, length):
+    """
+    Return a byte string with up to the last `length` bytes of the file at
+    `location`.
+    """
+    with open(location, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(max(0, size - length))
+        return f.read(length)
+
+
+def check_pdf_trailer(head, tail):
+    """
+    Return True if a PDF starting with the `head` bytes and ending with the
+    `tail` bytes is not encrypted and has a trailer with a document catalog,
+    such that pdfminer would find its text extractable. Return None if this
+    cannot be decided from these bytes.
+    """
+    if b"/Encrypt" in head or b"/Encrypt" in tail:
+        # pdfminer is needed to check the permissions of encrypted PDFs
+        return
+
+    startxref = tail.rfind(b"startxref")
+    if startxref < 0:
+        return
+
+    # a classic trailer dictionary before the last startxref
+    trailer = tail.rfind(b"trailer", 0, startxref)
+    if trailer >= 0 and b"/Root" in tail[trailer:startxref]:
+        return True
+
+    # or a cross-reference stream object dictionary
+    endobj = tail.rfind(b"endobj", 0, startxref)
+    if endobj >= 0:
+        xref_stream = tail[tail.rfind(b" obj", 0, endobj) + 1 : endobj]
+        if b"/XRef" in xref_stream and b"/Root" in xref_stream:
+            return True
+
+    # or the first page trailer of a linearized PDF
+    if b"/Linearized" in head:
+        trailer = head.find(b"trailer")
+        if trailer >= 0 and b"/Root" in head[trailer : head.find(b"startxref", trailer)]:
+            return True
+
+
+def get_text_start(data, length=TEXT_START_SIZE):
+    """
+    Return a unicode string with up the first "length" characters decoded from
+    the `data` bytes of the start of a text file, the same way as
+    get_text_file_start() would read it from the file.
+    """
+    try:
+        decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))()
+        content = decoder.decode(data[: length * 4])
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+        return content[:length]
+    except Exception:
+        from commoncode import text
+
+        return text.as_unicode(data[:length])
+
+
 def get_filetype(location):
     """
     LEGACY: Return the best filetype for location using multiple tools.
@@ -980,22 +1751,17 @@ def is_standard_include(location):
         return False
 
 
-def is_binary(location):
+def is_binary(location, head=None):
     """
-    Retrun True if the file at `location` is a binary file.
+    Retrun True if the file at `location` is a binary file. Use the optional
+    `head` bytes as the start of the file content instead of reading the file.
     """
-    known_extensions = (
-        ".pyc",
-        ".pgm",
-        ".mp3",
-        ".mp4",
-        ".mpeg",
-        ".mpg",
-        ".emf",
-        ".pgm",
-        ".pbm",
-        ".ppm",
-    )
-    if location.endswith(known_extensions):
+    if location.endswith(BINARY_EXTENSIONS):
         return True
-    return is_binary_string(get_starting_chunk(location))
+    from binaryornot import helpers as binaryornot
+
+    # older binaryornot versions check the first 1024 bytes
+    chunk_size = getattr(binaryornot, "CHUNK_SIZE", 1024)
+    if head is None:
+        head = binaryornot.get_starting_chunk(location, chunk_size)
+    return binaryornot.is_binary_string(head[:chunk_size])
@@ -0,0 +1,152 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import hashlib
+import os
+
+from typecode import magic2
+from typecode.contenttype import BINARY_EXTENSIONS
+from typecode.contenttype import get_type
+from typecode.contenttype import TypeRegistry
+
+"""
+Share the detection work between files with identical content in a scan, such
+as the many copies of the same files found in vendored or copied third-party
+code trees.
+
+Files are fingerprinted by size and content hash. The attributes derived only
+from the content (libmagic file and mime types, binary check, entropy, ELF and
+PE headers and PDF text extractability) are computed once per distinct content
+and reused for all the identical files. The attributes that also depend on the
+path (such as extension-based checks or Pygments lexer selection by file name)
+are still computed for each file.
+"""
+
+# Files larger than this are not fingerprinted: hashing their whole content is
+# likely to cost more than detecting their type.
+MAX_DEDUP_SIZE = 16 * 1024 * 1024
+
+# Maximum number of distinct contents tracked in a ContentIndex
+INDEX_MAX_SIZE = 100 * 1000
+
+# Type private attributes derived only from the file content
+CONTENT_ATTRIBUTES = (
+    "_filetype_file",
+    "_mimetype_file",
+    "_is_binary",
+    "_is_pdf_with_text",
+    "_entropy",
+    "_elf_info",
+    "_pe_info",
+)
+
+
+def get_fingerprint(location, size=None):
+    """
+    Return a (size, hash) fingerprint for the content of the file at
+    `location` or None if this file is too large to be fingerprinted.
+    """
+    if size is None:
+        size = os.path.getsize(location)
+    if size > MAX_DEDUP_SIZE:
+        return
+    digest = hashlib.blake2b(digest_size=16)
+    with open(location, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return size, digest.digest()
+
+
+class ContentIndex(object):
+    """
+    A bounded index of {fingerprint: {Type private attribute: value}} of the
+    content-derived Type attributes of the files already seen in a scan.
+    """
+
+    def __init__(self, max_size=INDEX_MAX_SIZE):
+        self.contents = TypeRegistry(max_size=max_size)
+
+    def __repr__(self):
+        return "ContentIndex(%r)" % self.contents.stats()
+
+    def get_content_attributes(self, T):
+        """
+        Return a mapping of the content-derived attributes already computed for
+        the `T` Type.
+        """
+        computed = {}
+        for name in CONTENT_ATTRIBUTES:
+            value = getattr(T, name)
+            if value is None:
+                continue
+            if name == "_is_binary" and T.location.endswith(BINARY_EXTENSIONS):
+                # this value is derived from the extension, not the content
+                continue
+            computed[name] = value
+        return computed
+
+    def get_type(self, location, stat_result=None):
+        """
+        Return a tuple of (Type, fingerprint) for `location` with its
+        content-derived attributes reused from an identical file if any.
+        The fingerprint is None for files that are not fingerprinted. Use the
+        optional os.lstat() `stat_result` for `location` if available.
+        """
+        T = get_type(location, stat_result=stat_result)
+        if not T.is_file:
+            return T, None
+
+        fingerprint = get_fingerprint(T.location, T.size)
+        if not fingerprint:
+            return T, None
+
+        known = self.contents.get(fingerprint)
+        if known:
+            for name, value in known.items():
+                if name == "_is_binary" and T.location.endswith(BINARY_EXTENSIONS):
+                    continue
+                if getattr(T, name) is None:
+                    setattr(T, name, value)
+        return T, fingerprint
+
+    def record(self, T, fingerprint):
+        """
+        Record the content-derived attributes computed for the `T` Type with
+        this content `fingerprint`.
+        """
+        if not fingerprint:
+            return
+        computed = self.get_content_attributes(T)
+        known = self.contents.get(fingerprint)
+        if known:
+            computed = dict(known, **computed)
+        self.contents[fingerprint] = computed
+
+    def get_type_mapping(self, location, attributes=None, include_date=True, stat_result=None):
+        """
+        Return a mapping of Type `attributes` (or all exportable attributes)
+        for the file at `location`, reusing and recording content-derived
+        attributes. Raise an IOError if the location does not exists.
+        """
+        T, fingerprint = self.get_type(location, stat_result=stat_result)
+        mapping = T.to_dict(include_date=include_date, attributes=attributes)
+        self.record(T, fingerprint)
+        return mapping
+
+
+def get_content_index(_indexes={}):
+    """
+    Return the ContentIndex of the current process and libmagic profile.
+    """
+    key = os.getpid(), magic2.get_profile().name
+    try:
+        return _indexes[key]
+    except KeyError:
+        index = _indexes[key] = ContentIndex()
+        return index
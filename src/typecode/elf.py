@@ -0,0 +1,304 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import struct
+
+import attr
+
+"""
+A small and bounded reader for the headers of ELF files, 32 or 64-bit in
+either byte order, to get the type, machine and symbols tables presence of ELF
+executables, shared objects and relocatable objects without calling libmagic.
+
+Only the ELF header, the program headers table, the dynamic segment and the
+section headers table with its section names are read.
+"""
+
+# Tracing flag
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+ELF_MAGIC = b"\x7fELF"
+
+# Size of the ELF identification and header for 32 and 64-bit ELFs
+EI_NIDENT = 16
+ELF_HEADER_SIZES = {1: 52, 2: 64}
+
+# The section headers and the program headers are not read if there are more
+# than these, the same limits as libmagic
+MAX_SECTIONS = 32768
+MAX_SEGMENTS = 2048
+
+# Maximum size of the dynamic segment and of the section names table to read
+MAX_DYNAMIC_SIZE = 64 * 1024
+MAX_SECTION_NAMES_SIZE = 1024 * 1024
+
+# e_type to libmagic-like type names
+ET_REL = 1
+ET_EXEC = 2
+ET_DYN = 3
+ET_CORE = 4
+
+ELF_TYPE_NAMES = {
+    ET_REL: "relocatable",
+    ET_EXEC: "executable",
+    ET_DYN: "shared object",
+    ET_CORE: "core file",
+}
+
+# e_machine to libmagic-like names for the common machines
+MACHINE_NAMES = {
+    2: "SPARC",
+    3: "Intel 80386",
+    4: "Motorola m68k",
+    8: "MIPS",
+    18: "SPARC32PLUS",
+    20: "PowerPC",
+    21: "64-bit PowerPC",
+    22: "IBM S/390",
+    40: "ARM",
+    42: "Renesas SH",
+    43: "SPARC V9",
+    50: "IA-64",
+    62: "x86-64",
+    183: "ARM aarch64",
+    243: "UCB RISC-V",
+    258: "LoongArch",
+}
+
+SHT_SYMTAB = 2
+PT_DYNAMIC = 2
+PT_INTERP = 3
+DT_NULL = 0
+DT_FLAGS_1 = 0x6FFFFFFB
+DF_1_PIE = 0x08000000
+
+
+@attr.s(slots=True, frozen=True)
+class ElfInfo(object):
+    """
+    Information from the headers of an ELF file. `has_symtab` and
+    `has_debug_info` are None if the sections could not be read.
+    """
+
+    bits = attr.ib()
+    endianness = attr.ib()
+    type = attr.ib()
+    machine = attr.ib()
+    has_interpreter = attr.ib(default=False)
+    is_pie = attr.ib(default=False)
+    has_symtab = attr.ib(default=None)
+    has_debug_info = attr.ib(default=None)
+
+    @property
+    def type_name(self):
+        """
+        Return a libmagic-like name for this ELF type.
+        """
+        if self.type == ET_DYN and self.is_pie:
+            return "pie executable"
+        return ELF_TYPE_NAMES.get(self.type, "unknown")
+
+    @property
+    def machine_name(self):
+        """
+        Return a libmagic-like name for this ELF machine.
+        """
+        return MACHINE_NAMES.get(self.machine, "unknown arch 0x%x" % self.machine)
+
+    @property
+    def is_stripped(self):
+        """
+        Return True if this ELF has no symbols table, False if it has one or
+        None if unknown.
+        """
+        if self.has_symtab is None:
+            return
+        return not self.has_symtab
+
+
+class ElfReader(object):
+    """
+    Read the structures of an ELF file from a binary file-like object `fileobj`
+    starting with the ELF header `head` bytes.
+    """
+
+    def __init__(self, fileobj, head):
+        self.fileobj = fileobj
+        self.size = fileobj.seek(0, 2)
+        self.bits = head[4]
+        self.endian = head[5] == 1 and "<" or ">"
+        if self.bits == 1:
+            self.header_format = self.endian + "HHIIIIIHHHHHH"
+            self.section_format = self.endian + "IIIIIIIIII"
+            self.segment_format = self.endian + "IIIIIIII"
+            self.dynamic_format = self.endian + "ii"
+        else:
+            self.header_format = self.endian + "HHIQQQIHHHHHH"
+            self.section_format = self.endian + "IIQQQQIIQQ"
+            self.segment_format = self.endian + "IIQQQQQQ"
+            self.dynamic_format = self.endian + "qQ"
+
+    def read(self, offset, size):
+        """
+        Return `size` bytes read at `offset` or None if not available.
+        """
+        if offset < 0 or size < 0 or offset + size > self.size:
+            return
+        self.fileobj.seek(offset)
+        data = self.fileobj.read(size)
+        if len(data) == size:
+            return data
+
+    def read_table(self, offset, count, entry_size, fmt):
+        """
+        Return a list of tuples for a table of `count` entries of `entry_size`
+        each at `offset`, or None if the table cannot be read. Like libmagic,
+        reject tables with an `entry_size` that is not the size of the `fmt`
+        entries: this caps the size of the read to `count` entries.
+        """
+        if entry_size != struct.calcsize(fmt):
+            return
+        data = self.read(offset, count * entry_size)
+        if data is None:
+            return
+        return [struct.unpack_from(fmt, data, index * entry_size) for index in range(count)]
+
+
+def get_elf_info(location, head=None):
+    """
+    Return an ElfInfo for the ELF file at `location` or None if this is not a
+    valid ELF file. Use the `head` bytes as the start of the file if provided.
+    """
+    if head is None:
+        with open(location, "rb") as f:
+            head = f.read(EI_NIDENT + ELF_HEADER_SIZES[2])
+
+    if not head.startswith(ELF_MAGIC) or len(head) < EI_NIDENT:
+        return
+    bits, data = head[4], head[5]
+    if bits not in ELF_HEADER_SIZES or data not in (1, 2):
+        return
+    if len(head) < ELF_HEADER_SIZES[bits]:
+        return
+
+    try:
+        with open(location, "rb") as f:
+            return read_elf_info(ElfReader(f, head), head)
+    except (IOError, OSError, struct.error) as e:
+        if TRACE:
+            logger_debug("get_elf_info: failed for:", location, e)
+
+
+def read_elf_info(reader, head):
+    """
+    Return an ElfInfo using an ElfReader `reader` for an ELF with `head` bytes.
+    """
+    (
+        e_type,
+        e_machine,
+        _e_version,
+        _e_entry,
+        e_phoff,
+        e_shoff,
+        _e_flags,
+        _e_ehsize,
+        e_phentsize,
+        e_phnum,
+        e_shentsize,
+        e_shnum,
+        e_shstrndx,
+    ) = struct.unpack_from(reader.header_format, head, EI_NIDENT)
+
+    has_interpreter = False
+    is_pie = False
+    if e_phoff and 0 < e_phnum <= MAX_SEGMENTS:
+        segments = reader.read_table(e_phoff, e_phnum, e_phentsize, reader.segment_format) or []
+        for segment in segments:
+            if reader.bits == 1:
+                p_type, p_offset, _, _, p_filesz = segment[:5]
+            else:
+                p_type, _, p_offset, _, _, p_filesz = segment[:6]
+            if p_type == PT_INTERP:
+                has_interpreter = True
+            elif p_type == PT_DYNAMIC:
+                is_pie = is_pie or has_pie_flag(reader, p_offset, p_filesz)
+
+    has_symtab = None
+    has_debug_info = None
+    if e_shoff and 0 < e_shnum <= MAX_SECTIONS and e_shstrndx < e_shnum:
+        sections = reader.read_table(e_shoff, e_shnum, e_shentsize, reader.section_format)
+        if sections:
+            has_symtab = any(section[1] == SHT_SYMTAB for section in sections)
+            has_debug_info = ".debug_info" in get_section_names(reader, sections, e_shstrndx)
+
+    return ElfInfo(
+        bits=reader.bits == 1 and 32 or 64,
+        endianness=reader.endian == "<" and "LSB" or "MSB",
+        type=e_type,
+        machine=e_machine,
+        has_interpreter=has_interpreter,
+        is_pie=is_pie,
+        has_symtab=has_symtab,
+        has_debug_info=has_debug_info,
+    )
+
+
+def has_pie_flag(reader, offset, size):
+    """
+    Return True if the dynamic segment at `offset` of `size` has the DF_1_PIE
+    flag set.
+    """
+    entry_size = struct.calcsize(reader.dynamic_format)
+    size = min(size, MAX_DYNAMIC_SIZE)
+    entries = reader.read_table(offset, size // entry_size, entry_size, reader.dynamic_format)
+    for tag, value in entries or []:
+        if tag == DT_NULL:
+            break
+        if tag == DT_FLAGS_1:
+            return bool(value & DF_1_PIE)
+    return False
+
+
+def get_section_names(reader, sections, names_index):
+    """
+    Return a set of section names for a list of `sections` tuples given the
+    index of the section names string table.
+    """
+    names_section = sections[names_index]
+    # sh_offset and sh_size are the 5th and 6th section header fields
+    offset, size = names_section[4], names_section[5]
+    if size > MAX_SECTION_NAMES_SIZE:
+        return set()
+    names = reader.read(offset, size)
+    if not names:
+        return set()
+    section_names = set()
+    for section in sections:
+        start = section[0]
+        end = names.find(b"\x00", start)
+        if 0 <= start < end:
+            section_names.add(names[start:end].decode("latin-1"))
+    return section_names
@@ -7,10 +7,12 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from functools import lru_cache
 from functools import partial
 import bz2
 import gzip
 import os
+import struct
 import tarfile
 import zipfile
 
@@ -20,25 +22,57 @@ support if available, otherwise we use the standard library archive
 and compressed files support as available.
 """
 
+# Maximum number of bytes decompressed to check that a compressed file is
+# valid. Smaller files are fully decompressed and checked.
+PROBE_SIZE = 64 * 1024
+
+# Number of bytes read from the start of a file to identify its format
+SNIFF_SIZE = 16
+
+
+def _probe_compressed(fileobj, opener, probe_size=None):
+    """
+    Return True if the `fileobj` binary file object opened with the
+    `opener` compressed file class can be decompressed without errors, up to
+    `probe_size` (or PROBE_SIZE) decompressed bytes.
+    """
+    probe_size = probe_size or PROBE_SIZE
+    try:
+        fileobj.seek(0)
+        with opener(fileobj) as comp:
+            read = 0
+            while read < probe_size:
+                data = comp.read(min(8192, probe_size - read))
+                if not data:
+                    break
+                read += len(data)
+        return True
+    except Exception:
+        return False
+
 
 def _is_compressed(location, opener):
     if os.path.isfile(location):
-        try:
-            with opener(location) as comp:
-                comp.read()
-            return True
-        except Exception:
-            return False
+        with open(location, "rb") as f:
+            return _probe_compressed(f, opener)
+
+
+def _open_lzma(fileobj):
+    return lzma.LZMAFile(fileobj, format=lzma.FORMAT_AUTO)
 
 
-is_gzipfile = partial(_is_compressed, opener=gzip.open)
+def _open_gzip(fileobj):
+    return gzip.GzipFile(fileobj=fileobj)
+
+
+is_gzipfile = partial(_is_compressed, opener=_open_gzip)
 
 is_bz2file = partial(_is_compressed, opener=bz2.BZ2File)
 
 try:
     import lzma
 
-    is_lzmafile = partial(_is_compressed, opener=lzma.open)
+    is_lzmafile = partial(_is_compressed, opener=_open_lzma)
 except ImportError:
     is_lzmafile = lambda _: False
     lzma = None
@@ -48,15 +82,83 @@ except ImportError:
 archive_handlers = [zipfile.is_zipfile, tarfile.is_tarfile, is_gzipfile, is_bz2file, is_lzmafile]
 
 
+def is_lzma_alone_header(head):
+    """
+    Return True if the `head` bytes look like the header of a legacy .lzma
+    file that has no magic bytes: the usual properties byte and a dictionary
+    size of 2^n or 2^n + 2^(n-1).
+    """
+    if len(head) < 13 or head[0] != 0x5D:
+        return False
+    dict_size = struct.unpack_from("<I", head, 1)[0]
+    for n in range(12, 32):
+        if dict_size in (1 << n, (1 << n) + (1 << (n - 1))):
+            return True
+    return False
+
+
+def get_compressed_opener(head):
+    """
+    Return a compressed file class to open a file starting with the `head`
+    bytes or None if this is not a supported compressed format.
+    """
+    if head.startswith(b"\x1f\x8b"):
+        return _open_gzip
+    if head.startswith(b"BZh"):
+        return bz2.BZ2File
+    if lzma and (head.startswith(b"\xfd7zXZ\x00") or is_lzma_alone_header(head)):
+        return _open_lzma
+
+
 def _can_extract(location):
     """
     Return True if this location is likely to be extractible as some archive
     or compressed file.
+
+    The file is opened once and its format is identified from its first bytes
+    and checked with a bounded decompression probe, such that large compressed
+    files are not decompressed entirely.
     """
-    return any(handler(location) for handler in archive_handlers)
+    if not os.path.isfile(location):
+        return False
+    try:
+        with open(location, "rb") as f:
+            head = f.read(SNIFF_SIZE)
 
+            # zip files are identified from their end and may start with any data
+            f.seek(0)
+            if zipfile.is_zipfile(f):
+                return True
 
-try:
-    from extractcode.archive import can_extract  # NOQA
-except ImportError:
-    can_extract = _can_extract
+            opener = get_compressed_opener(head)
+            if opener and _probe_compressed(f, opener):
+                return True
+
+            # plain or compressed tar archives: only the first member is read
+            f.seek(0)
+            return tarfile.is_tarfile(f)
+    except Exception:
+        return False
+
+
+@lru_cache(maxsize=1)
+def get_can_extract():
+    """
+    Return the extractcode can_extract function if extractcode is installed or
+    our own _can_extract function otherwise. extractcode is imported on first
+    use.
+    """
+    try:
+        from extractcode.archive import can_extract
+
+        return can_extract
+    except ImportError:
+        return _can_extract
+
+
+def can_extract(location):
+    """
+    Return True if this location is likely to be extractible as some archive
+    or compressed file.
+    """
+    return get_can_extract()(location)
@@ -28,19 +28,26 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import ctypes.util
+import contextlib
 import glob
+import mmap
 import os
+import stat
 import sys
+import threading
 import warnings
 
-from commoncode import command
+import attr
 from commoncode.system import on_windows
 
 """
 magic2 is minimal and specialized wrapper around a vendored libmagic file
-identification library. This is NOT thread-safe. It is based on python-magic
-by Adam Hup and adapted to the specific needs of ScanCode.
+identification library. It is based on python-magic by Adam Hup and adapted to
+the specific needs of ScanCode.
+
+A libmagic cookie is NOT thread-safe: each thread uses its own lazily created
+detectors that are closed when the thread exits. Since ctypes releases the GIL
+while calling libmagic, detection can run in parallel in multiple threads.
 """
 
 # Tracing flag
@@ -63,9 +70,10 @@ if TRACE:
 
 
 #
-# Cached detectors
+# Cached detectors: a single Detector for each thread, with the name of the
+# Profile used in this thread if any
 #
-detectors = {}
+_thread_detectors = threading.local()
 
 # libmagic flags
 MAGIC_NONE = 0
@@ -74,32 +82,132 @@ MAGIC_MIME_ENCODING = 1024
 MAGIC_NO_CHECK_ELF = 65536
 MAGIC_NO_CHECK_TEXT = 131072
 MAGIC_NO_CHECK_CDF = 262144
+MAGIC_NO_CHECK_CSV = 524288
+MAGIC_NO_CHECK_JSON = 4194304
 
 DETECT_TYPE = MAGIC_NONE
 DETECT_MIME = MAGIC_NONE | MAGIC_MIME
 DETECT_ENC = MAGIC_NONE | MAGIC_MIME | MAGIC_MIME_ENCODING
 
+# libmagic parameters set with magic_setparam
+MAGIC_PARAM_INDIR_MAX = 0
+MAGIC_PARAM_NAME_MAX = 1
+MAGIC_PARAM_ELF_PHNUM_MAX = 2
+MAGIC_PARAM_ELF_SHNUM_MAX = 3
+MAGIC_PARAM_ELF_NOTES_MAX = 4
+MAGIC_PARAM_REGEX_MAX = 5
+MAGIC_PARAM_BYTES_MAX = 6
+MAGIC_PARAM_ENCODING_MAX = 7
+
+MAGIC_PARAMS = (
+    MAGIC_PARAM_INDIR_MAX,
+    MAGIC_PARAM_NAME_MAX,
+    MAGIC_PARAM_ELF_PHNUM_MAX,
+    MAGIC_PARAM_ELF_SHNUM_MAX,
+    MAGIC_PARAM_ELF_NOTES_MAX,
+    MAGIC_PARAM_REGEX_MAX,
+    MAGIC_PARAM_BYTES_MAX,
+    MAGIC_PARAM_ENCODING_MAX,
+)
+
+
+@attr.s(slots=True, frozen=True)
+class Profile(object):
+    """
+    A named libmagic detection profile: extra MAGIC_NO_CHECK_* `flags` added
+    to the flags of every detection, a mapping of {MAGIC_PARAM_*: value}
+    `params` overriding the libmagic default limits and if the `trimmed_db`
+    trimmed magic database is used (see typecode.magicdb).
+    """
+
+    name = attr.ib()
+    flags = attr.ib(default=MAGIC_NONE)
+    params = attr.ib(default=attr.Factory(dict))
+    trimmed_db = attr.ib(default=False)
+
+    def get_magicdb_location(self):
+        """
+        Return the location of the magic database used with this profile.
+        """
+        return get_magicdb_location(trimmed=self.trimmed_db)
+
+
+# Limits on the work done by libmagic for a file, low enough that crafted or
+# pathological files cannot make libmagic read megabytes or recurse deeply,
+# and high enough to detect the same types for common files.
+BOUNDED_PARAMS = {
+    MAGIC_PARAM_INDIR_MAX: 15,
+    MAGIC_PARAM_NAME_MAX: 30,
+    MAGIC_PARAM_ELF_PHNUM_MAX: 128,
+    MAGIC_PARAM_ELF_SHNUM_MAX: 1024,
+    MAGIC_PARAM_ELF_NOTES_MAX: 64,
+    MAGIC_PARAM_REGEX_MAX: 4096,
+    MAGIC_PARAM_BYTES_MAX: 1024 * 1024,
+}
+
+FAST_FLAGS = MAGIC_NO_CHECK_ELF | MAGIC_NO_CHECK_CDF | MAGIC_NO_CHECK_CSV | MAGIC_NO_CHECK_JSON
+FAST_PARAMS = {**BOUNDED_PARAMS, MAGIC_PARAM_BYTES_MAX: 256 * 1024}
+
+PROFILES = {
+    # the libmagic defaults: the most detailed detection
+    "full": Profile(name="full"),
+    # the same detection with bounded libmagic work per file
+    "bounded": Profile(name="bounded", params=BOUNDED_PARAMS),
+    # bounded and skip the costly checks of ELF and CDF (MS Office) details
+    # and of the CSV and JSON text formats: these files are reported with a
+    # less specific type, such as "ASCII text" rather than "JSON text data".
+    "fast": Profile(
+        name="fast",
+        flags=FAST_FLAGS,
+        params=FAST_PARAMS,
+    ),
+    # fast with a trimmed magic database with fewer rules, if available
+    "trimmed": Profile(
+        name="trimmed",
+        flags=FAST_FLAGS,
+        params=FAST_PARAMS,
+        trimmed_db=True,
+    ),
+}
+
 # keys for plugin-provided locations
 TYPECODE_LIBMAGIC_DLL = "typecode.libmagic.dll"
 TYPECODE_LIBMAGIC_DB = "typecode.libmagic.db"
+TYPECODE_LIBMAGIC_TRIMMED_DB = "typecode.libmagic.trimmed_db"
 
 TYPECODE_LIBMAGIC_PATH_ENVVAR = "TYPECODE_LIBMAGIC_PATH"
 TYPECODE_LIBMAGIC_DB_PATH_ENVVAR = "TYPECODE_LIBMAGIC_DB_PATH"
+TYPECODE_LIBMAGIC_TRIMMED_DB_PATH_ENVVAR = "TYPECODE_LIBMAGIC_TRIMMED_DB_PATH"
+
+# Set this environment variable to the name of one of the PROFILES to use it by
+# default instead of the "full" profile.
+TYPECODE_LIBMAGIC_PROFILE_ENVVAR = "TYPECODE_LIBMAGIC_PROFILE"
+
+# Compiled magic databases mapped in memory once per process and shared by all
+# the detectors: a {location: ctypes char array} mapping
+_magicdb_buffers = {}
+_magicdb_buffers_lock = threading.Lock()
+
+# Name of the default Profile used by the detectors of the threads that do not
+# use a profile_scope()
+_profile_name = os.environ.get(TYPECODE_LIBMAGIC_PROFILE_ENVVAR) or "full"
 
 if TRACE:
 
-    def file_type(location):
-        return _detect(location, DETECT_TYPE)
+    def file_type(location, buf=None):
+        return _detect(location, DETECT_TYPE, buf=buf)
 
 else:
 
-    def file_type(location):
+    def file_type(location, buf=None):
         """ "
         Return the detected filetype for file at `location` or an empty string if
-        nothing found or an error occurred.
+        nothing found or an error occurred. If `buf` bytes are provided, they
+        must be the whole content of the file and are used instead of reading
+        the file.
         """
         try:
-            return _detect(location, DETECT_TYPE)
+            return _detect(location, DETECT_TYPE, buf=buf)
         except:
             # TODO: log errors
             return ""
@@ -116,6 +224,8 @@ def load_lib_failover():
     Return a loaded libmagic from well known system installation locations.
     This is a function originally from python-magic.
     """
+    import ctypes.util
+
     libmagic = None
     # Let's try to find magic or magic1
     dll = (
@@ -175,6 +285,7 @@ def load_lib():
     - the system PATH.
     Raise an NoMagicLibError if no libmagic can be found.
     """
+    from commoncode import command
     from plugincode.location_provider import get_location
 
     # try the environment first
@@ -227,17 +338,31 @@ def load_lib():
     return command.load_shared_library(dll_loc)
 
 
-def get_magicdb_location(_cache=[]):
+def get_magicdb_location(trimmed=False, _cache=[]):
     """
     Return the location of the magicdb loaded from either:
     - an environment variable ``TYPECODE_LIBMAGIC_DB_PATH``,
     - a plugin-provided path,
     - the system PATH.
     Trigger a warning if no magicdb file is found.
+
+    If `trimmed` is True, return the location of the trimmed magicdb instead
+    if there is one (see get_trimmed_magicdb_location()) or trigger a warning
+    and use the full magicdb otherwise.
     """
+    if trimmed:
+        trimmed_loc = get_trimmed_magicdb_location()
+        if trimmed_loc:
+            return trimmed_loc
+        warnings.warn(
+            "Trimmed libmagic magic database not found: using the full database.\n"
+            f"Set the {TYPECODE_LIBMAGIC_TRIMMED_DB_PATH_ENVVAR} environment variable."
+        )
+
     if _cache:
         return _cache[0]
 
+    from commoncode import command
     from plugincode.location_provider import get_location
 
     # try the environment first
@@ -281,13 +406,89 @@ def get_magicdb_location(_cache=[]):
     return magicdb_loc
 
 
-def mime_type(location):
+def get_trimmed_magicdb_location(_cache=[]):
+    """
+    Return the location of a trimmed magicdb compiled with a subset of the
+    magic rules (see typecode.magicdb) or None, loaded from either:
+    - an environment variable ``TYPECODE_LIBMAGIC_TRIMMED_DB_PATH``,
+    - a plugin-provided path.
+    """
+    if _cache:
+        return _cache[0]
+
+    from plugincode.location_provider import get_location
+
+    magicdb_loc = os.environ.get(TYPECODE_LIBMAGIC_TRIMMED_DB_PATH_ENVVAR)
+    if not magicdb_loc:
+        magicdb_loc = get_location(TYPECODE_LIBMAGIC_TRIMMED_DB)
+
+    if TRACE:
+        logger_debug("get_trimmed_magicdb_location:", magicdb_loc)
+
+    if magicdb_loc:
+        _cache.append(magicdb_loc)
+    return magicdb_loc
+
+
+def get_magicdb_buffer(location=None):
+    """
+    Return a ctypes char array with the content of the compiled magic database
+    file at `location` or at the get_magicdb_location() default, or None if
+    there is no such file or it cannot be mapped in memory.
+
+    The file is mapped in memory once per process and kept mapped for the
+    libmagic cookies loaded from it. This is a private copy-on-write mapping:
+    its pages are shared by the processes forked after it was created.
+    """
+    location = location or get_magicdb_location()
+    if not location:
+        return
+    location = os.fsdecode(location)
+    try:
+        return _magicdb_buffers[location]
+    except KeyError:
+        pass
+
+    import ctypes
+
+    with _magicdb_buffers_lock:
+        if location not in _magicdb_buffers:
+            buf = None
+            try:
+                with open(location, "rb") as f:
+                    # libmagic may byte-swap a database in place: use a
+                    # writable copy-on-write mapping
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+                buf = (ctypes.c_char * len(mapped)).from_buffer(mapped)
+            except (OSError, ValueError) as e:
+                if TRACE:
+                    logger_debug("get_magicdb_buffer: cannot map:", location, e)
+            _magicdb_buffers[location] = buf
+        return _magicdb_buffers[location]
+
+
+def warmup():
+    """
+    Load libmagic, map the magic database in memory and read its pages, and
+    create the detector of the current thread. Call this before forking worker
+    processes such that they share these upfront instead of each loading them.
+    """
+    load_libmagic()
+    buf = get_magicdb_buffer()
+    if buf is not None:
+        # read a byte of each page
+        buf[:: mmap.PAGESIZE]
+    get_detector()
+
+
+def mime_type(location, buf=None):
     """ "
     Return the detected mimetype for file at `location` or an empty string if
-    nothing found or an error occurred.
+    nothing found or an error occurred. If `buf` bytes are provided, they must
+    be the whole content of the file and are used instead of reading the file.
     """
     try:
-        return _detect(location, DETECT_MIME)
+        return _detect(location, DETECT_MIME, buf=buf)
     except:
         # TODO: log errors
         return ""
@@ -301,38 +502,218 @@ def encoding(location):
     return _detect(location, DETECT_ENC)
 
 
-def _detect(location, flags):
+def file_info(location, buf=None, with_encoding=True):
+    """
+    Return a tuple of (filetype, mimetype, encoding) strings detected for the
+    file at `location`, each an empty string if nothing found or an error
+    occurred. The encoding is empty if `with_encoding` is False.
+
+    The file is opened once and its descriptor is used for every detection
+    with the same libmagic cookie. If `buf` bytes are provided, they must be
+    the whole content of the file and are used instead of reading the file.
+
+    Empty files, files with the setuid, setgid or sticky mode bits, symlinks
+    and special files are detected from their location instead: libmagic
+    recognizes these from their path only, such as the "inode/x-empty"
+    mimetype of an empty file or the "setuid" filetype prefix.
+    """
+    all_flags = [DETECT_TYPE, DETECT_MIME]
+    if with_encoding:
+        all_flags.append(DETECT_ENC)
+
+    values = None
+    try:
+        detector = get_detector()
+        if buf is not None:
+            values = []
+            for flags in all_flags:
+                detector.set_flags(flags)
+                values.append(decode_value(detector.get_buffer(buf)))
+        else:
+            st = os.lstat(location)
+            special_bits = st.st_mode & (stat.S_ISUID | stat.S_ISGID | stat.S_ISVTX)
+            if stat.S_ISREG(st.st_mode) and st.st_size and not special_bits:
+                with open(location, "rb") as f:
+                    values = []
+                    for flags in all_flags:
+                        detector.set_flags(flags)
+                        values.append(decode_value(detector.get_descriptor(f.fileno())))
+    except Exception:
+        values = None
+
+    if values is None:
+        # detect each using the location
+        values = []
+        for flags in all_flags:
+            try:
+                values.append(_detect(location, flags, buf=buf))
+            except Exception:
+                # TODO: log errors
+                values.append("")
+
+    if not with_encoding:
+        values.append("")
+    return tuple(values)
+
+
+def _detect(location, flags, buf=None):
     """ "
     Return the detected type using `flags` of file at `location` or an empty
-    string. Raise an exception on errors.
+    string. Use the `buf` bytes as the file content if provided. Raise an
+    exception on errors.
     """
-    try:
-        detector = detectors[flags]
-    except KeyError:
-        detector = Detector(flags=flags)
-        detectors[flags] = detector
-    val = detector.get(location)
-    val = val or ""
+    detector = get_detector(flags)
+    if buf is not None:
+        val = detector.get_buffer(buf)
+    else:
+        val = detector.get(location)
+    return decode_value(val)
+
+
+def decode_value(val):
+    """
+    Return a string from a libmagic `val` bytes result with normalized spaces.
+    """
+    val = val or b""
     val = val.decode("ascii", "ignore").strip()
     return " ".join(val.split())
 
 
+def get_profile(name=None):
+    """
+    Return the Profile named `name` or the current Profile of this thread if
+    `name` is not provided. Raise a ValueError for an unknown profile name.
+    """
+    name = name or getattr(_thread_detectors, "profile_name", None) or _profile_name
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown libmagic profile: {name!r}. Use one of: {', '.join(sorted(PROFILES))}"
+        )
+
+
+def set_profile(name):
+    """
+    Use the Profile named `name` by default for the next detections in all
+    threads and return the name of the previous default Profile. Raise a
+    ValueError for an unknown profile name.
+    """
+    global _profile_name
+    get_profile(name)
+    previous = _profile_name
+    _profile_name = name
+    return previous
+
+
+@contextlib.contextmanager
+def profile_scope(name):
+    """
+    Context manager using the Profile named `name` if provided for the
+    detections of the current thread only, for the duration of the block. The
+    Detector of this thread switches to this Profile on its next use. Raise a
+    ValueError for an unknown profile name.
+    """
+    if not name:
+        yield
+        return
+
+    get_profile(name)
+    previous = getattr(_thread_detectors, "profile_name", None)
+    _thread_detectors.profile_name = name
+    try:
+        yield
+    finally:
+        _thread_detectors.profile_name = previous
+
+
+def get_detector(flags=None):
+    """
+    Return the Detector of the current thread, created on first use and set to
+    use `flags` if provided and the current Profile of this thread. The Detector is closed
+    when its thread exits.
+
+    A single Detector and its libmagic cookie with the loaded magic database is
+    used for all the detections of a thread: its flags are changed as needed.
+    """
+    profile = get_profile()
+    detector = getattr(_thread_detectors, "detector", None)
+    if detector is None:
+        detector = _thread_detectors.detector = Detector(
+            flags=flags or DETECT_TYPE, profile=profile
+        )
+    else:
+        detector.set_profile(profile)
+        if flags is not None:
+            detector.set_flags(flags)
+    return detector
+
+
+def close_detectors():
+    """
+    Close and discard the detector of the current thread.
+    """
+    detector = getattr(_thread_detectors, "detector", None)
+    if detector is not None:
+        _thread_detectors.detector = None
+        detector.close()
+
+
 class MagicException(Exception):
     pass
 
 
 class Detector(object):
-    def __init__(self, flags, magic_db_location=None):
+    def __init__(self, flags, magic_db_location=None, profile=None):
         """
         Create a new libmagic detector.
         flags - the libmagic flags
         magic_file - use a mime database other than the vendored default
+        profile - a Profile to use, the "full" libmagic defaults if not provided
         """
+        load_libmagic()
         self.flags = flags
+        self.profile = None
+        self.magic_db_location = magic_db_location
+        self.loaded_db_location = None
+        self.magicdb_buffer = None
         self.cookie = _magic_open(self.flags)
-        if not magic_db_location:
-            # Caveat emptor: this may be empty in which case a default will be tried
-            magic_db_location = get_magicdb_location()
+        self.default_params = self.get_default_params()
+        self.set_profile(profile or PROFILES["full"])
+
+    def get_default_params(self):
+        """
+        Return a mapping of {MAGIC_PARAM_*: default value} for the parameters
+        supported by the loaded libmagic. Older libmagic versions do not
+        support all the parameters, such as libmagic 5.39 that rejects
+        MAGIC_PARAM_ENCODING_MAX.
+        """
+        default_params = {}
+        for param in MAGIC_PARAMS:
+            try:
+                default_params[param] = self.get_param(param)
+            except MagicException:
+                if TRACE:
+                    logger_debug("get_default_params: unsupported param:", param)
+        return default_params
+
+    def load(self, magic_db_location):
+        """
+        Load the magic database at `magic_db_location` replacing any loaded
+        database. Raise a MagicException on error.
+        """
+        self.loaded_db_location = magic_db_location
+
+        # use the process-wide in-memory database if possible: libmagic
+        # references it without copying it
+        self.magicdb_buffer = get_magicdb_buffer(magic_db_location)
+        if self.magicdb_buffer is not None:
+            try:
+                self.load_buffer(self.magicdb_buffer)
+                return
+            except MagicException:
+                # not a compiled database
+                self.magicdb_buffer = None
 
         # Note: this location must always be FS-encoded bytes on all OSes
         if magic_db_location and not isinstance(magic_db_location, bytes):
@@ -340,6 +721,18 @@ class Detector(object):
 
         _magic_load(self.cookie, magic_db_location)
 
+    def load_buffer(self, buf):
+        """
+        Load the compiled magic database from a `buf` ctypes char array that
+        must be kept alive as long as this detector. Raise a MagicException on
+        error.
+        """
+        import ctypes
+
+        buffers = (ctypes.c_void_p * 1)(ctypes.addressof(buf))
+        sizes = (ctypes.c_size_t * 1)(len(buf))
+        _magic_load_buffers(self.cookie, buffers, sizes, 1)
+
     def get(self, location):
         """
         Return the magic type info from a file at `location`. The value
@@ -366,20 +759,90 @@ class Detector(object):
                     buf = fd.read(16384)
                 return _magic_buffer(self.cookie, buf, len(buf))
 
-    def __del__(self):
+    def get_buffer(self, buf):
         """
+        Return the magic type info from the `buf` bytes. Raise a MagicException
+        on error.
+        """
+        return _magic_buffer(self.cookie, buf, len(buf))
+
+    def get_descriptor(self, fd):
+        """
+        Return the magic type info from the open file descriptor `fd`. The
+        descriptor is not closed. Raise a MagicException on error.
+        """
+        return _magic_descriptor(self.cookie, fd)
+
+    def set_flags(self, flags):
+        """
+        Use `flags` for the next detections. Raise a MagicException on error.
+        """
+        if flags != self.flags:
+            _magic_setflags(self.cookie, flags | self.profile.flags)
+            self.flags = flags
+
+    def set_profile(self, profile):
+        """
+        Use the `profile` Profile flags, parameters and magic database for the
+        next detections. Parameters not set by the `profile` are reset to the
+        libmagic defaults. Parameters not supported by the loaded libmagic are
+        ignored. The magic database of the `profile` is used unless this
+        detector was created for a specific magic database. Raise a
+        MagicException on error.
+        """
+        if profile is self.profile:
+            return
+        # Caveat emptor: this may be empty in which case a default will be tried
+        magic_db_location = self.magic_db_location or profile.get_magicdb_location()
+        if self.profile is None or magic_db_location != self.loaded_db_location:
+            self.load(magic_db_location)
+        for param, default in list(self.default_params.items()):
+            try:
+                self.set_param(param, profile.params.get(param, default))
+            except MagicException:
+                # not supported after all: ignore it from now on
+                del self.default_params[param]
+        _magic_setflags(self.cookie, self.flags | profile.flags)
+        self.profile = profile
+
+    def get_param(self, param):
+        """
+        Return the value of the libmagic `param` MAGIC_PARAM_* parameter.
+        Raise a MagicException on error.
+        """
+        import ctypes
+
+        value = ctypes.c_size_t()
+        _magic_getparam(self.cookie, param, ctypes.byref(value))
+        return value.value
+
+    def set_param(self, param, value):
+        """
+        Set the libmagic `param` MAGIC_PARAM_* parameter to `value`. Raise a
+        MagicException on error.
+        """
+        import ctypes
+
+        _magic_setparam(self.cookie, param, ctypes.byref(ctypes.c_size_t(value)))
+
+    def close(self):
+        """
+        Close this detector libmagic cookie.
         During shutdown magic_close may have been cleared already so make sure
         it exists before using it.
         """
-        if self.cookie and _magic_close:
-            _magic_close(self.cookie)
-
+        cookie = getattr(self, "cookie", None)
+        magic_close = globals().get("_magic_close")
+        if cookie and magic_close:
+            magic_close(cookie)
+        self.cookie = None
 
-# Main ctypes proxy
-libmagic = load_lib()
+    def __del__(self):
+        self.close()
 
 
 def libmagic_version():
+    load_libmagic()
     return _magic_version()
 
 
@@ -403,34 +866,128 @@ def check_error(result, func, args):  # NOQA
         return result
 
 
-# ctypes functions aliases.
-_magic_open = libmagic.magic_open
-_magic_open.restype = ctypes.c_void_p
-_magic_open.argtypes = [ctypes.c_int]
-
-_magic_close = libmagic.magic_close
-_magic_close.restype = None
-_magic_close.argtypes = [ctypes.c_void_p]
-
-_magic_error = libmagic.magic_error
-_magic_error.restype = ctypes.c_char_p
-_magic_error.argtypes = [ctypes.c_void_p]
-
-_magic_file = libmagic.magic_file
-_magic_file.restype = ctypes.c_char_p
-_magic_file.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
-_magic_file.errcheck = check_error
-
-_magic_buffer = libmagic.magic_buffer
-_magic_buffer.restype = ctypes.c_char_p
-_magic_buffer.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
-_magic_buffer.errcheck = check_error
+# The libmagic library and its ctypes functions aliases are loaded on first use
+# and then set as these module globals.
+LIBMAGIC_ATTRIBUTES = (
+    "libmagic",
+    "_magic_open",
+    "_magic_close",
+    "_magic_error",
+    "_magic_file",
+    "_magic_buffer",
+    "_magic_descriptor",
+    "_magic_setflags",
+    "_magic_setparam",
+    "_magic_getparam",
+    "_magic_load",
+    "_magic_load_buffers",
+    "_magic_compile",
+    "_magic_version",
+)
+
+_libmagic_lock = threading.Lock()
+
+
+def load_libmagic():
+    """
+    Load the libmagic shared library and define its ctypes functions aliases
+    once. Raise an NoMagicLibError if no libmagic can be found.
+    """
+    if "libmagic" in globals():
+        return
+    with _libmagic_lock:
+        if "libmagic" in globals():
+            return
+        lib = load_lib()
+        set_ctypes_functions(lib)
+        # set last as loaded flag
+        globals()["libmagic"] = lib
 
-_magic_load = libmagic.magic_load
-_magic_load.restype = ctypes.c_int
-_magic_load.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
-_magic_load.errcheck = check_error
 
-_magic_version = libmagic.magic_version
-_magic_version.restype = ctypes.c_int
-_magic_version.argtypes = []
+def set_ctypes_functions(lib):
+    """
+    Define the ctypes functions aliases of a libmagic `lib` as module globals.
+    """
+    import ctypes
+
+    global _magic_open, _magic_close, _magic_error, _magic_file
+    global _magic_buffer, _magic_descriptor, _magic_setflags, _magic_setparam
+    global _magic_getparam, _magic_load, _magic_load_buffers, _magic_compile
+    global _magic_version
+
+    _magic_open = lib.magic_open
+    _magic_open.restype = ctypes.c_void_p
+    _magic_open.argtypes = [ctypes.c_int]
+
+    _magic_close = lib.magic_close
+    _magic_close.restype = None
+    _magic_close.argtypes = [ctypes.c_void_p]
+
+    _magic_error = lib.magic_error
+    _magic_error.restype = ctypes.c_char_p
+    _magic_error.argtypes = [ctypes.c_void_p]
+
+    _magic_file = lib.magic_file
+    _magic_file.restype = ctypes.c_char_p
+    _magic_file.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+    _magic_file.errcheck = check_error
+
+    _magic_buffer = lib.magic_buffer
+    _magic_buffer.restype = ctypes.c_char_p
+    _magic_buffer.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_size_t]
+    _magic_buffer.errcheck = check_error
+
+    _magic_descriptor = lib.magic_descriptor
+    _magic_descriptor.restype = ctypes.c_char_p
+    _magic_descriptor.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    _magic_descriptor.errcheck = check_error
+
+    _magic_setflags = lib.magic_setflags
+    _magic_setflags.restype = ctypes.c_int
+    _magic_setflags.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    _magic_setflags.errcheck = check_error
+
+    _magic_setparam = lib.magic_setparam
+    _magic_setparam.restype = ctypes.c_int
+    _magic_setparam.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p]
+    _magic_setparam.errcheck = check_error
+
+    _magic_getparam = lib.magic_getparam
+    _magic_getparam.restype = ctypes.c_int
+    _magic_getparam.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p]
+    _magic_getparam.errcheck = check_error
+
+    _magic_load = lib.magic_load
+    _magic_load.restype = ctypes.c_int
+    _magic_load.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+    _magic_load.errcheck = check_error
+
+    _magic_load_buffers = lib.magic_load_buffers
+    _magic_load_buffers.restype = ctypes.c_int
+    _magic_load_buffers.argtypes = [
+        ctypes.c_void_p,
+        ctypes.POINTER(ctypes.c_void_p),
+        ctypes.POINTER(ctypes.c_size_t),
+        ctypes.c_size_t,
+    ]
+    _magic_load_buffers.errcheck = check_error
+
+    _magic_compile = lib.magic_compile
+    _magic_compile.restype = ctypes.c_int
+    _magic_compile.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+    _magic_compile.errcheck = check_error
+
+    _magic_version = lib.magic_version
+    _magic_version.restype = ctypes.c_int
+    _magic_version.argtypes = []
+
+
+def __getattr__(name):
+    """
+    Load libmagic on first access to the `libmagic` library or one of its
+    ctypes functions aliases.
+    """
+    if name in LIBMAGIC_ATTRIBUTES:
+        load_libmagic()
+        return globals()[name]
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
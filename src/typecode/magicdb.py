@@ -0,0 +1,315 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import attr
+
+from typecode import magic2
+from typecode.contenttype import classify_filetype
+from typecode.contenttype import is_media_mimetype
+
+"""
+Compile a trimmed libmagic magic database from a selection of the magic rules
+source files and report how the types detected with this trimmed database
+compare with the full magic database, for instance on the test files of
+tests/data/filetest.
+
+A trimmed database has fewer rules to evaluate for each file and is used with
+the "trimmed" typecode.magic2 profile, for scans that only need to recognize
+the common archives, executables, media, documents and text files. Use its
+location in the TYPECODE_LIBMAGIC_TRIMMED_DB_PATH environment variable or
+provide it with a plugin (see typecode.magic2.get_trimmed_magicdb_location).
+
+The magic rules source files are the "magic/Magdir" directory of the "file"
+sources of the same version as the libmagic used with this database. For
+example::
+
+    python -m typecode.magicdb compile file-5.44/magic/Magdir trimmed.mgc
+    python -m typecode.magicdb report trimmed.mgc tests/data/filetest
+"""
+
+# Names of the Magdir magic rules files used in a trimmed magic database,
+# grouped by the kind of files they recognize.
+TRIMMED_MAGIC_FILES = (
+    # archives, compressed files and packages
+    "archive",
+    "compress",
+    "zip",
+    "rpm",
+    "android",
+    "filesystems",
+    # executables
+    "elf",
+    "msdos",
+    "mach",
+    "cafebabe",
+    "java",
+    "wasm",
+    "linux",
+    # media
+    "images",
+    "jpeg",
+    "audio",
+    "animation",
+    "riff",
+    "vorbis",
+    "flac",
+    # documents
+    "pdf",
+    "msooxml",
+    "ole2compounddocs",
+    "rtf",
+    "sgml",
+    # scripts and source code
+    "commands",
+    "python",
+    "perl",
+    "ruby",
+    "javascript",
+    "c-lang",
+    "make",
+)
+
+# Compile a magic rules file in a database file in the current directory, in a
+# subprocess since magic_compile() writes its output in the current directory
+# which is shared by all the threads of a process.
+_COMPILE_SCRIPT = """
+import os
+import sys
+from typecode import magic2
+magic2.load_libmagic()
+cookie = magic2._magic_open(magic2.MAGIC_NONE)
+try:
+    magic2._magic_compile(cookie, os.fsencode(sys.argv[1]))
+finally:
+    magic2._magic_close(cookie)
+"""
+
+
+def get_magic_files(magdir, names=TRIMMED_MAGIC_FILES):
+    """
+    Return a list of the paths to the magic rules files with `names` in the
+    `magdir` Magdir directory, sorted by name as in a full magic database.
+    Raise a FileNotFoundError if any file is missing.
+    """
+    names = sorted(set(names))
+    missing = [name for name in names if not os.path.isfile(os.path.join(magdir, name))]
+    if missing:
+        raise FileNotFoundError(f"Magic rules files not found in {magdir!r}: {', '.join(missing)}")
+    return [os.path.join(magdir, name) for name in names]
+
+
+def compile_magicdb(magic_files, output):
+    """
+    Compile the `magic_files` list of magic rules files paths in a single
+    magic database file at `output` and return `output`. Raise a
+    MagicException on error. The compilation runs in a subprocess and does
+    not change the current directory of this process.
+    """
+    temp_dir = tempfile.mkdtemp(prefix="typecode-magicdb-")
+    try:
+        source = os.path.join(temp_dir, "magic")
+        with open(source, "wb") as out:
+            for magic_file in magic_files:
+                with open(magic_file, "rb") as inp:
+                    shutil.copyfileobj(inp, out)
+                out.write(b"\n")
+
+        # make this typecode package importable in the subprocess
+        env = dict(os.environ)
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(magic2.__file__)))
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [package_dir, env.get("PYTHONPATH")]))
+        process = subprocess.run(
+            [sys.executable, "-c", _COMPILE_SCRIPT, source],
+            cwd=temp_dir,
+            env=env,
+            capture_output=True,
+        )
+        if process.returncode:
+            error = process.stderr.decode("utf-8", errors="replace").strip()
+            raise magic2.MagicException(f"Failed to compile magic database: {error}")
+
+        shutil.move(source + ".mgc", output)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return output
+
+
+def iter_files(locations):
+    """
+    Yield the paths of the files found in the `locations` list of file and
+    directory paths, walking directories recursively in sorted order. Skip
+    symlinks and special files.
+    """
+    for location in locations:
+        if not os.path.isdir(location):
+            if os.path.isfile(location) and not os.path.islink(location):
+                yield location
+            continue
+        for top, dirs, files in os.walk(location):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(top, name)
+                if os.path.isfile(path) and not os.path.islink(path):
+                    yield path
+
+
+@attr.s(slots=True)
+class Detection(object):
+    """
+    The libmagic `filetype` and `mimetype` of a file.
+    """
+
+    filetype = attr.ib(default="")
+    mimetype = attr.ib(default="")
+
+    def get_flags(self):
+        """
+        Return a mapping of the typecode flags derived from this detection.
+        """
+        flags = attr.asdict(classify_filetype(self.filetype))
+        flags["is_media_mimetype"] = is_media_mimetype(self.mimetype)
+        return flags
+
+
+def get_detections(locations, magic_db_location=None):
+    """
+    Return a tuple of ({location: Detection}, elapsed seconds) for the
+    `locations` list of file paths, detected with the libmagic defaults and
+    the magic database at `magic_db_location` or the default database.
+    """
+    detector = magic2.Detector(
+        magic2.DETECT_TYPE,
+        magic_db_location=magic_db_location,
+        profile=magic2.PROFILES["full"],
+    )
+    detections = {}
+    start = time.perf_counter()
+    try:
+        for location in locations:
+            detection = Detection()
+            try:
+                detector.set_flags(magic2.DETECT_TYPE)
+                detection.filetype = magic2.decode_value(detector.get(location))
+                detector.set_flags(magic2.DETECT_MIME)
+                detection.mimetype = magic2.decode_value(detector.get(location))
+            except Exception:
+                pass
+            detections[location] = detection
+    finally:
+        detector.close()
+    return detections, time.perf_counter() - start
+
+
+def get_report(locations, trimmed_db_location, full_db_location=None):
+    """
+    Return a mapping reporting how the types detected with the trimmed magic
+    database at `trimmed_db_location` compare with the types detected with the
+    full database at `full_db_location` (or the default database) for the
+    files found in the `locations` list of file and directory paths.
+
+    The report counts the files with the same filetype, mimetype and typecode
+    flags derived from these, lists the differences and the detection time
+    with each database. Only the differences in flags are likely to change
+    the typecode classification of a file.
+    """
+    files = list(iter_files(locations))
+    full, full_seconds = get_detections(files, full_db_location)
+    trimmed, trimmed_seconds = get_detections(files, trimmed_db_location)
+
+    same_filetype = same_mimetype = same_flags = 0
+    differences = []
+    for location in files:
+        expected = full[location]
+        detected = trimmed[location]
+        same_filetype += expected.filetype == detected.filetype
+        same_mimetype += expected.mimetype == detected.mimetype
+        expected_flags = expected.get_flags()
+        detected_flags = detected.get_flags()
+        changed_flags = sorted(
+            name for name, value in expected_flags.items() if detected_flags[name] != value
+        )
+        same_flags += not changed_flags
+        if expected != detected:
+            differences.append(
+                dict(
+                    location=location,
+                    full=attr.asdict(expected),
+                    trimmed=attr.asdict(detected),
+                    changed_flags=changed_flags,
+                )
+            )
+
+    return dict(
+        files=len(files),
+        same_filetype=same_filetype,
+        same_mimetype=same_mimetype,
+        same_flags=same_flags,
+        full_seconds=round(full_seconds, 3),
+        trimmed_seconds=round(trimmed_seconds, 3),
+        differences=differences,
+    )
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m typecode.magicdb",
+        description="Compile a trimmed libmagic database and report on its correctness.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    compile_cmd = commands.add_parser(
+        "compile",
+        help="Compile a trimmed magic database from a Magdir directory.",
+    )
+    compile_cmd.add_argument("magdir", help="Magdir directory of magic rules files.")
+    compile_cmd.add_argument("output", help="Compiled magic database file to create.")
+    compile_cmd.add_argument(
+        "--rules",
+        nargs="+",
+        default=TRIMMED_MAGIC_FILES,
+        help="Names of the Magdir magic rules files to use (default: %(default)s).",
+    )
+
+    report_cmd = commands.add_parser(
+        "report",
+        help="Compare the types detected with a trimmed and the full magic databases.",
+    )
+    report_cmd.add_argument("trimmed_db", help="Trimmed compiled magic database file.")
+    report_cmd.add_argument("locations", nargs="+", help="Files and directories to detect.")
+    report_cmd.add_argument(
+        "--full-db",
+        default=None,
+        help="Full compiled magic database file (default: the typecode magic database).",
+    )
+
+    args = parser.parse_args(args)
+    if args.command == "compile":
+        magic_files = get_magic_files(args.magdir, args.rules)
+        compile_magicdb(magic_files, args.output)
+        print(f"Compiled {len(magic_files)} magic rules files in: {args.output}")
+        return 0
+
+    full_db = args.full_db or magic2.get_magicdb_location()
+    report = get_report(args.locations, args.trimmed_db, full_db)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+    return 0 if report["same_flags"] == report["files"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import struct
+
+import attr
+
+"""
+A small and bounded reader for the headers of Windows PE/COFF executables and
+DLLs to get their architecture, subsystem, DLL flag and .NET CLR header
+presence without calling libmagic.
+
+Only the DOS header, the PE signature, the COFF header and the start of the
+optional header are read: a few hundred bytes at most.
+"""
+
+# Tracing flag
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+DOS_MAGIC = b"MZ"
+PE_SIGNATURE = b"PE\x00\x00"
+
+# The PE header is not read if its offset in the file is larger than this
+MAX_PE_OFFSET = 64 * 1024
+
+# Size of the COFF header that follows the PE signature
+COFF_HEADER_SIZE = 20
+
+# The optional header is read up to and including the CLR data directory
+CLR_DIRECTORY_INDEX = 14
+OPTIONAL_HEADER_MAGICS = {
+    # magic: (bits, offset of the data directories in the optional header)
+    0x10B: (32, 96),
+    0x20B: (64, 112),
+}
+MAX_OPTIONAL_HEADER_SIZE = 112 + (CLR_DIRECTORY_INDEX + 1) * 8
+
+IMAGE_FILE_EXECUTABLE_IMAGE = 0x0002
+IMAGE_FILE_DLL = 0x2000
+
+# Machine to libmagic-like names for the common machines
+MACHINE_NAMES = {
+    0x014C: "Intel 80386",
+    0x0162: "MIPS R3000",
+    0x0166: "MIPS R4000",
+    0x01C0: "ARM",
+    0x01C2: "ARM Thumb",
+    0x01C4: "ARMv7 Thumb",
+    0x01F0: "PowerPC",
+    0x0200: "Intel Itanium",
+    0x5032: "RISC-V 32-bit",
+    0x5064: "RISC-V 64-bit",
+    0x8664: "x86-64",
+    0xAA64: "Aarch64",
+}
+
+SUBSYSTEM_NAMES = {
+    1: "native",
+    2: "GUI",
+    3: "console",
+    7: "POSIX",
+    9: "Windows CE GUI",
+    10: "EFI application",
+    11: "EFI boot service driver",
+    12: "EFI runtime driver",
+    13: "EFI ROM",
+    14: "XBOX",
+    16: "Boot application",
+}
+
+
+@attr.s(slots=True, frozen=True)
+class PeInfo(object):
+    """
+    Information from the headers of a Windows PE executable or DLL.
+    """
+
+    bits = attr.ib()
+    machine = attr.ib()
+    characteristics = attr.ib()
+    subsystem = attr.ib()
+    sections_count = attr.ib()
+    is_managed = attr.ib(default=False)
+
+    @property
+    def machine_name(self):
+        """
+        Return a libmagic-like name for this PE machine.
+        """
+        return MACHINE_NAMES.get(self.machine, "unknown arch 0x%x" % self.machine)
+
+    @property
+    def subsystem_name(self):
+        """
+        Return a libmagic-like name for this PE subsystem.
+        """
+        return SUBSYSTEM_NAMES.get(self.subsystem, "unknown subsystem 0x%x" % self.subsystem)
+
+    @property
+    def is_dll(self):
+        return bool(self.characteristics & IMAGE_FILE_DLL)
+
+    @property
+    def is_executable(self):
+        return bool(self.characteristics & IMAGE_FILE_EXECUTABLE_IMAGE)
+
+
+def get_pe_info(location, head=None):
+    """
+    Return a PeInfo for the PE file at `location` or None if this is not a
+    valid PE file. Use the `head` bytes as the start of the file if provided.
+    """
+    if head is None or len(head) < 64:
+        with open(location, "rb") as f:
+            head = f.read(64)
+    if not head.startswith(DOS_MAGIC) or len(head) < 64:
+        return
+
+    pe_offset = struct.unpack_from("<I", head, 0x3C)[0]
+    if pe_offset < 64 or pe_offset > MAX_PE_OFFSET:
+        return
+
+    header_size = len(PE_SIGNATURE) + COFF_HEADER_SIZE + MAX_OPTIONAL_HEADER_SIZE
+    header = head[pe_offset : pe_offset + header_size]
+    if len(header) < header_size:
+        try:
+            with open(location, "rb") as f:
+                f.seek(pe_offset)
+                header = f.read(header_size)
+        except (IOError, OSError) as e:
+            if TRACE:
+                logger_debug("get_pe_info: failed for:", location, e)
+            return
+
+    return parse_pe_header(header)
+
+
+def parse_pe_header(header):
+    """
+    Return a PeInfo for a PE `header` bytes starting with the PE signature or
+    None if this is not a valid PE header.
+    """
+    if not header.startswith(PE_SIGNATURE):
+        return
+    coff_end = len(PE_SIGNATURE) + COFF_HEADER_SIZE
+    if len(header) < coff_end + 2:
+        return
+    (
+        machine,
+        sections_count,
+        _timestamp,
+        _symbols_offset,
+        _symbols_count,
+        optional_header_size,
+        characteristics,
+    ) = struct.unpack_from("<HHIIIHH", header, len(PE_SIGNATURE))
+
+    optional_header = header[coff_end : coff_end + optional_header_size]
+    if len(optional_header) < 70:
+        return
+    magic = struct.unpack_from("<H", optional_header)[0]
+    if magic not in OPTIONAL_HEADER_MAGICS:
+        return
+    bits, directories_offset = OPTIONAL_HEADER_MAGICS[magic]
+    subsystem = struct.unpack_from("<H", optional_header, 68)[0]
+
+    is_managed = False
+    clr_offset = directories_offset + CLR_DIRECTORY_INDEX * 8
+    if len(optional_header) >= clr_offset + 8:
+        directories_count = struct.unpack_from("<I", optional_header, directories_offset - 4)[0]
+        if directories_count > CLR_DIRECTORY_INDEX:
+            clr_address, clr_size = struct.unpack_from("<II", optional_header, clr_offset)
+            is_managed = bool(clr_address and clr_size)
+
+    return PeInfo(
+        bits=bits,
+        machine=machine,
+        characteristics=characteristics,
+        subsystem=subsystem,
+        sections_count=sections_count,
+        is_managed=is_managed,
+    )
@@ -17,12 +17,18 @@ import re
 import sys
 import types
 import fnmatch
+import threading
+from functools import lru_cache
+from hashlib import blake2b
 from os.path import basename
 
 from typecode.pygments_lexers_mapping import LEXERS
+from typecode.pygments_lexers_metadata import LEXERS_METADATA
 from typecode._vendor.pygments.modeline import get_filetype_from_buffer
 from typecode._vendor.pygments.plugin import find_plugin_lexers
 from typecode._vendor.pygments.util import ClassNotFound, guess_decode
+from typecode._vendor.pygments.util import shebang_matches
+from typecode._vendor.pygments.util import split_path_re
 
 COMPAT = {
     "Python3Lexer": "PythonLexer",
@@ -35,6 +41,8 @@ __all__ = (
         "get_lexer_for_filename",
         "find_lexer_class",
         "guess_lexer",
+        "guess_lexer_class",
+        "guess_lexer_name",
         "load_lexer_from_file",
     ]
     + list(LEXERS)
@@ -53,6 +61,170 @@ def _fn_matches(fn, glob):
     return _pattern_cache[glob].match(fn)
 
 
+# Characters that make a filename pattern a glob rather than an exact name
+GLOB_CHARS = frozenset("*?[")
+
+# Maximum number of file names for which the matching lexers are memoized
+FILENAME_CACHE_SIZE = 16 * 1024
+
+
+class FilenameIndex(object):
+    """
+    An index of the filename patterns of all lexers to find the lexers that
+    match a file name without matching every pattern:
+
+    - `exact` maps a plain file name such as "Makefile" to its lexers,
+    - `suffixes` maps a file extension suffix such as ".c" or ".tar.gz" for
+      "*.c" or "*.tar.gz" patterns to its lexers,
+    - `globs` is a list of the remaining true glob patterns.
+
+    Each lexer is a tuple of (order, lexer, pattern) where `lexer` is either
+    the LEXERS key of a builtin lexer or a plugin lexer class.
+    """
+
+    def __init__(self, lexers):
+        self.exact = {}
+        self.suffixes = {}
+        self.globs = []
+        for order, (lexer, pattern) in enumerate(lexers):
+            entry = order, lexer, pattern
+            if not GLOB_CHARS.intersection(pattern):
+                self.exact.setdefault(pattern, []).append(entry)
+            elif pattern.startswith("*.") and not GLOB_CHARS.intersection(pattern[1:]):
+                self.suffixes.setdefault(pattern[1:], []).append(entry)
+            else:
+                self.globs.append(entry)
+
+    def get_matches(self, fn):
+        """
+        Return a list of (order, lexer, pattern) for the lexers whose filename
+        patterns match the `fn` file name, in the lexers and patterns order.
+        """
+        matches = list(self.exact.get(fn, ()))
+        dot = fn.find(".")
+        while dot != -1:
+            matches.extend(self.suffixes.get(fn[dot:], ()))
+            dot = fn.find(".", dot + 1)
+        matches.extend(entry for entry in self.globs if _fn_matches(fn, entry[2]))
+        matches.sort()
+        return matches
+
+
+_plugin_lexers = None
+_filename_index = None
+_index_lock = threading.Lock()
+
+
+def get_plugin_lexers():
+    """
+    Return a list of plugin lexer classes, loaded once from the setuptools
+    entrypoints on first use.
+    """
+    global _plugin_lexers
+    if _plugin_lexers is None:
+        with _index_lock:
+            if _plugin_lexers is None:
+                _plugin_lexers = list(find_plugin_lexers())
+    return _plugin_lexers
+
+
+def get_filename_index():
+    """
+    Return the FilenameIndex of the builtin and plugin lexers, built once on
+    first use.
+    """
+    global _filename_index
+    if _filename_index is None:
+        plugins = get_plugin_lexers()
+        with _index_lock:
+            if _filename_index is None:
+                lexers = [
+                    (key, filename)
+                    for key, (_, _, _, filenames, _) in LEXERS.items()
+                    for filename in filenames
+                ]
+                lexers.extend((cls, filename) for cls in plugins for filename in cls.filenames)
+                _filename_index = FilenameIndex(lexers)
+    return _filename_index
+
+
+def clear_filename_index():
+    """
+    Clear the filename index, the snapshot of plugin lexers and the memoized
+    lexers by file name such that these are rebuilt on next use.
+    """
+    global _plugin_lexers, _filename_index
+    with _index_lock:
+        _plugin_lexers = None
+        _filename_index = None
+    _get_filename_matches.cache_clear()
+    _find_lexer_for_basename.cache_clear()
+    _guess_lexer_by_digest.cache_clear()
+
+
+# The lexers used for detection are either the LEXERS key of a builtin lexer
+# or a plugin lexer class. The module of a builtin lexer is loaded only when its
+# class is needed: its name and its metadata come from LEXERS and
+# LEXERS_METADATA.
+
+
+def _get_lexer_class(lexer):
+    """
+    Return a lexer class given a builtin lexer key or plugin lexer class
+    `lexer`, loading the builtin lexer module as needed.
+    """
+    if isinstance(lexer, str):
+        modname, name = LEXERS[lexer][:2]
+        if name not in _lexer_cache:
+            _load_lexers(modname)
+        return _lexer_cache[name]
+    return lexer
+
+
+def get_lexer_name(lexer):
+    """
+    Return the name of a builtin lexer key or plugin lexer class `lexer`
+    without loading the builtin lexer module.
+    """
+    if isinstance(lexer, str):
+        return LEXERS[lexer][1]
+    return lexer.name
+
+
+def _get_priority(lexer):
+    """
+    Return a tuple of (priority, class name) for a builtin lexer key or plugin
+    lexer class `lexer` without loading the builtin lexer module.
+    """
+    if isinstance(lexer, str):
+        return LEXERS_METADATA[lexer][0], lexer
+    return lexer.priority, lexer.__name__
+
+
+def _find_lexer_by_alias(_alias):
+    """
+    Return a builtin lexer key or plugin lexer class for an alias or None.
+    Like `find_lexer_class_by_name`, but does not load the lexer module.
+    """
+    if not _alias:
+        return
+    _alias = _alias.lower()
+    for key, (_, _, aliases, _, _) in LEXERS.items():
+        if _alias in aliases:
+            return key
+    for cls in get_plugin_lexers():
+        if _alias in cls.aliases:
+            return cls
+
+
+@lru_cache(maxsize=FILENAME_CACHE_SIZE)
+def _get_filename_matches(fn):
+    """
+    Return a tuple of (lexer, pattern) matching the `fn` file name.
+    """
+    return tuple((lexer, pattern) for _, lexer, pattern in get_filename_index().get_matches(fn))
+
+
 def _load_lexers(module_name):
     """Load a lexer (and all others in the module too)."""
     mod = __import__(module_name, None, None, ["__all__"])
@@ -68,7 +240,7 @@ def get_all_lexers():
     """
     for item in LEXERS.values():
         yield item[1:]
-    for lexer in find_plugin_lexers():
+    for lexer in get_plugin_lexers():
         yield lexer.name, lexer.aliases, lexer.filenames, lexer.mimetypes
 
 
@@ -86,7 +258,7 @@ def find_lexer_class(name):
             _load_lexers(module_name)
             return _lexer_cache[name]
     # continue with lexers from setuptools entrypoints
-    for cls in find_plugin_lexers():
+    for cls in get_plugin_lexers():
         if cls.name == name:
             return cls
 
@@ -108,7 +280,7 @@ def find_lexer_class_by_name(_alias):
                 _load_lexers(module_name)
             return _lexer_cache[name]
     # continue with lexers from setuptools entrypoints
-    for cls in find_plugin_lexers():
+    for cls in get_plugin_lexers():
         if _alias.lower() in cls.aliases:
             return cls
     raise ClassNotFound("no lexer for alias %r found" % _alias)
@@ -130,7 +302,7 @@ def get_lexer_by_name(_alias, **options):
                 _load_lexers(module_name)
             return _lexer_cache[name](**options)
     # continue with lexers from setuptools entrypoints
-    for cls in find_plugin_lexers():
+    for cls in get_plugin_lexers():
         if _alias.lower() in cls.aliases:
             return cls(**options)
     raise ClassNotFound("no lexer for alias %r found" % _alias)
@@ -180,19 +352,12 @@ def find_lexer_class_for_filename(_fn, code=None):
 
     Returns None if not found.
     """
-    matches = []
     fn = basename(_fn)
-    for modname, name, _, filenames, _ in LEXERS.values():
-        for filename in filenames:
-            if _fn_matches(fn, filename):
-                if name not in _lexer_cache:
-                    _load_lexers(modname)
-                matches.append((_lexer_cache[name], filename))
-    for cls in find_plugin_lexers():
-        for filename in cls.filenames:
-            if _fn_matches(fn, filename):
-                matches.append((cls, filename))
+    if not code:
+        lexer = _find_lexer_for_basename(fn)
+        return lexer and _get_lexer_class(lexer)
 
+    matches = [(_get_lexer_class(lexer), pattern) for lexer, pattern in _get_filename_matches(fn)]
     if isinstance(code, bytes):
         # decode it, since all analyse_text functions expect unicode
         code = guess_decode(code)
@@ -205,9 +370,7 @@ def find_lexer_class_for_filename(_fn, code=None):
         # the Lexer class.  The default implementation returns None which
         # gets turned into 0.0.  Run scripts/detect_missing_analyse_text.py
         # to find lexers which need it overridden.
-        if code:
-            return cls.analyse_text(code) + bonus, cls.__name__
-        return cls.priority + bonus, cls.__name__
+        return cls.analyse_text(code) + bonus, cls.__name__
 
     if matches:
         matches.sort(key=get_rating)
@@ -215,6 +378,35 @@ def find_lexer_class_for_filename(_fn, code=None):
         return matches[-1][0]
 
 
+def find_lexer_name_for_filename(_fn):
+    """
+    Return the name of the lexer for a filename or None. Like
+    `find_lexer_class_for_filename` without code, but does not load the lexer
+    module.
+    """
+    lexer = _find_lexer_for_basename(basename(_fn))
+    return lexer and get_lexer_name(lexer)
+
+
+@lru_cache(maxsize=FILENAME_CACHE_SIZE)
+def _find_lexer_for_basename(fn):
+    """
+    Return the best lexer for the `fn` file name using the lexers priority or
+    None.
+    """
+
+    def get_rating(info):
+        lexer, filename = info
+        priority, name = _get_priority(lexer)
+        # explicit patterns get a bonus
+        bonus = "*" not in filename and 0.5 or 0
+        return priority + bonus, name
+
+    matches = _get_filename_matches(fn)
+    if matches:
+        return sorted(matches, key=get_rating)[-1][0]
+
+
 def get_lexer_for_filename(_fn, code=None, **options):
     """
     Get a lexer for a filename.
@@ -241,7 +433,7 @@ def get_lexer_for_mimetype(_mime, **options):
             if name not in _lexer_cache:
                 _load_lexers(modname)
             return _lexer_cache[name](**options)
-    for cls in find_plugin_lexers():
+    for cls in get_plugin_lexers():
         if _mime in cls.mimetypes:
             return cls(**options)
     raise ClassNotFound("no lexer for mimetype %r found" % _mime)
@@ -255,7 +447,7 @@ def _iter_lexerclasses(plugins=True):
             _load_lexers(module_name)
         yield _lexer_cache[name]
     if plugins:
-        yield from find_plugin_lexers()
+        yield from get_plugin_lexers()
 
 
 def guess_lexer_for_filename(_fn, _text, **options):
@@ -309,9 +501,159 @@ def guess_lexer_for_filename(_fn, _text, **options):
     return result[-1][1](**options)
 
 
-def guess_lexer(_text, **options):
-    """Guess a lexer by strong distinctions in the text (eg, shebang)."""
+# Prefilters for the builtin lexers that have an ``analyse_text()`` function as
+# listed in LEXERS_METADATA. Each accepts a TextClues and returns False if the
+# lexer ``analyse_text()`` cannot return a non-zero rating for this text, such
+# that the lexer module does not need to be loaded and its ``analyse_text()``
+# does not need to run. Other builtin lexers use the default
+# ``analyse_text()`` that always returns 0.
+ANALYSE_TEXT_PREFILTERS = {
+    "AntlrLexer": lambda clues: "grammar" in clues.text,
+    "BashLexer": lambda clues: "sh" in clues.interpreter or clues.text.startswith("$ "),
+    "CLexer": lambda clues: "#include" in clues.text or "#if" in clues.text,
+    "CMakeLexer": lambda clues: "cmake_minimum_required" in clues.lowered,
+    "CSharpAspxLexer": lambda clues: "c#" in clues.lowered,
+    "CppLexer": lambda clues: "#include <" in clues.text or "using namespace " in clues.text,
+    "ErbLexer": lambda clues: "<%" in clues.text,
+    "FSharpLexer": lambda clues: "|>" in clues.text or "<|" in clues.text,
+    "ForthLexer": lambda clues: "\n:" in clues.text,
+    "GasLexer": lambda clues: clues.text.startswith(".") or "\n." in clues.text,
+    "GroovyLexer": lambda clues: "groovy" in clues.interpreter,
+    "HaxeLexer": lambda clues: ":" in clues.text,
+    "HtmlLexer": lambda clues: "<!" in clues.text,
+    "JspLexer": lambda clues: "<" in clues.text,
+    # Nasm analyse_text() always returns 0 and only excludes TASM code
+    "NasmLexer": lambda clues: False,
+    "ObjectiveCLexer": lambda clues: "@" in clues.text or "[" in clues.text,
+    "ObjectiveCppLexer": lambda clues: "@" in clues.text or "[" in clues.text,
+    "PhpLexer": lambda clues: "php" in clues.interpreter or "<?" in clues.text,
+    "PythonLexer": lambda clues: "python" in clues.interpreter,
+    "RubyLexer": lambda clues: "ruby" in clues.interpreter,
+    "TasmLexer": lambda clues: clues.lowered.startswith("proc"),
+    "TclLexer": lambda clues: "tcl" in clues.interpreter,
+    "VbNetAspxLexer": lambda clues: "vb" in clues.lowered,
+    "VbNetLexer": lambda clues: (
+        "#If" in clues.text or "Module" in clues.text or "Namespace" in clues.text
+    ),
+    "VerilogLexer": lambda clues: (
+        "reg" in clues.text or "wire" in clues.text or "assign" in clues.text
+    ),
+}
+
+# Builtin lexers whose ``analyse_text()`` only checks if the shebang matches
+# this regex: these are rated without loading their module.
+SHEBANG_LEXERS = {
+    "GroovyLexer": r"groovy",
+    "PythonLexer": r"pythonw?(3(\.\d)?)?",
+    "RubyLexer": r"ruby(1\.\d)?",
+    "TclLexer": r"(tcl)",
+}
+
+# Maximum number of guessed lexers memoized by text digest
+GUESS_CACHE_SIZE = 4 * 1024
+
+
+class TextClues(object):
+    """
+    Cheap clues computed once from a text to prefilter the lexers that may
+    recognize this text: the lowercased `text` and the shebang `interpreter`.
+    """
+
+    __slots__ = ("text", "lowered", "interpreter")
+
+    def __init__(self, text):
+        self.text = text
+        self.lowered = text.lower()
+        self.interpreter = get_shebang_interpreter(self.lowered)
+
+
+def get_shebang_interpreter(text):
+    """
+    Return the interpreter of a "#!" shebang first line in `text` the same way
+    as ``shebang_matches()`` finds it or an empty string.
+    """
+    if not text.startswith("#!"):
+        return ""
+    first_line = text.partition("\n")[0]
+    words = [x for x in split_path_re.split(first_line[2:].strip()) if x and not x.startswith("-")]
+    return words and words[-1] or ""
+
+
+def get_candidate_lexers(text):
+    """
+    Return an iterator over the builtin lexer keys and plugin lexer classes
+    that may recognize `text`, in the same order as ``_iter_lexerclasses()``.
+    Plugin lexers are always candidates.
+    """
+    clues = TextClues(text)
+    for key in sorted(ANALYSE_TEXT_PREFILTERS):
+        if ANALYSE_TEXT_PREFILTERS[key](clues):
+            yield key
+    yield from get_plugin_lexers()
+
+
+def _analyse_text(lexer, text):
+    """
+    Return the ``analyse_text()`` rating of `text` for a builtin lexer key or
+    plugin lexer class `lexer`. Only load the builtin lexer module if needed.
+    """
+    if lexer in SHEBANG_LEXERS:
+        return shebang_matches(text, SHEBANG_LEXERS[lexer]) and 1.0 or 0.0
+    return _get_lexer_class(lexer).analyse_text(text)
+
+
+class _UnhashedText(object):
+    """
+    A text argument of a memoized function that is not part of its cache key.
+    """
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+    def __hash__(self):
+        return 0
 
+    def __eq__(self, other):
+        return isinstance(other, _UnhashedText)
+
+
+@lru_cache(maxsize=GUESS_CACHE_SIZE)
+def _guess_lexer_by_digest(digest, text):
+    """
+    Return a guessed builtin lexer key or plugin lexer class or None for the
+    `text` _UnhashedText with a `digest`, memoized by `digest`.
+    """
+    _text, text.text = text.text, None
+    return _analyse_lexers(_text)
+
+
+def guess_lexer_class(_text, **options):
+    """
+    Guess a lexer class by strong distinctions in the text (eg, shebang).
+
+    Like `guess_lexer`, but does not instantiate the class. Only the lexers
+    that pass their ``ANALYSE_TEXT_PREFILTERS`` prefilter analyse the text and
+    the guessed lexer is memoized by a digest of the text.
+    """
+    return _get_lexer_class(_guess_lexer(_text, **options))
+
+
+def guess_lexer_name(_text, **options):
+    """
+    Guess the name of a lexer by strong distinctions in the text. Like
+    `guess_lexer_class`, but load only the modules of the lexers that need to
+    analyse the text.
+    """
+    return get_lexer_name(_guess_lexer(_text, **options))
+
+
+def _guess_lexer(_text, **options):
+    """
+    Return a guessed builtin lexer key or plugin lexer class for `_text`, using
+    the memoized lexer if any. Raise ClassNotFound if not found.
+    """
     if not isinstance(_text, str):
         inencoding = options.get("inencoding", options.get("encoding"))
         if inencoding:
@@ -319,25 +661,41 @@ def guess_lexer(_text, **options):
         else:
             _text, _ = guess_decode(_text)
 
+    digest = blake2b(_text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+    lexer = _guess_lexer_by_digest(digest, _UnhashedText(_text))
+    if lexer is None:
+        raise ClassNotFound("no lexer matching the text found")
+    return lexer
+
+
+def _analyse_lexers(_text):
+    """
+    Return a guessed builtin lexer key or plugin lexer class for the `_text`
+    string or None.
+    """
     # try to get a vim modeline first
     ft = get_filetype_from_buffer(_text)
 
     if ft is not None:
-        try:
-            return get_lexer_by_name(ft, **options)
-        except ClassNotFound:
-            pass
+        lexer = _find_lexer_by_alias(ft)
+        if lexer is not None:
+            return lexer
 
     best_lexer = [0.0, None]
-    for lexer in _iter_lexerclasses():
-        rv = lexer.analyse_text(_text)
+    for lexer in get_candidate_lexers(_text):
+        rv = _analyse_text(lexer, _text)
         if rv == 1.0:
-            return lexer(**options)
+            return lexer
         if rv > best_lexer[0]:
             best_lexer[:] = (rv, lexer)
     if not best_lexer[0] or best_lexer[1] is None:
-        raise ClassNotFound("no lexer matching the text found")
-    return best_lexer[1](**options)
+        return
+    return best_lexer[1]
+
+
+def guess_lexer(_text, **options):
+    """Guess a lexer by strong distinctions in the text (eg, shebang)."""
+    return guess_lexer_class(_text, **options)(**options)
 
 
 class _automodule(types.ModuleType):
@@ -0,0 +1,111 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+"""
+LEXERS_METADATA is the metadata of the lexers of
+typecode.pygments_lexers_mapping.LEXERS that is needed to detect a lexer by
+file name or content without importing the lexer module. This is a mapping of
+lexer class name to a tuple of (priority, has its own analyse_text function).
+
+This file is generated by itself. Everytime you change the LEXERS mapping or a
+vendored lexer, run this script to update it.
+
+Do not alter the LEXERS_METADATA dictionary by hand.
+"""
+
+LEXERS_METADATA = {
+    "ABAPLexer": (0, False),
+    "AntlrLexer": (0, True),
+    "AspectJLexer": (0, False),
+    "BashLexer": (0, True),
+    "BatchLexer": (0, False),
+    "CLexer": (0.1, True),
+    "CMakeLexer": (0, True),
+    "CSharpAspxLexer": (0, True),
+    "CSharpLexer": (0, False),
+    "ClojureLexer": (0, False),
+    "ClojureScriptLexer": (0, False),
+    "CobolLexer": (0, False),
+    "CoffeeScriptLexer": (0, False),
+    "CommonLispLexer": (0, False),
+    "CppLexer": (0.1, True),
+    "CssLexer": (0, False),
+    "CythonLexer": (0, False),
+    "DartLexer": (0, False),
+    "Dasm16Lexer": (0, False),
+    "DelphiLexer": (0, False),
+    "ElixirLexer": (0, False),
+    "ElmLexer": (0, False),
+    "ErbLexer": (0, True),
+    "ErlangLexer": (0, False),
+    "FSharpLexer": (0, True),
+    "ForthLexer": (0, True),
+    "FortranFixedLexer": (0, False),
+    "FortranLexer": (0, False),
+    "GasLexer": (0, True),
+    "GoLexer": (0, False),
+    "GroovyLexer": (0, True),
+    "HaskellLexer": (0, False),
+    "HaxeLexer": (0, True),
+    "HtmlLexer": (0, True),
+    "JavaLexer": (0, False),
+    "JavascriptLexer": (0, False),
+    "JspLexer": (0, True),
+    "KotlinLexer": (0, False),
+    "LuaLexer": (0, False),
+    "NasmLexer": (1.0, True),
+    "ObjectiveCLexer": (0.05, True),
+    "ObjectiveCppLexer": (0.05, True),
+    "OcamlLexer": (0, False),
+    "PhpLexer": (0, True),
+    "PowerShellLexer": (0, False),
+    "PythonLexer": (0, True),
+    "RubyLexer": (0, True),
+    "RustLexer": (0, False),
+    "SassLexer": (0, False),
+    "ScalaLexer": (0, False),
+    "ScssLexer": (0, False),
+    "SwiftLexer": (0, False),
+    "TasmLexer": (0, True),
+    "TclLexer": (0, True),
+    "TcshLexer": (0, False),
+    "ThriftLexer": (0, False),
+    "TypeScriptLexer": (0.5, False),
+    "VBScriptLexer": (0, False),
+    "VbNetAspxLexer": (0, True),
+    "VbNetLexer": (0, True),
+    "VerilogLexer": (0, True),
+    "VhdlLexer": (0, False),
+}
+
+if __name__ == "__main__":  # pragma: no cover
+    from typecode._vendor.pygments.lexer import Lexer
+    from typecode.pygments_lexers_mapping import LEXERS
+
+    found_lexers = []
+    for lexer_name, (module_name, name, _, _, _) in sorted(LEXERS.items()):
+        module = __import__(module_name, None, None, [lexer_name])
+        lexer = getattr(module, lexer_name)
+        assert lexer.__name__ == lexer_name
+        assert lexer.name == name
+        has_analyse_text = lexer.analyse_text is not Lexer.analyse_text
+        # formatted as the code formatter does, with double quotes
+        found_lexers.append('"%s": %r' % (lexer_name, (lexer.priority, has_analyse_text)))
+
+    with open(__file__) as fp:
+        content = fp.read().replace("\r\n", "\n")
+    header = content[: content.find("LEXERS_METADATA = {")]
+    footer = content[content.find('if __name__ == "__main__":') :]
+
+    with open(__file__, "w") as fp:
+        fp.write(header)
+        fp.write("LEXERS_METADATA = {\n    %s,\n}\n\n" % ",\n    ".join(found_lexers))
+        fp.write(footer)
+
+    print("=== %d lexers processed." % len(found_lexers))
@@ -0,0 +1,401 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import functools
+import struct
+import tarfile
+
+import attr
+
+from typecode import magic2
+
+"""
+A small table-driven engine to recognize a few common file formats from the
+first bytes of a file, returning the same filetype and mimetype strings as
+libmagic without calling libmagic.
+
+Only formats whose libmagic description is fully determined by a few fixed
+header fields are supported. For anything else, or when a header is not
+exactly as expected, no signature is confident and libmagic must be used.
+
+Since libmagic descriptions vary across libmagic versions and magic databases,
+each signature is verified against the installed libmagic with a few sample
+headers on first use, and signatures that do not agree are not used.
+"""
+
+# Tracing flag
+TRACE = False
+
+
+def logger_debug(*args):
+    pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(" ".join(isinstance(a, str) and a or repr(a) for a in args))
+
+
+@attr.s(slots=True, frozen=True)
+class Signature(object):
+    """
+    A file format signature: a `magic` bytes string found at `offset` in a
+    file head and a `describe` function returning the libmagic filetype for
+    a file head or None if not confident. `samples` are file heads used to
+    verify that the signature agrees with the installed libmagic.
+    """
+
+    name = attr.ib()
+    magic = attr.ib()
+    offset = attr.ib()
+    mimetype = attr.ib()
+    describe = attr.ib()
+    samples = attr.ib(default=())
+
+    def matches(self, head):
+        """
+        Return True if the `head` bytes start with this signature magic.
+        """
+        return head.startswith(self.magic, self.offset)
+
+
+PNG_COLOR_TYPES = {
+    # color type: (description, allowed bit depths)
+    0: ("grayscale", (1, 2, 4, 8, 16)),
+    2: ("/color RGB", (8, 16)),
+    3: ("colormap", (1, 2, 4, 8)),
+    4: ("gray+alpha", (8, 16)),
+    6: ("/color RGBA", (8, 16)),
+}
+
+
+def describe_png(head):
+    """
+    Return a PNG filetype description for `head` bytes or None.
+    """
+    if len(head) < 41 or head[12:16] != b"IHDR":
+        return
+    width, height, depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", head[16:29])
+    if width >= 2**31 or height >= 2**31 or interlace not in (0, 1):
+        return
+    if color_type not in PNG_COLOR_TYPES:
+        return
+    color, depths = PNG_COLOR_TYPES[color_type]
+    if depth not in depths:
+        return
+    if head[37:41] in (b"acTL", b"CgBI"):
+        # animated or Apple PNGs have other descriptions
+        return
+    if color.startswith("/"):
+        color = "%d-bit%s" % (depth, color)
+    else:
+        color = "%d-bit %s" % (depth, color)
+    interlace = interlace and "interlaced" or "non-interlaced"
+    return "PNG image data, %d x %d, %s, %s" % (width, height, color, interlace)
+
+
+def describe_gif(head):
+    """
+    Return a GIF filetype description for `head` bytes or None.
+    """
+    if len(head) < 10:
+        return
+    version = head[3:6]
+    if version not in (b"87a", b"89a"):
+        return
+    width, height = struct.unpack("<HH", head[6:10])
+    return "GIF image data, version %s, %d x %d" % (version.decode("ascii"), width, height)
+
+
+def describe_bzip2(head):
+    """
+    Return a bzip2 filetype description for `head` bytes or None.
+    """
+    if len(head) < 4 or not b"1" <= head[3:4] <= b"9":
+        return
+    return "bzip2 compressed data, block size = %s00k" % head[3:4].decode("ascii")
+
+
+XZ_CHECKS = {
+    0: "NONE",
+    1: "CRC32",
+    4: "CRC64",
+    10: "SHA-256",
+}
+
+
+def describe_xz(head):
+    """
+    Return an XZ filetype description for `head` bytes or None.
+    """
+    if len(head) < 8 or head[7] not in XZ_CHECKS:
+        return
+    return "XZ compressed data, checksum %s" % XZ_CHECKS[head[7]]
+
+
+def describe_7z(head):
+    """
+    Return a 7-zip filetype description for `head` bytes or None.
+    """
+    if len(head) < 8:
+        return
+    return "7-zip archive data, version %d.%d" % (head[6], head[7])
+
+
+def describe_zstd(head):
+    """
+    Return a Zstandard filetype description for `head` bytes or None.
+    """
+    if len(head) < 10:
+        return
+    descriptor = head[4]
+    dict_id_size = (0, 1, 2, 4)[descriptor & 0x3]
+    # the window descriptor is absent from single segment frames
+    start = descriptor & 0x20 and 5 or 6
+    if dict_id_size:
+        dict_id = int.from_bytes(head[start : start + dict_id_size], "little")
+    else:
+        dict_id = "None"
+    return "Zstandard compressed data (v0.8+), Dictionary ID: %s" % dict_id
+
+
+JAVA_VERSIONS = {
+    46: "Java 1.2",
+    47: "Java 1.3",
+    48: "Java 1.4",
+    49: "Java 1.5",
+    50: "Java 1.6",
+    51: "Java 1.7",
+    52: "Java 1.8",
+    53: "Java SE 9",
+    54: "Java SE 10",
+    55: "Java SE 11",
+    56: "Java SE 12",
+    57: "Java SE 13",
+    58: "Java SE 14",
+    59: "Java SE 15",
+    60: "Java SE 16",
+    61: "Java SE 17",
+    62: "Java SE 18",
+    63: "Java SE 19",
+    64: "Java SE 20",
+}
+
+
+def describe_java_class(head):
+    """
+    Return a Java class filetype description for `head` bytes or None. The
+    same magic is used by Mach-O universal binaries that are not handled.
+    """
+    if len(head) < 8:
+        return
+    minor, major = struct.unpack(">HH", head[4:8])
+    if major == 45:
+        return "compiled Java class data, version %d.%d" % (major, minor)
+    if major in JAVA_VERSIONS:
+        return "compiled Java class data, version %d.%d (%s)" % (
+            major,
+            minor,
+            JAVA_VERSIONS[major],
+        )
+
+
+def describe_tar(head):
+    """
+    Return a POSIX tar filetype description for `head` bytes or None.
+    """
+    if len(head) < 512:
+        return
+    name = head[:100].rstrip(b"\x00")
+    # a tar whose first member name starts with another format magic could be
+    # described otherwise by libmagic
+    if not name or not all(32 <= c < 127 for c in name):
+        return
+    if not has_tar_checksum(head):
+        return
+    if head[257:265] == b"ustar  \x00":
+        return "POSIX tar archive (GNU)"
+    if head[257:265] == b"ustar\x0000":
+        return "POSIX tar archive"
+
+
+def has_tar_checksum(head):
+    """
+    Return True if the tar header at the start of `head` bytes has a valid
+    checksum.
+    """
+    try:
+        checksum = int(head[148:156].strip(b"\x00 ").decode("ascii"), 8)
+    except ValueError:
+        return False
+    # the checksum is computed with its own field filled with spaces
+    return checksum == sum(head[:148]) + 8 * 32 + sum(head[156:512])
+
+
+def get_png_sample(width, height, depth, color_type, interlace):
+    """
+    Return a PNG sample head.
+    """
+    ihdr = struct.pack(">IIBBBBB", width, height, depth, color_type, 0, 0, interlace)
+    return b"\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR" + ihdr + b"\x00" * 100
+
+
+def get_tar_sample(tar_format):
+    """
+    Return a tar sample head in the `tar_format` tarfile format.
+    """
+    info = tarfile.TarInfo("a.txt")
+    return info.tobuf(format=tar_format) + b"\x00" * 512
+
+
+SIGNATURES = (
+    Signature(
+        name="png",
+        magic=b"\x89PNG\r\n\x1a\n",
+        offset=0,
+        mimetype="image/png",
+        describe=describe_png,
+        samples=(
+            get_png_sample(640, 480, 8, 6, 0),
+            get_png_sample(1, 1, 1, 3, 1),
+            get_png_sample(16, 16, 16, 0, 0),
+            get_png_sample(2, 3, 8, 2, 0),
+            get_png_sample(2, 3, 8, 4, 1),
+        ),
+    ),
+    Signature(
+        name="gif",
+        magic=b"GIF8",
+        offset=0,
+        mimetype="image/gif",
+        describe=describe_gif,
+        samples=(
+            b"GIF87a\x40\x01\xc8\x00\x80\x00\x00" + b"\x00" * 50,
+            b"GIF89a\xff\xff\x01\x00\x00\x00\x00" + b"\x00" * 50,
+        ),
+    ),
+    Signature(
+        name="bzip2",
+        magic=b"BZh",
+        offset=0,
+        mimetype="application/x-bzip2",
+        describe=describe_bzip2,
+        samples=(
+            b"BZh91AY&SY" + b"\x00" * 50,
+            b"BZh11AY&SY" + b"\x00" * 50,
+        ),
+    ),
+    Signature(
+        name="xz",
+        magic=b"\xfd7zXZ\x00",
+        offset=0,
+        mimetype="application/x-xz",
+        describe=describe_xz,
+        samples=(
+            b"\xfd7zXZ\x00\x00\x04" + b"\x00" * 50,
+            b"\xfd7zXZ\x00\x00\x01" + b"\x00" * 50,
+            b"\xfd7zXZ\x00\x00\x0a" + b"\x00" * 50,
+            b"\xfd7zXZ\x00\x00\x00" + b"\x00" * 50,
+        ),
+    ),
+    Signature(
+        name="7z",
+        magic=b"7z\xbc\xaf\x27\x1c",
+        offset=0,
+        mimetype="application/x-7z-compressed",
+        describe=describe_7z,
+        samples=(
+            b"7z\xbc\xaf\x27\x1c\x00\x04" + b"\x00" * 50,
+            b"7z\xbc\xaf\x27\x1c\x00\x03" + b"\x00" * 50,
+        ),
+    ),
+    Signature(
+        name="zstd",
+        magic=b"\x28\xb5\x2f\xfd",
+        offset=0,
+        mimetype="application/zstd",
+        describe=describe_zstd,
+        samples=(
+            b"\x28\xb5\x2f\xfd\x24\x11\x22\x33\x44" + b"\x00" * 50,
+            b"\x28\xb5\x2f\xfd\x21\x11\x22\x33\x44" + b"\x00" * 50,
+            b"\x28\xb5\x2f\xfd\x03\x11\x22\x33\x44" + b"\x00" * 50,
+        ),
+    ),
+    Signature(
+        name="java-class",
+        magic=b"\xca\xfe\xba\xbe",
+        offset=0,
+        mimetype="application/x-java-applet",
+        describe=describe_java_class,
+        samples=(
+            b"\xca\xfe\xba\xbe\x00\x00\x00\x2e" + b"\x00" * 50,
+            b"\xca\xfe\xba\xbe\x00\x00\x00\x34" + b"\x00" * 50,
+            b"\xca\xfe\xba\xbe\x00\x00\x00\x40" + b"\x00" * 50,
+            b"\xca\xfe\xba\xbe\x00\x03\x00\x2d" + b"\x00" * 50,
+        ),
+    ),
+    Signature(
+        name="tar",
+        magic=b"ustar",
+        offset=257,
+        mimetype="application/x-tar",
+        describe=describe_tar,
+        samples=(
+            get_tar_sample(tarfile.USTAR_FORMAT),
+            get_tar_sample(tarfile.GNU_FORMAT),
+        ),
+    ),
+)
+
+
+def is_verified(signature):
+    """
+    Return True if the installed libmagic returns the same filetype and
+    mimetype as `signature` for all its samples.
+    """
+    for sample in signature.samples:
+        filetype = magic2.file_type("", buf=sample)
+        mimetype = magic2.mime_type("", buf=sample)
+        if (filetype, mimetype) != (signature.describe(sample), signature.mimetype):
+            if TRACE:
+                logger_debug("is_verified: not verified:", signature.name, filetype, mimetype)
+            return False
+    return True
+
+
+@functools.lru_cache(maxsize=None)
+def get_verified_signatures():
+    """
+    Return a tuple of the SIGNATURES that agree with the installed libmagic.
+    """
+    return tuple(sig for sig in SIGNATURES if is_verified(sig))
+
+
+def get_signature_types(head, signatures=None):
+    """
+    Return a tuple of (filetype, mimetype) libmagic-compatible strings for a
+    file starting with the `head` bytes or None if no signature is confident.
+    Use the `signatures` list of Signature or the verified signatures.
+    """
+    if not head:
+        return
+    if signatures is None:
+        signatures = get_verified_signatures()
+    for signature in signatures:
+        if signature.matches(head):
+            filetype = signature.describe(head)
+            if filetype:
+                return filetype, signature.mimetype
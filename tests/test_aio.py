@@ -0,0 +1,116 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+
+from commoncode.testcase import FileBasedTesting
+
+from typecode import aio
+from typecode import get_types
+from typecode.contenttype import Type
+
+
+class TestAio(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def get_locations(self):
+        return [
+            self.get_test_loc("contenttype/code/python/extract.py"),
+            self.get_test_loc("contenttype/code/c/some.c"),
+            self.get_test_loc("contenttype/package/package.json"),
+            self.get_test_loc("contenttype/compiled/linux/libssl.so.0.9.7"),
+        ]
+
+    def test_get_type(self):
+        location = self.get_test_loc("contenttype/code/python/extract.py")
+        T = asyncio.run(aio.get_type(location, attributes=["is_text"]))
+        assert isinstance(T, Type)
+        assert T._is_text is True
+        assert T.filetype_pygment == "Python"
+
+    def test_get_type_with_missing_file(self):
+        location = os.path.join(self.get_temp_dir(), "missing")
+        with pytest.raises(IOError):
+            asyncio.run(aio.get_type(location))
+
+    def test_get_type_with_limiter(self):
+        locations = self.get_locations()
+
+        async def get_all():
+            limiter = asyncio.Semaphore(1)
+            return await asyncio.gather(
+                *[aio.get_type(loc, attributes=["is_binary"], limiter=limiter) for loc in locations]
+            )
+
+        results = asyncio.run(get_all())
+        assert [T.is_binary for T in results] == [False, False, False, True]
+
+    def test_get_types(self):
+        locations = self.get_locations()
+
+        async def get_all(**kwargs):
+            return [result async for result in aio.get_types(locations, **kwargs)]
+
+        expected = list(get_types(locations))
+        assert asyncio.run(get_all(concurrency=2)) == expected
+        results = asyncio.run(get_all(concurrency=3, ordered=False))
+        assert sorted(results) == sorted(expected)
+
+    def test_get_types_and_get_type_with_profile(self):
+        locations = self.get_locations()
+        attributes = ["filetype_file"]
+
+        async def get_all():
+            return [
+                result
+                async for result in aio.get_types(locations, attributes=attributes, profile="fast")
+            ]
+
+        expected = list(get_types(locations, attributes=attributes, profile="fast"))
+        assert asyncio.run(get_all()) == expected
+        elf = locations[3]
+        T = asyncio.run(aio.get_type(elf, attributes=attributes, profile="fast"))
+        assert T.profile == "fast"
+        assert T.filetype_file == expected[3][1]["filetype_file"]
+        assert asyncio.run(aio.get_type(elf)).filetype_file.endswith(", stripped")
+
+    def test_get_types_is_cancelled_when_closed_early(self):
+        locations = self.get_locations() * 10
+        detected = []
+
+        def slow_get_type_mapping(location, attributes=None, include_date=True):
+            detected.append(location)
+            time.sleep(0.05)
+            return dict(location=location)
+
+        executor = ThreadPoolExecutor(max_workers=1)
+
+        async def get_first():
+            results = aio.get_types(locations, concurrency=4, executor=executor)
+            async for result in results:
+                await results.aclose()
+                return result
+
+        with mock.patch.object(aio, "get_type_mapping", slow_get_type_mapping):
+            try:
+                location, mapping = asyncio.run(get_first())
+            finally:
+                # wait for any detection that was not cancelled
+                executor.shutdown(wait=True)
+
+        assert (location, mapping) == (locations[0], dict(location=locations[0]))
+        # 4 detections were submitted: the first one and at most one other one
+        # started before the others were cancelled
+        assert 1 <= len(detected) <= 2
@@ -0,0 +1,189 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+
+import pytest
+
+from commoncode.testcase import FileBasedTesting
+
+from typecode import get_types
+from typecode import magic2
+from typecode import scan_tree
+from typecode.batch import iter_chunks
+from typecode.contenttype import get_type
+
+
+class TestBatch(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def get_locations(self):
+        return [
+            self.get_test_loc("contenttype/code/python/extract.py"),
+            self.get_test_loc("contenttype/code/c/some.c"),
+            self.get_test_loc("contenttype/package/package.json"),
+            self.get_test_loc("contenttype/compiled/linux/libssl.so.0.9.7"),
+        ]
+
+    def test_get_types_in_process(self):
+        locations = self.get_locations()
+        results = list(get_types(locations, include_date=False))
+        expected = [(loc, get_type(loc).to_dict(include_date=False)) for loc in locations]
+        assert results == expected
+
+    def test_get_types_with_workers(self):
+        locations = self.get_locations()
+        expected = list(get_types(locations))
+        results = list(get_types(locations, workers=2, chunk_size=1))
+        assert results == expected
+
+    def test_get_types_with_workers_unordered(self):
+        locations = self.get_locations()
+        expected = list(get_types(locations))
+        results = list(get_types(locations, workers=2, chunk_size=1, ordered=False))
+        assert sorted(results) == sorted(expected)
+
+    def test_get_types_with_attributes(self):
+        locations = self.get_locations()[:1]
+        results = list(get_types(locations, attributes=["is_text", "filetype_pygment"]))
+        assert results == [(locations[0], dict(is_text=True, filetype_pygment="Python"))]
+
+    def test_get_types_with_unknown_attributes(self):
+        with pytest.raises(ValueError):
+            list(get_types(self.get_locations(), attributes=["foo"]))
+
+    def test_get_types_with_missing_file(self):
+        location = os.path.join(self.get_temp_dir(), "missing")
+        assert list(get_types([location])) == [(location, None)]
+
+    def test_iter_chunks(self):
+        assert list(iter_chunks(range(5), 2)) == [[0, 1], [2, 3], [4]]
+
+    def test_get_types_with_threads(self):
+        locations = self.get_locations()
+        expected = list(get_types(locations))
+        results = list(get_types(locations, workers=3, chunk_size=1, use_threads=True))
+        assert results == expected
+
+    def test_get_types_with_profile(self):
+        locations = self.get_locations()
+        expected = list(get_types(locations, attributes=["filetype_file"]))
+        results = list(get_types(locations, attributes=["filetype_file"], profile="fast"))
+        # the current profile is not changed
+        assert magic2.get_profile().name == "full"
+        assert results[:2] == expected[:2]
+        # JSON and ELF details are skipped by the fast profile
+        assert expected[2][1]["filetype_file"] == "JSON text data"
+        assert results[2][1]["filetype_file"] == "ASCII text, with very long lines (1546)"
+        assert expected[3][1]["filetype_file"].endswith(", stripped")
+        assert results[3][1]["filetype_file"] == (
+            "ELF 32-bit LSB shared object, Intel 80386, version 1 (SYSV)"
+        )
+        assert get_type(locations[3]).filetype_file == expected[3][1]["filetype_file"]
+
+    def test_suspended_get_types_does_not_change_the_profile_of_its_caller(self):
+        locations = self.get_locations()
+        elf = locations[3]
+        expected = get_type(elf).filetype_file
+        results = get_types(locations, attributes=["filetype_file"], profile="fast")
+        next(results)
+        assert magic2.get_profile().name == "full"
+        assert get_type(elf).filetype_file == expected
+        assert dict(results)[elf]["filetype_file"] != expected
+        assert get_type(elf).filetype_file == expected
+
+    def test_get_types_in_threads_with_different_profiles(self):
+        locations = self.get_locations()
+        expected = {}
+        for profile in ("full", "fast"):
+            expected[profile] = list(
+                get_types(locations, attributes=["filetype_file"], profile=profile)
+            )
+        assert expected["full"] != expected["fast"]
+
+        # detect one file at a time in each thread, in turns
+        barrier = threading.Barrier(2)
+
+        def in_turns(locations):
+            for location in locations:
+                barrier.wait(timeout=30)
+                yield location
+
+        def scan(profile):
+            return list(
+                get_types(in_turns(locations), attributes=["filetype_file"], profile=profile)
+            )
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            full = executor.submit(scan, "full")
+            fast = executor.submit(scan, "fast")
+            assert full.result() == expected["full"]
+            assert fast.result() == expected["fast"]
+        assert magic2.get_profile().name == "full"
+
+    def test_get_types_with_unknown_profile(self):
+        with pytest.raises(ValueError):
+            list(get_types(self.get_locations(), profile="foo"))
+
+    def get_tree(self):
+        test_dir = self.get_temp_dir()
+        os.makedirs(os.path.join(test_dir, "a", "b"))
+        with open(os.path.join(test_dir, "a", "b", "some.py"), "w") as f:
+            f.write("print(1)\n")
+        with open(os.path.join(test_dir, "z.txt"), "w") as f:
+            f.write("some text\n")
+        return test_dir
+
+    def test_scan_tree(self):
+        test_dir = self.get_tree()
+        results = list(scan_tree(test_dir, include_date=False))
+        expected = [
+            os.path.join(test_dir, "a"),
+            os.path.join(test_dir, "a", "b"),
+            os.path.join(test_dir, "a", "b", "some.py"),
+            os.path.join(test_dir, "z.txt"),
+        ]
+        assert [loc for loc, _ in results] == expected
+        for location, mapping in results:
+            assert mapping == get_type(location).to_dict(include_date=False)
+
+    def test_scan_tree_with_workers(self):
+        test_dir = self.get_tree()
+        expected = list(scan_tree(test_dir))
+        assert list(scan_tree(test_dir, workers=2, chunk_size=1)) == expected
+
+    @pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt", reason="Needs symlinks")
+    def test_scan_tree_does_not_follow_symlinks_by_default(self):
+        test_dir = self.get_tree()
+        os.symlink(os.path.join(test_dir, "a"), os.path.join(test_dir, "a", "b", "loop"))
+        results = dict(scan_tree(test_dir, attributes=["is_link", "is_dir"]))
+        loop = os.path.join(test_dir, "a", "b", "loop")
+        assert results[loop] == dict(is_link=True, is_dir=False)
+        assert not any(loc.startswith(loop + os.sep) for loc in results)
+
+    @pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt", reason="Needs symlinks")
+    def test_scan_tree_follows_symlinks_without_loops(self):
+        test_dir = self.get_tree()
+        other_dir = self.get_temp_dir()
+        with open(os.path.join(other_dir, "other.txt"), "w") as f:
+            f.write("other\n")
+        os.symlink(other_dir, os.path.join(test_dir, "other"))
+        os.symlink(test_dir, os.path.join(test_dir, "a", "loop"))
+        results = [loc for loc, _ in scan_tree(test_dir, follow_symlinks=True)]
+        assert os.path.join(test_dir, "other", "other.txt") in results
+        assert os.path.join(test_dir, "a", "loop") in results
+        assert not any(
+            loc.startswith(os.path.join(test_dir, "a", "loop") + os.sep) for loc in results
+        )
+
+    def test_scan_tree_with_missing_root(self):
+        location = os.path.join(self.get_temp_dir(), "missing")
+        assert list(scan_tree(location)) == []
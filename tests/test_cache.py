@@ -0,0 +1,134 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+import shutil
+import sqlite3
+from unittest import mock
+
+from commoncode.testcase import FileBasedTesting
+
+from typecode import cache as cache_module
+from typecode import contenttype
+from typecode import get_types
+from typecode.cache import DetectionCache
+from typecode.cache import get_cache_key
+from typecode.cache import get_cache_stamp
+from typecode.contenttype import get_type
+
+
+class TestDetectionCache(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def get_test_file(self):
+        test_dir = self.get_temp_dir()
+        test_file = os.path.join(test_dir, "extract.py")
+        shutil.copy(self.get_test_loc("contenttype/code/python/extract.py"), test_file)
+        return test_file
+
+    def test_cache_returns_the_same_mapping_as_a_type(self):
+        test_file = self.get_test_file()
+        cache_location = os.path.join(self.get_temp_dir(), "cache.sqlite")
+        with DetectionCache(cache_location) as cache:
+            result = cache.get_type_mapping(test_file)
+            assert cache.misses == 1
+            assert result == get_type(test_file).to_dict()
+            assert cache.get_type_mapping(test_file) == result
+            assert cache.hits == 1
+
+    def test_cache_is_persistent(self):
+        test_file = self.get_test_file()
+        cache_location = os.path.join(self.get_temp_dir(), "cache.sqlite")
+        with DetectionCache(cache_location) as cache:
+            expected = cache.get_type_mapping(test_file, attributes=["is_text"])
+        with DetectionCache(cache_location) as cache:
+            assert cache.get_type_mapping(test_file, attributes=["is_text"]) == expected
+            assert cache.hits == 1
+
+    def test_cache_is_invalidated_on_file_change(self):
+        test_file = self.get_test_file()
+        cache_location = os.path.join(self.get_temp_dir(), "cache.sqlite")
+        with DetectionCache(cache_location) as cache:
+            cache.put(test_file, dict(size=1))
+            assert cache.get(test_file) == dict(size=1)
+            with open(test_file, "a") as tf:
+                tf.write("more")
+            assert cache.get(test_file) is None
+
+    def test_cache_is_invalidated_on_stamp_change(self):
+        test_file = self.get_test_file()
+        cache_location = os.path.join(self.get_temp_dir(), "cache.sqlite")
+        with DetectionCache(cache_location, stamp="1") as cache:
+            cache.put(test_file, dict(size=1))
+        with DetectionCache(cache_location, stamp="2") as cache:
+            assert cache.get(test_file) is None
+
+    def test_caches_of_different_profiles_share_a_database(self):
+        test_file = self.get_test_file()
+        cache_location = os.path.join(self.get_temp_dir(), "cache.sqlite")
+        with DetectionCache(cache_location, profile="full") as cache:
+            cache.put(test_file, dict(size=1))
+        with DetectionCache(cache_location, profile="fast") as cache:
+            assert cache.get(test_file) is None
+            cache.put(test_file, dict(size=2))
+        with DetectionCache(cache_location, profile="full") as cache:
+            assert cache.get(test_file) == dict(size=1)
+            cache.clear()
+        with DetectionCache(cache_location, profile="fast") as cache:
+            assert cache.get(test_file) == dict(size=2)
+
+    def test_get_cache_key_is_none_for_directories(self):
+        assert get_cache_key(self.get_temp_dir()) is None
+
+    def test_get_types_with_cache(self):
+        test_file = self.get_test_file()
+        cache_location = os.path.join(self.get_temp_dir(), "cache.sqlite")
+        expected = list(get_types([test_file]))
+        assert list(get_types([test_file], cache_location=cache_location)) == expected
+        assert list(get_types([test_file], cache_location=cache_location)) == expected
+
+    def test_get_cache_stamp_depends_on_signatures_use(self):
+        with mock.patch.object(contenttype, "USE_SIGNATURES", False):
+            without_signatures = get_cache_stamp()
+        with mock.patch.object(contenttype, "USE_SIGNATURES", True):
+            with_signatures = get_cache_stamp()
+        assert without_signatures != with_signatures
+
+    def count_cached(self, cache_location):
+        conn = sqlite3.connect(cache_location)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM types").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_cache_writes_new_entries_in_batches(self):
+        test_dir = self.get_temp_dir()
+        test_files = []
+        for name in "abc":
+            test_file = os.path.join(test_dir, name)
+            with open(test_file, "w") as tf:
+                tf.write(name)
+            test_files.append(test_file)
+        cache_location = os.path.join(self.get_temp_dir(), "cache.sqlite")
+        with mock.patch.object(cache_module, "COMMIT_BATCH_SIZE", 2):
+            with DetectionCache(cache_location) as cache:
+                cache.put(test_files[0], dict(size=1))
+                assert self.count_cached(cache_location) == 0
+                # pending entries are returned before they are written
+                assert cache.get(test_files[0]) == dict(size=1)
+                cache.put(test_files[1], dict(size=1))
+                assert self.count_cached(cache_location) == 2
+                cache.put(test_files[2], dict(size=1))
+                assert self.count_cached(cache_location) == 2
+                cache.flush()
+                assert self.count_cached(cache_location) == 3
+                cache.put(test_files[0], dict(size=2))
+            assert self.count_cached(cache_location) == 3
+        with DetectionCache(cache_location) as cache:
+            assert cache.get(test_files[0]) == dict(size=2)
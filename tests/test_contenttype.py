@@ -8,19 +8,34 @@
 #
 
 import os
+from unittest import mock
 from unittest.case import expectedFailure
 from unittest.case import skipIf
 
 import pytest
 
+from commoncode import filetype
 from commoncode.testcase import FileBasedTesting
 from commoncode.system import on_linux
 from commoncode.system import on_mac
 from commoncode.system import on_windows
 
+from typecode import contenttype
+from typecode.contenttype import check_pdf_trailer
+from typecode.contenttype import classify_filetype
 from typecode.contenttype import get_filetype
 from typecode.contenttype import get_pygments_lexer
+from typecode.contenttype import get_registry
+from typecode.contenttype import get_text_file_start
+from typecode.contenttype import get_text_start
 from typecode.contenttype import get_type
+from typecode.contenttype import HEAD_SIZE
+from typecode.contenttype import is_media_mimetype
+from typecode.contenttype import read_file_start
+from typecode.contenttype import registry_scope
+from typecode.contenttype import Type
+from typecode.contenttype import TypeRegistry
+from typecode._vendor.pygments.lexer import RegexLexerMeta
 
 from filetype_test_utils import is_arm_architecture
 
@@ -407,3 +422,278 @@ class TestContentTypeComplex(FileBasedTesting):
         test_dir = self.get_test_loc("contenttype/size")
         result = size(test_dir)
         assert result == 18
+
+
+class TestTypeRegistry(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def test_registry_evicts_least_recently_used(self):
+        registry = TypeRegistry(max_size=2)
+        registry["a"] = 1
+        registry["b"] = 2
+        assert registry["a"] == 1
+        registry["c"] = 3
+        assert "b" not in registry
+        assert "a" in registry
+        assert "c" in registry
+        expected = dict(size=2, max_size=2, hits=1, misses=0, evictions=1)
+        assert registry.stats() == expected
+
+    def test_registry_counts_misses_and_clear_resets(self):
+        registry = TypeRegistry(max_size=2)
+        assert registry.get("a") is None
+        registry["a"] = 1
+        registry.clear()
+        assert len(registry) == 0
+        assert registry.stats() == dict(size=0, max_size=2, hits=0, misses=0, evictions=0)
+
+    def test_get_type_uses_scoped_registry(self):
+        test_file = self.get_test_loc("contenttype/code/python/extract.py")
+        with registry_scope(max_size=1) as registry:
+            assert get_registry() is registry
+            t1 = get_type(test_file)
+            assert get_type(test_file) is t1
+            get_type(self.get_test_loc("contenttype/code/c/some.c"))
+            assert registry.stats()["evictions"] == 1
+            assert get_type(test_file) is not t1
+        assert get_registry() is not registry
+
+
+class TestTypeHead(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def test_head_is_read_once_and_shared(self):
+        test_file = self.get_test_loc("contenttype/code/python/extract.py")
+        T = Type(test_file)
+        with open(test_file, "rb") as f:
+            expected = f.read(HEAD_SIZE)
+        assert T.head == expected
+        assert T.head is T.head
+        assert T.head_is_content
+
+    def test_head_of_large_file_is_truncated(self):
+        test_file = self.get_test_loc("contenttype/code/python/extract.py")
+        T = Type(test_file, head_size=10)
+        assert len(T.head) == 10
+        assert not T.head_is_content
+
+    def test_get_text_start_is_the_same_as_get_text_file_start(self):
+        test_file = self.get_test_loc("contenttype/code/python/extract.py")
+        with open(test_file, "rb") as f:
+            head = f.read(HEAD_SIZE)
+        assert get_text_start(head) == get_text_file_start(test_file)
+
+    def test_read_file_start(self):
+        test_file = self.get_test_loc("contenttype/code/python/extract.py")
+        with open(test_file, "rb") as f:
+            expected = f.read(100)
+        assert read_file_start(test_file, 100) == expected
+        assert read_file_start(test_file, 10) == expected[:10]
+
+
+class TestTypeAttributes(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def test_attribute_dependencies_are_in_sync_with_exportable_attributes(self):
+        assert set(Type.attribute_dependencies) == set(Type.exportable_attributes)
+        for dependencies in Type.attribute_dependencies.values():
+            assert set(dependencies).issubset(Type.attribute_dependencies)
+
+    def test_get_attributes_closure(self):
+        result = Type.get_attributes_closure(["is_text", "is_pdf"])
+        assert result == ["is_file", "is_binary", "is_text", "mimetype_file", "is_pdf"]
+
+    def test_get_attributes_closure_with_unknown_attribute(self):
+        with pytest.raises(ValueError):
+            Type.get_attributes_closure(["is_foo"])
+
+    def test_get_detectors(self):
+        assert Type.get_detectors(["is_text", "size"]) == set()
+        assert Type.get_detectors(["mimetype_file"]) == {"libmagic"}
+        assert Type.get_detectors(["contains_text"]) == {"libmagic", "pdfminer", "extractible"}
+
+    def test_get_attributes_closure_includes_libmagic_fallbacks(self):
+        assert Type.get_attributes_closure(["is_winexe"]) == [
+            "is_file",
+            "filetype_file",
+            "is_winexe",
+        ]
+        assert Type.get_detectors(["is_winexe"]) == {"libmagic"}
+        assert Type.get_detectors(["is_elf"]) == {"libmagic"}
+
+    def test_to_dict_with_attributes_computes_only_what_is_needed(self):
+        test_file = self.get_test_loc("contenttype/code/python/extract.py")
+        T = Type(test_file)
+        assert T.to_dict(attributes=["is_text"]) == dict(is_text=True)
+        assert T._filetype_file is None
+        assert T._mimetype_file is None
+
+        T.to_dict(attributes=["mimetype_file", "is_text"])
+        assert T._filetype_pygment is None
+        assert T._is_pdf_with_text is None
+
+    def test_to_dict_with_attributes_and_without_date(self):
+        test_file = self.get_test_loc("contenttype/code/python/extract.py")
+        T = Type(test_file)
+        assert T.to_dict(include_date=False, attributes=["date", "is_file"]) == dict(is_file=True)
+
+    def test_filetype_pygment_does_not_instantiate_lexers(self):
+        test_dir = self.get_temp_dir()
+        script = os.path.join(test_dir, "script")
+        with open(script, "w") as f:
+            f.write("#!/usr/bin/env python\nprint('hello')\n")
+        test_files = [self.get_test_loc("contenttype/code/c/some.c"), script]
+        with mock.patch.object(RegexLexerMeta, "__call__") as instantiate:
+            assert [Type(test_file).filetype_pygment for test_file in test_files] == ["C", "Python"]
+            assert not instantiate.called
+
+        assert get_pygments_lexer(script).name == "Python"
+
+    def test_empty_file_libmagic_types(self):
+        empty = os.path.join(self.get_temp_dir(), "empty")
+        with open(empty, "wb"):
+            pass
+        T = Type(empty)
+        assert T.filetype_file == "empty"
+        assert T.mimetype_file == "inode/x-empty"
+
+
+class TestClassifyFiletype(object):
+    def test_classify_filetype_elf(self):
+        flags = classify_filetype(
+            "ELF 32-bit LSB shared object, Intel 80386, version 1 (SYSV), not stripped"
+        )
+        assert flags.elf_type == "shared object"
+        assert flags.is_not_stripped
+        assert not flags.is_media
+
+    def test_classify_filetype_overlapping_keywords(self):
+        flags = classify_filetype("Squashfs filesystem, little endian, version 4.0, compressed")
+        assert flags.is_filesystem
+        assert flags.has_compressed
+
+        flags = classify_filetype("PNG image data, 16 x 12, 8-bit/color RGBA, interlaced")
+        assert flags.is_media
+        assert flags.has_data
+        assert flags.is_media_without_meta
+
+    def test_classify_filetype_script(self):
+        flags = classify_filetype("Python script, ASCII text executable")
+        assert flags.has_script
+        assert not flags.has_makefile
+        assert not flags.is_data
+
+    def test_classify_filetype_winexe(self):
+        assert classify_filetype("PE32 executable (DLL) (GUI) Intel 80386").is_winexe
+        assert classify_filetype("MS-DOS executable, NE for MS Windows 3.x").is_winexe
+        assert not classify_filetype("MS-DOS executable").is_winexe
+
+    def test_classify_filetype_is_memoized(self):
+        assert classify_filetype("data") is classify_filetype("data")
+        assert classify_filetype("data").is_data
+
+    def test_is_media_mimetype(self):
+        assert is_media_mimetype("image/png")
+        assert not is_media_mimetype("text/plain")
+
+
+class TestTypeStat(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def check_type_flags(self, T, location):
+        assert T.is_file == filetype.is_file(location)
+        assert T.is_dir == filetype.is_dir(location)
+        assert T.is_regular == bool(filetype.is_regular(location))
+        assert T.is_special == bool(filetype.is_special(location))
+        assert T.is_link == filetype.is_link(location)
+        assert T.is_broken_link == bool(filetype.is_broken_link(location))
+        assert T.date == filetype.get_last_modified_date(location)
+        assert T.size == filetype.get_size(location)
+
+    @skipIf(on_windows, "Windows does not have (well supported) links.")
+    def test_type_flags_are_the_same_as_commoncode_filetype(self):
+        test_dir = self.extract_test_tar("contenttype/links/links.tar.gz", verbatim=True)
+        for top, dirs, files in os.walk(test_dir):
+            for name in dirs + files:
+                location = os.path.join(top, name)
+                self.check_type_flags(Type(location), location)
+
+    @skipIf(on_windows, "Windows does not have (well supported) links.")
+    def test_type_from_dir_entry(self):
+        test_dir = self.extract_test_tar("contenttype/links/links.tar.gz", verbatim=True)
+        test_dir = os.path.join(test_dir, "prunedirs/targets")
+        for entry in os.scandir(test_dir):
+            self.check_type_flags(Type.from_dir_entry(entry), entry.path)
+
+    def test_type_with_stat_result(self):
+        test_file = self.get_test_loc("contenttype/code/python/extract.py")
+        T = Type(test_file, stat_result=os.lstat(test_file))
+        self.check_type_flags(T, test_file)
+
+    def test_type_of_missing_file_raises_ioerror(self):
+        with pytest.raises(IOError):
+            Type(os.path.join(self.get_temp_dir(), "missing"))
+
+
+def build_pdf(trailer=b"", with_startxref=True):
+    """
+    Return the bytes of a minimal PDF with `trailer` extra trailer entries.
+    """
+    content = b"%PDF-1.4\n"
+    offsets = []
+    for obj in (
+        b"1 0 obj\n<< /Type /Catalog /Pages 2 0 R >>\nendobj\n",
+        b"2 0 obj\n<< /Type /Pages /Kids [] /Count 0 >>\nendobj\n",
+    ):
+        offsets.append(len(content))
+        content += obj
+    xref = len(content)
+    content += b"xref\n0 3\n0000000000 65535 f \n"
+    content += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    content += b"trailer\n<< /Size 3 /Root 1 0 R" + trailer + b" >>\n"
+    if with_startxref:
+        content += b"startxref\n%d\n" % xref
+    return content + b"%%EOF\n"
+
+
+class TestPdfTrailer(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def write_pdf(self, content):
+        location = os.path.join(self.get_temp_dir(), "test.pdf")
+        with open(location, "wb") as f:
+            f.write(content)
+        return location
+
+    def test_check_pdf_trailer(self):
+        pdf = build_pdf()
+        assert check_pdf_trailer(pdf, pdf) is True
+
+    def test_check_pdf_trailer_cannot_decide_for_encrypted_pdfs(self):
+        pdf = build_pdf(b" /Encrypt 3 0 R")
+        assert check_pdf_trailer(pdf, pdf) is None
+
+    def test_check_pdf_trailer_cannot_decide_without_startxref(self):
+        pdf = build_pdf(with_startxref=False)
+        assert check_pdf_trailer(pdf, pdf) is None
+
+    def test_is_pdf_with_text_does_not_use_pdfminer_with_a_trailer(self):
+        location = self.write_pdf(build_pdf())
+        with mock.patch("pdfminer.pdfdocument.PDFDocument") as pdf_document:
+            assert Type(location).is_pdf_with_text
+            assert not pdf_document.called
+
+    def test_is_pdf_with_text_uses_pdfminer_if_needed(self):
+        location = self.write_pdf(build_pdf(with_startxref=False))
+        assert Type(location).is_pdf_with_text
+        with mock.patch.object(contenttype, "PDF_FALLBACK_MAX_SIZE", 0):
+            assert not Type(location).is_pdf_with_text
+
+    def test_is_pdf_with_text_is_the_same_as_pdfminer_on_test_files(self):
+        test_dir = self.get_test_loc("filetest")
+        for top, _, files in os.walk(test_dir):
+            for name in files:
+                location = os.path.join(top, name)
+                T = Type(location)
+                if T.is_pdf:
+                    assert T.is_pdf_with_text == T._parse_pdf_extractable()
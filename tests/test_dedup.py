@@ -0,0 +1,55 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+import shutil
+
+from commoncode.testcase import FileBasedTesting
+
+from typecode import get_types
+from typecode.contenttype import Type
+from typecode.dedup import ContentIndex
+from typecode.dedup import get_fingerprint
+
+
+class TestContentIndex(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def copy_test_file(self, path, name):
+        test_file = os.path.join(self.get_temp_dir(), name)
+        shutil.copy(self.get_test_loc(path), test_file)
+        return test_file
+
+    def test_get_fingerprint(self):
+        file1 = self.copy_test_file("contenttype/code/c/some.c", "some.c")
+        file2 = self.copy_test_file("contenttype/code/c/some.c", "other.c")
+        file3 = self.copy_test_file("contenttype/code/python/extract.py", "extract.py")
+        assert get_fingerprint(file1) == get_fingerprint(file2)
+        assert get_fingerprint(file1) != get_fingerprint(file3)
+
+    def test_content_attributes_are_shared_and_path_attributes_are_not(self):
+        file1 = self.copy_test_file("contenttype/code/python/extract.py", "extract.py")
+        file2 = self.copy_test_file("contenttype/code/python/extract.py", "extract")
+        index = ContentIndex()
+        result1 = index.get_type_mapping(file1)
+        T2, _ = index.get_type(file2)
+        assert T2._filetype_file == result1["filetype_file"]
+        assert T2._mimetype_file == result1["mimetype_file"]
+        assert index.contents.stats()["hits"] == 1
+
+        result2 = index.get_type_mapping(file2)
+        # a new Type outside of the registry detects everything without dedup
+        assert result2 == Type(file2).to_dict()
+        assert result2["mimetype_python"] != result1["mimetype_python"]
+
+    def test_get_types_with_dedup(self):
+        file1 = self.copy_test_file("contenttype/code/python/extract.py", "extract.py")
+        file2 = self.copy_test_file("contenttype/code/python/extract.py", "copy.py")
+        expected = list(get_types([file1, file2]))
+        assert list(get_types([file1, file2], dedup=True)) == expected
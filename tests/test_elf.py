@@ -0,0 +1,163 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+import struct
+from unittest import mock
+
+from commoncode.testcase import FileBasedTesting
+
+from typecode import magic2
+from typecode.contenttype import Type
+from typecode.elf import ElfInfo
+from typecode.elf import get_elf_info
+
+
+def build_elf(endian="<", e_type=1, machine=62, with_symtab=True):
+    """
+    Return the bytes of a minimal 64-bit ELF with a section names table and an
+    optional symbols table.
+    """
+    names = b"\x00.shstrtab\x00.symtab\x00"
+    shoff = 64 + len(names)
+    sections = [struct.pack(endian + "IIQQQQIIQQ", *([0] * 10))]
+    sections.append(struct.pack(endian + "IIQQQQIIQQ", 1, 3, 0, 0, 64, len(names), 0, 0, 1, 0))
+    if with_symtab:
+        sections.append(struct.pack(endian + "IIQQQQIIQQ", 11, 2, 0, 0, 0, 0, 0, 0, 8, 24))
+    ident = b"\x7fELF\x02" + (endian == "<" and b"\x01" or b"\x02") + b"\x01" + b"\x00" * 9
+    header = ident + struct.pack(
+        endian + "HHIQQQIHHHHHH",
+        e_type,
+        machine,
+        1,
+        0,
+        0,
+        shoff,
+        0,
+        64,
+        0,
+        0,
+        64,
+        len(sections),
+        1,
+    )
+    return header + names + b"".join(sections)
+
+
+class TestElf(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def write_elf(self, content):
+        location = os.path.join(self.get_temp_dir(), "elf.o")
+        with open(location, "wb") as f:
+            f.write(content)
+        return location
+
+    def test_get_elf_info_stripped_shared_object(self):
+        test_file = self.get_test_loc("contenttype/compiled/linux/libssl.so.0.9.7")
+        info = get_elf_info(test_file)
+        assert info == ElfInfo(
+            bits=32,
+            endianness="LSB",
+            type=3,
+            machine=3,
+            has_interpreter=False,
+            is_pie=False,
+            has_symtab=False,
+            has_debug_info=False,
+        )
+        assert info.type_name == "shared object"
+        assert info.machine_name == "Intel 80386"
+        assert info.is_stripped
+
+    def test_get_elf_info_executable_with_debug_info(self):
+        test_file = self.get_test_loc("filetest/compiled/linux/x86_64-shash")
+        info = get_elf_info(test_file)
+        assert info.bits == 64
+        assert info.type_name == "executable"
+        assert info.machine_name == "x86-64"
+        assert info.has_interpreter
+        assert info.is_stripped is False
+
+    def test_get_elf_info_small_files_and_big_endian(self):
+        info = get_elf_info(self.write_elf(build_elf()))
+        assert (info.type_name, info.is_stripped, info.has_debug_info) == (
+            "relocatable",
+            False,
+            False,
+        )
+        info = get_elf_info(self.write_elf(build_elf(">", e_type=2, machine=2, with_symtab=False)))
+        assert (info.endianness, info.type_name, info.machine_name, info.is_stripped) == (
+            "MSB",
+            "executable",
+            "SPARC",
+            True,
+        )
+
+    def test_get_elf_info_returns_none_for_invalid_elf(self):
+        assert get_elf_info(self.write_elf(b"\x7fELF\x03\x01")) is None
+        assert get_elf_info(self.get_test_loc("contenttype/code/c/some.c")) is None
+
+    def test_get_elf_info_does_not_know_stripping_without_sections(self):
+        content = bytearray(build_elf())
+        # point the section headers table past the end of the file
+        struct.pack_into("<Q", content, 40, 1 << 20)
+        info = get_elf_info(self.write_elf(bytes(content)))
+        assert info.type_name == "relocatable"
+        assert info.is_stripped is None
+
+    def test_get_elf_info_rejects_oversized_section_entries(self):
+        content = bytearray(build_elf())
+        # a e_shentsize of 65535 bytes in a file large enough for the table
+        struct.pack_into("<H", content, 58, 65535)
+        location = self.write_elf(bytes(content) + b"\x00" * (1 << 18))
+        read_sizes = []
+        real_open = open
+
+        def tracking_open(*args, **kwargs):
+            f = real_open(*args, **kwargs)
+            real_read = f.read
+
+            def read(size=-1):
+                read_sizes.append(size)
+                return real_read(size)
+
+            f.read = read
+            return f
+
+        with mock.patch("builtins.open", tracking_open):
+            info = get_elf_info(location)
+        assert info.type_name == "relocatable"
+        assert info.is_stripped is None
+        assert max(read_sizes) <= 1024
+
+    def test_type_elf_attributes_agree_with_libmagic(self):
+        for test_file in (
+            "contenttype/compiled/linux/libssl.so.0.9.7",
+            "contenttype/compiled/linux/libnetsnmpagent.so.5",
+            "filetest/compiled/linux/i686-shash",
+            "filetest/compiled/linux/x86_64-shash",
+        ):
+            test_file = self.get_test_loc(test_file)
+            filetype = magic2.file_type(test_file)
+            T = Type(test_file)
+            assert T.is_elf
+            assert T.elf_type in filetype
+            assert T.is_stripped_elf == ("not stripped" not in filetype)
+
+    def test_type_elf_attributes_do_not_use_libmagic(self):
+        location = self.write_elf(build_elf())
+        with mock.patch.object(magic2, "_detect") as detect:
+            T = Type(location)
+            assert (T.is_elf, T.elf_type, T.is_stripped_elf) == (True, "relocatable", False)
+            assert not detect.called
+
+    def test_type_filetype_of_small_elf_has_sections_details(self):
+        location = self.write_elf(build_elf())
+        assert "not stripped" in Type(location).filetype_file
@@ -7,7 +7,9 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+import gzip
 import os
+from unittest import mock
 
 from commoncode.testcase import FileBasedTesting
 
@@ -39,3 +41,24 @@ class TestExtractible(FileBasedTesting):
             test_file = self.get_test_loc(location)
             result = extractible._can_extract(test_file)
             assert result == expected, "{} should extractible: {}".format(location, expected)
+
+    def write_file(self, content, name="test.gz"):
+        location = os.path.join(self.get_temp_dir(), name)
+        with open(location, "wb") as f:
+            f.write(content)
+        return location
+
+    def test__can_extract_checks_small_compressed_files_entirely(self):
+        content = gzip.compress(os.urandom(1000))
+        assert extractible._can_extract(self.write_file(content))
+        assert not extractible._can_extract(self.write_file(content[:-100]))
+        assert not extractible._can_extract(self.write_file(b""))
+
+    def test__can_extract_decompresses_large_files_up_to_the_probe_size(self):
+        content = gzip.compress(os.urandom(100 * 1024))
+        # truncated after the probe size: the truncation is not seen
+        location = self.write_file(content[:-100])
+        with mock.patch.object(extractible, "PROBE_SIZE", 1024):
+            assert extractible._can_extract(location)
+        with mock.patch.object(extractible, "PROBE_SIZE", 1024 * 1024):
+            assert not extractible._can_extract(location)
@@ -0,0 +1,99 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import json
+import subprocess
+import sys
+
+# Modules that are loaded on first use or with typecode.warmup()
+DEFERRED_MODULES = [
+    "binaryornot.helpers",
+    "commoncode.text",
+    "extractcode.archive",
+    "pdfminer.pdfdocument",
+    "plugincode.location_provider",
+    "typecode._vendor.pygments.lexers",
+    "typecode.pygments_lexers",
+]
+
+# `import typecode` is expected to take less than this in seconds: it takes
+# about a millisecond.
+IMPORT_TIME_TARGET = 0.1
+
+
+def run_python(code):
+    """
+    Return the JSON-decoded last line printed by running `code` in a new Python
+    interpreter.
+    """
+    output = subprocess.check_output([sys.executable, "-c", code], stderr=subprocess.DEVNULL)
+    return json.loads(output.decode("utf-8").strip().splitlines()[-1])
+
+
+def get_loaded(setup):
+    """
+    Return a list of the DEFERRED_MODULES loaded and if libmagic is loaded after
+    running the `setup` code.
+    """
+    code = (
+        "import json, sys\n"
+        + setup
+        + "\n"
+        + "loaded = [m for m in %r if m in sys.modules]\n" % DEFERRED_MODULES
+        + "magic2 = sys.modules.get('typecode.magic2')\n"
+        + "print(json.dumps([loaded, bool(magic2 and 'libmagic' in vars(magic2))]))\n"
+    )
+    return run_python(code)
+
+
+def test_import_typecode_does_not_load_detection_modules():
+    loaded, libmagic_loaded = get_loaded("import typecode")
+    assert loaded == []
+    assert not libmagic_loaded
+    assert "typecode.contenttype" not in run_python(
+        "import json, sys, typecode; print(json.dumps(list(sys.modules)))"
+    )
+
+
+def test_import_typecode_contenttype_does_not_load_detection_libraries():
+    loaded, libmagic_loaded = get_loaded("import typecode.contenttype")
+    assert loaded == []
+    assert not libmagic_loaded
+
+
+def test_import_typecode_time_is_below_target():
+    code = (
+        "import json, time\n"
+        "start = time.perf_counter()\n"
+        "import typecode\n"
+        "print(json.dumps(time.perf_counter() - start))\n"
+    )
+    assert run_python(code) < IMPORT_TIME_TARGET
+
+
+def test_typecode_public_functions_are_imported_on_first_use():
+    import typecode
+    from typecode import batch
+    from typecode import contenttype
+
+    assert typecode.get_type is contenttype.get_type
+    assert typecode.get_types is batch.get_types
+    assert typecode.scan_tree is batch.scan_tree
+    assert "get_type" in dir(typecode)
+
+
+def test_warmup_loads_detection_libraries():
+    loaded, libmagic_loaded = get_loaded("import typecode\ntypecode.warmup()")
+    expected = [
+        module
+        for module in DEFERRED_MODULES
+        if module not in ("extractcode.archive", "typecode._vendor.pygments.lexers")
+    ]
+    assert [module for module in loaded if module in expected] == expected
+    assert libmagic_loaded
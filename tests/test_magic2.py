@@ -7,8 +7,246 @@
 # See https://aboutcode.org for more information about nexB OSS projects.
 #
 
+from concurrent.futures import ThreadPoolExecutor
+import os
+from unittest import mock
+
+import pytest
+
+from commoncode.system import on_windows
+
+from typecode import magic2
+from typecode.magic2 import close_detectors
+from typecode.magic2 import Detector
+from typecode.magic2 import DETECT_MIME
+from typecode.magic2 import DETECT_TYPE
+from typecode.magic2 import encoding
+from typecode.magic2 import file_info
+from typecode.magic2 import file_type
+from typecode.magic2 import get_detector
+from typecode.magic2 import get_magicdb_buffer
+from typecode.magic2 import get_magicdb_location
+from typecode.magic2 import get_profile
 from typecode.magic2 import libmagic_version
+from typecode.magic2 import load_libmagic
+from typecode.magic2 import MAGIC_NO_CHECK_ELF
+from typecode.magic2 import MAGIC_PARAM_BYTES_MAX
+from typecode.magic2 import MAGIC_PARAM_ENCODING_MAX
+from typecode.magic2 import MAGIC_PARAM_INDIR_MAX
+from typecode.magic2 import MagicException
+from typecode.magic2 import mime_type
+from typecode.magic2 import PROFILES
+from typecode.magic2 import Profile
+from typecode.magic2 import profile_scope
+from typecode.magic2 import set_profile
+
+TEST_FILE = os.path.join(os.path.dirname(__file__), "data", "contenttype", "code", "c", "some.c")
 
 
 def test_load_lib():
     assert float(libmagic_version()) > 5
+
+
+def test_detectors_are_per_thread():
+    detector = get_detector(DETECT_TYPE)
+    assert get_detector(DETECT_TYPE) is detector
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        other = executor.submit(get_detector, DETECT_TYPE).result()
+    assert other is not detector
+
+
+def test_file_type_in_threads():
+    expected = file_type(TEST_FILE)
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(file_type, [TEST_FILE] * 20))
+    assert results == [expected] * 20
+
+
+def test_close_detectors():
+    detector = get_detector(DETECT_MIME)
+    close_detectors()
+    assert detector.cookie is None
+    assert get_detector(DETECT_MIME) is not detector
+
+
+def test_detector_is_shared_by_all_flags():
+    detector = get_detector(DETECT_TYPE)
+    assert get_detector(DETECT_MIME) is detector
+    assert detector.flags == DETECT_MIME
+    assert get_detector() is detector
+    assert detector.flags == DETECT_MIME
+
+
+def test_file_info():
+    expected = file_type(TEST_FILE), mime_type(TEST_FILE), encoding(TEST_FILE)
+    assert expected[1] == "text/x-c"
+    assert file_info(TEST_FILE) == expected
+    assert file_info(TEST_FILE, with_encoding=False) == expected[:2] + ("",)
+    with open(TEST_FILE, "rb") as f:
+        content = f.read()
+    assert file_info(TEST_FILE, buf=content) == expected
+
+
+def test_file_info_reads_the_file_once():
+    get_detector()
+    opened = []
+    real_open = open
+
+    def tracking_open(*args, **kwargs):
+        opened.append(args[0])
+        return real_open(*args, **kwargs)
+
+    with mock.patch("builtins.open", tracking_open):
+        file_info(TEST_FILE)
+    assert opened == [TEST_FILE]
+
+
+def test_file_info_on_empty_file(tmp_path):
+    empty = tmp_path / "empty"
+    empty.write_bytes(b"")
+    empty = str(empty)
+    assert file_info(empty) == ("empty", "inode/x-empty", "inode/x-empty; charset=binary")
+    assert file_info(empty) == (file_type(empty), mime_type(empty), encoding(empty))
+
+
+@pytest.mark.skipif(on_windows, reason="No setuid, setgid or sticky bits on Windows")
+def test_file_info_on_files_with_special_mode_bits(tmp_path):
+    test_file = tmp_path / "setuid"
+    test_file.write_bytes(b"some text\n")
+    test_file = str(test_file)
+    for mode, prefix in ((0o4755, "setuid"), (0o2755, "setgid"), (0o1755, "sticky")):
+        os.chmod(test_file, mode)
+        filetype, mimetype, _ = file_info(test_file)
+        assert filetype.startswith(prefix)
+        assert filetype == file_type(test_file)
+        assert mimetype == "text/plain"
+
+
+def test_file_info_on_symlink(tmp_path):
+    link = tmp_path / "link"
+    link.symlink_to(TEST_FILE)
+    link = str(link)
+    assert file_info(link) == (file_type(link), mime_type(link), encoding(link))
+    assert file_info(link)[0].startswith("symbolic link to")
+
+
+def test_file_info_on_missing_file():
+    assert file_info("/does/not/exist") == ("", "", "")
+
+
+def test_get_profile():
+    assert get_profile().name == "full"
+    assert get_profile("fast").flags & MAGIC_NO_CHECK_ELF
+    with pytest.raises(ValueError):
+        get_profile("foo")
+
+
+def test_detector_uses_profile_params():
+    detector = get_detector()
+    default_bytes_max = detector.default_params[MAGIC_PARAM_BYTES_MAX]
+    try:
+        set_profile("bounded")
+        assert get_detector() is detector
+        assert detector.profile is PROFILES["bounded"]
+        assert detector.get_param(MAGIC_PARAM_BYTES_MAX) == 1024 * 1024
+        assert detector.get_param(MAGIC_PARAM_INDIR_MAX) == 15
+    finally:
+        set_profile("full")
+    get_detector()
+    assert detector.get_param(MAGIC_PARAM_BYTES_MAX) == default_bytes_max
+
+
+def test_detector_ignores_params_unsupported_by_libmagic():
+    # libmagic 5.39 and older do not support MAGIC_PARAM_ENCODING_MAX
+    load_libmagic()
+    getparam = magic2._magic_getparam
+    setparam = magic2._magic_setparam
+
+    def unsupported(func):
+        def wrapper(cookie, param, value):
+            if param == MAGIC_PARAM_ENCODING_MAX:
+                raise MagicException(None)
+            return func(cookie, param, value)
+
+        return wrapper
+
+    with mock.patch.object(magic2, "_magic_getparam", unsupported(getparam)):
+        with mock.patch.object(magic2, "_magic_setparam", unsupported(setparam)):
+            detector = Detector(DETECT_TYPE)
+            try:
+                assert MAGIC_PARAM_ENCODING_MAX not in detector.default_params
+                assert MAGIC_PARAM_BYTES_MAX in detector.default_params
+                profile = Profile(
+                    name="test",
+                    params={MAGIC_PARAM_ENCODING_MAX: 1024, MAGIC_PARAM_BYTES_MAX: 2048},
+                )
+                detector.set_profile(profile)
+                assert detector.get_param(MAGIC_PARAM_BYTES_MAX) == 2048
+                assert detector.get(TEST_FILE)
+            finally:
+                detector.close()
+
+
+def test_profile_scope_is_used_by_the_current_thread_only():
+    with profile_scope("fast"):
+        assert get_profile().name == "fast"
+        assert get_detector().profile is PROFILES["fast"]
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            assert executor.submit(lambda: get_profile().name).result() == "full"
+        with profile_scope(None):
+            assert get_profile().name == "fast"
+    assert get_profile().name == "full"
+    assert get_detector().profile is PROFILES["full"]
+    with pytest.raises(ValueError):
+        with profile_scope("foo"):
+            pass
+
+
+def test_profiles_detect_the_same_types_of_common_files():
+    expected = file_info(TEST_FILE)
+    try:
+        for name in PROFILES:
+            set_profile(name)
+            assert file_info(TEST_FILE) == expected
+    finally:
+        set_profile("full")
+
+
+def test_fast_profile_skips_elf_details():
+    test_file = os.path.join(
+        os.path.dirname(__file__), "data", "contenttype", "compiled", "linux", "libssl.so.0.9.7"
+    )
+    assert "dynamically linked" in file_type(test_file)
+    try:
+        set_profile("fast")
+        assert file_type(test_file) == "ELF 32-bit LSB shared object, Intel 80386, version 1 (SYSV)"
+    finally:
+        set_profile("full")
+    assert "dynamically linked" in file_type(test_file)
+
+
+def test_get_magicdb_buffer(tmp_path):
+    magic_file = tmp_path / "magic"
+    magic_file.write_bytes(b"0\tstring\tTYPECODE\ttypecode test data\n")
+    buf = get_magicdb_buffer(str(magic_file))
+    assert buf.raw == magic_file.read_bytes()
+    assert get_magicdb_buffer(os.fsencode(str(magic_file))) is buf
+    assert get_magicdb_buffer(str(tmp_path / "missing")) is None
+
+
+def test_detector_loads_magic_source_file_from_its_location(tmp_path):
+    magic_file = tmp_path / "magic"
+    magic_file.write_bytes(b"0\tstring\tTYPECODE\ttypecode test data\n")
+    detector = Detector(DETECT_TYPE, magic_db_location=str(magic_file))
+    # a magic source file cannot be loaded from a buffer
+    assert detector.magicdb_buffer is None
+    assert detector.get_buffer(b"TYPECODE and more") == b"typecode test data"
+
+
+@pytest.mark.skipif(not get_magicdb_location(), reason="No compiled magic database location")
+def test_detectors_share_the_magicdb_buffer():
+    detector = Detector(DETECT_TYPE)
+    assert detector.magicdb_buffer is not None
+    assert detector.magicdb_buffer is get_magicdb_buffer()
+    assert Detector(DETECT_MIME).magicdb_buffer is detector.magicdb_buffer
+    assert detector.get(TEST_FILE) == get_detector(DETECT_TYPE).get(TEST_FILE)
@@ -0,0 +1,99 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+from unittest import mock
+
+import pytest
+
+from commoncode.testcase import FileBasedTesting
+
+from typecode import magic2
+from typecode.magicdb import compile_magicdb
+from typecode.magicdb import get_magic_files
+from typecode.magicdb import get_report
+from typecode.magicdb import main
+
+
+class TestMagicdb(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def compile_test_magicdb(self, names=("archive", "images")):
+        magdir = self.get_test_loc("magicdb/Magdir")
+        output = os.path.join(self.get_temp_dir(), "trimmed.mgc")
+        return compile_magicdb(get_magic_files(magdir, names), output)
+
+    def test_get_magic_files(self):
+        magdir = self.get_test_loc("magicdb/Magdir")
+        results = get_magic_files(magdir, ["images", "archive"])
+        assert results == [os.path.join(magdir, "archive"), os.path.join(magdir, "images")]
+
+    def test_get_magic_files_with_missing_files(self):
+        magdir = self.get_test_loc("magicdb/Magdir")
+        with pytest.raises(FileNotFoundError, match="foo"):
+            get_magic_files(magdir, ["archive", "foo"])
+
+    def test_compile_magicdb(self):
+        magicdb = self.compile_test_magicdb()
+        detector = magic2.Detector(magic2.DETECT_TYPE, magic_db_location=magicdb)
+        # a compiled database is loaded from the process-wide buffer
+        assert detector.magicdb_buffer is magic2.get_magicdb_buffer(magicdb)
+        assert detector.get_buffer(b"TCARCHIVE and more") == b"typecode test archive data"
+        assert detector.get_buffer(b"TCIMAGE and more") == b"typecode test image data"
+        # these rules were not selected
+        assert detector.get_buffer(b"TCOTHER and more") != b"typecode test other data"
+
+    def test_compile_magicdb_does_not_change_the_current_directory(self):
+        cwd = os.getcwd()
+        self.compile_test_magicdb()
+        assert os.getcwd() == cwd
+
+    def test_compile_magicdb_with_invalid_rules(self):
+        magic_file = os.path.join(self.get_temp_dir(), "invalid")
+        with open(magic_file, "w") as out:
+            out.write("0\tfoo\tbar\tbaz\n")
+        output = os.path.join(self.get_temp_dir(), "invalid.mgc")
+        with pytest.raises(magic2.MagicException):
+            compile_magicdb([magic_file], output)
+        assert not os.path.exists(output)
+
+    def test_get_report(self):
+        magicdb = self.compile_test_magicdb()
+        test_dir = self.get_test_loc("magicdb")
+        report = get_report([test_dir], magicdb)
+        sample = os.path.join(test_dir, "sample.tca")
+        differences = {d["location"]: d for d in report["differences"]}
+        assert report["files"] == 5
+        assert report["same_flags"] < report["files"]
+        assert differences[sample]["trimmed"] == dict(
+            filetype="typecode test archive data",
+            mimetype="application/x-typecode-archive",
+        )
+        assert "has_archive" in differences[sample]["changed_flags"]
+
+    def test_main_compile_and_report(self):
+        magdir = self.get_test_loc("magicdb/Magdir")
+        output = os.path.join(self.get_temp_dir(), "trimmed.mgc")
+        assert main(["compile", magdir, output, "--rules", "other"]) == 0
+        assert os.path.isfile(output)
+        sample = self.get_test_loc("magicdb/sample.tco")
+        assert main(["report", output, sample]) == 1
+
+    def test_trimmed_profile_uses_the_trimmed_magicdb(self):
+        magicdb = self.compile_test_magicdb()
+        with mock.patch.object(magic2, "get_trimmed_magicdb_location", return_value=magicdb):
+            try:
+                magic2.set_profile("trimmed")
+                assert magic2.get_detector().loaded_db_location == magicdb
+                result = magic2.file_type("sample", buf=b"TCIMAGE and more")
+                assert result == "typecode test image data"
+            finally:
+                magic2.set_profile("full")
+        assert magic2.get_detector().loaded_db_location != magicdb
+        assert magic2.file_type("sample", buf=b"TCIMAGE and more") != "typecode test image data"
@@ -0,0 +1,75 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+from unittest import mock
+
+from commoncode.testcase import FileBasedTesting
+
+from typecode import magic2
+from typecode.contenttype import Type
+from typecode.pe import get_pe_info
+from typecode.pe import PeInfo
+
+
+class TestPe(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def test_get_pe_info_exe(self):
+        test_file = self.get_test_loc("filetest/compiled/win/file.exe")
+        info = get_pe_info(test_file)
+        assert info == PeInfo(
+            bits=32,
+            machine=0x14C,
+            characteristics=info.characteristics,
+            subsystem=3,
+            sections_count=5,
+            is_managed=False,
+        )
+        assert info.machine_name == "Intel 80386"
+        assert info.subsystem_name == "console"
+        assert info.is_executable
+        assert not info.is_dll
+
+    def test_get_pe_info_dll(self):
+        test_file = self.get_test_loc("filetest/binary/windows.dll")
+        info = get_pe_info(test_file)
+        assert (info.bits, info.machine_name, info.is_dll, info.sections_count) == (
+            64,
+            "x86-64",
+            True,
+            3,
+        )
+
+    def test_get_pe_info_returns_none_for_non_pe(self):
+        assert get_pe_info(self.get_test_loc("contenttype/code/c/some.c")) is None
+        test_file = os.path.join(self.get_temp_dir(), "dos.exe")
+        with open(test_file, "wb") as f:
+            f.write(b"MZ" + b"\x00" * 62 + b"\x00" * 64)
+        assert get_pe_info(test_file) is None
+
+    def test_type_is_winexe_agrees_with_libmagic(self):
+        for test_file in (
+            "filetest/compiled/win/file.exe",
+            "filetest/compiled/win/zlib1.dll",
+            "filetest/binary/windows.dll",
+            "contenttype/compiled/linux/libssl.so.0.9.7",
+        ):
+            test_file = self.get_test_loc(test_file)
+            filetype = magic2.file_type(test_file).lower()
+            expected = "for ms windows" in filetype or filetype.startswith("pe32")
+            assert Type(test_file).is_winexe == expected
+
+    def test_type_is_winexe_does_not_use_libmagic(self):
+        test_file = self.get_test_loc("filetest/compiled/win/zlib1.dll")
+        with mock.patch.object(magic2, "_detect") as detect:
+            T = Type(test_file)
+            assert T.is_winexe
+            assert T.pe_info.is_dll
+            assert not detect.called
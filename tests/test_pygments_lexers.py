@@ -0,0 +1,160 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import subprocess
+import sys
+from unittest import TestCase
+from unittest import mock
+
+from typecode import pygments_lexers
+from typecode._vendor.pygments import plugin
+from typecode._vendor.pygments.lexer import Lexer
+from typecode._vendor.pygments.util import shebang_matches
+from typecode.pygments_lexers import ANALYSE_TEXT_PREFILTERS
+from typecode.pygments_lexers import ClassNotFound
+from typecode.pygments_lexers import FilenameIndex
+from typecode.pygments_lexers import find_lexer_class_for_filename
+from typecode.pygments_lexers import get_candidate_lexers
+from typecode.pygments_lexers import get_lexer_for_filename
+from typecode.pygments_lexers import get_plugin_lexers
+from typecode.pygments_lexers import get_shebang_interpreter
+from typecode.pygments_lexers import guess_lexer
+from typecode.pygments_lexers import guess_lexer_class
+from typecode.pygments_lexers import guess_lexer_name
+from typecode.pygments_lexers import SHEBANG_LEXERS
+from typecode.pygments_lexers_metadata import LEXERS_METADATA
+
+
+class TestPygmentsLexers(TestCase):
+    def tearDown(self):
+        pygments_lexers.clear_filename_index()
+
+    def test_FilenameIndex_classifies_patterns(self):
+        index = FilenameIndex(
+            [
+                ("make", "Makefile"),
+                ("c", "*.c"),
+                ("tgz", "*.tar.gz"),
+                ("php", "*.php[345]"),
+                ("bash", ".bash_*"),
+            ]
+        )
+        assert sorted(index.exact) == ["Makefile"]
+        assert sorted(index.suffixes) == [".c", ".tar.gz"]
+        assert [pattern for _, _, pattern in index.globs] == ["*.php[345]", ".bash_*"]
+
+    def test_FilenameIndex_get_matches(self):
+        index = FilenameIndex(
+            [
+                ("gz", "*.gz"),
+                ("tgz", "*.tar.gz"),
+                ("php", "*.php[345]"),
+                ("bash", ".bash_*"),
+                ("c", "*.c"),
+            ]
+        )
+        assert [lexer for _, lexer, _ in index.get_matches("a.tar.gz")] == ["gz", "tgz"]
+        assert [lexer for _, lexer, _ in index.get_matches("a.php5")] == ["php"]
+        assert [lexer for _, lexer, _ in index.get_matches(".bash_profile")] == ["bash"]
+        assert [lexer for _, lexer, _ in index.get_matches(".c")] == ["c"]
+        assert index.get_matches("a.C") == []
+        assert index.get_matches("c") == []
+
+    def test_find_lexer_class_for_filename(self):
+        assert find_lexer_class_for_filename("/some/dir/foo.c").__name__ == "CLexer"
+        assert find_lexer_class_for_filename("CMakeLists.txt").__name__ == "CMakeLexer"
+        assert find_lexer_class_for_filename("foo.php4").__name__ == "PhpLexer"
+        assert find_lexer_class_for_filename("foo.unknown") is None
+        assert get_lexer_for_filename("foo.py").name == "Python"
+
+    def test_find_lexer_class_for_filename_snapshots_plugins_once(self):
+        pygments_lexers.clear_filename_index()
+        with mock.patch.object(plugin, "iter_entry_points", return_value=[]) as plugins:
+            assert find_lexer_class_for_filename("foo.java").__name__ == "JavaLexer"
+            assert find_lexer_class_for_filename("foo.unknown") is None
+            assert find_lexer_class_for_filename("foo.unknown") is None
+            assert plugins.call_count == 1
+
+    def test_guess_lexer_class(self):
+        assert guess_lexer_class("#!/usr/bin/env python\n").__name__ == "PythonLexer"
+        assert guess_lexer_class(b"#!/bin/bash\n").__name__ == "BashLexer"
+        assert guess_lexer_class("# vim: set ft=ruby :\n").__name__ == "RubyLexer"
+        assert guess_lexer("#!/usr/bin/env python\n").name == "Python"
+
+    def test_lexers_metadata_is_in_sync_with_lexers(self):
+        assert set(LEXERS_METADATA) == set(pygments_lexers.LEXERS)
+        for name, (priority, has_analyse_text) in LEXERS_METADATA.items():
+            lexer = getattr(pygments_lexers, name)
+            assert lexer.priority == priority
+            assert (lexer.analyse_text is not Lexer.analyse_text) == has_analyse_text
+
+    def test_analyse_text_prefilters_cover_all_lexers_with_analyse_text(self):
+        with_analyse_text = {name for name, (_, has) in LEXERS_METADATA.items() if has}
+        assert with_analyse_text == set(ANALYSE_TEXT_PREFILTERS)
+        assert set(SHEBANG_LEXERS).issubset(with_analyse_text)
+
+    def test_shebang_lexers_rate_like_their_analyse_text(self):
+        texts = [
+            "#!/usr/bin/env python3\n",
+            "#!/usr/bin/python2.7\n",
+            "#!/usr/bin/ruby1.9\n",
+            "#!/usr/bin/tclsh\n",
+            "#!/opt/bin/groovy -x\n",
+            "#!C:\\Python3.8\\python.exe\n",
+            "import os\n",
+        ]
+        for name, regex in SHEBANG_LEXERS.items():
+            lexer = getattr(pygments_lexers, name)
+            for text in texts:
+                expected = lexer.analyse_text(text)
+                assert (shebang_matches(text, regex) and 1.0 or 0.0) == expected
+
+    def test_detection_by_name_does_not_load_lexer_modules(self):
+        code = (
+            "import sys\n"
+            "from typecode.pygments_lexers import find_lexer_name_for_filename\n"
+            "from typecode.pygments_lexers import guess_lexer_name\n"
+            "names = (\n"
+            "    find_lexer_name_for_filename('foo.py'),\n"
+            "    find_lexer_name_for_filename('foo.php'),\n"
+            "    guess_lexer_name('#!/usr/bin/env python\\n'),\n"
+            ")\n"
+            "loaded = [m for m in sys.modules if m.startswith('typecode._vendor.pygments.lexers')]\n"
+            "print(names, loaded)\n"
+        )
+        output = subprocess.check_output([sys.executable, "-c", code], stderr=subprocess.DEVNULL)
+        assert output.decode("utf-8").strip() == "('Python', 'PHP', 'Python') []"
+
+    def test_get_shebang_interpreter(self):
+        assert get_shebang_interpreter("#!/usr/bin/env python3\nimport os") == "python3"
+        assert get_shebang_interpreter("#!/bin/sh -e\n") == "sh"
+        assert get_shebang_interpreter("#!\n") == ""
+        assert get_shebang_interpreter("import os") == ""
+
+    def test_get_candidate_lexers(self):
+        plugins = get_plugin_lexers()
+
+        def candidates(text):
+            return [lexer for lexer in get_candidate_lexers(text) if lexer not in plugins]
+
+        assert candidates("#!/usr/bin/python\nprint(1)\n") == ["PythonLexer"]
+        assert candidates("#!/bin/bash\necho 1\n") == ["BashLexer"]
+        assert candidates("some plain text\n") == []
+        assert candidates("#ifdef FOO\n") == ["CLexer"]
+
+    def test_guess_lexer_class_memoizes_results(self):
+        pygments_lexers.clear_filename_index()
+        guess_by_digest = pygments_lexers._guess_lexer_by_digest
+        assert guess_lexer_class("#!/usr/bin/env ruby\n").__name__ == "RubyLexer"
+        for _ in range(2):
+            with self.assertRaises(ClassNotFound):
+                guess_lexer_class("some plain text\n")
+        cache_info = guess_by_digest.cache_info()
+        assert (cache_info.hits, cache_info.currsize) == (1, 2)
+        assert guess_lexer_name("#!/usr/bin/env ruby\n") == "Ruby"
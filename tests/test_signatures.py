@@ -0,0 +1,79 @@
+#
+# Copyright (c) nexB Inc. and others. All rights reserved.
+# ScanCode is a trademark of nexB Inc.
+# SPDX-License-Identifier: Apache-2.0
+# See http://www.apache.org/licenses/LICENSE-2.0 for the license text.
+# See https://github.com/aboutcode-org/typecode for support or download.
+# See https://aboutcode.org for more information about nexB OSS projects.
+#
+
+import os
+from unittest import mock
+
+from commoncode.testcase import FileBasedTesting
+
+from typecode import contenttype
+from typecode import magic2
+from typecode.contenttype import Type
+from typecode.contenttype import read_file_start
+from typecode.signatures import get_png_sample
+from typecode.signatures import get_signature_types
+from typecode.signatures import get_verified_signatures
+from typecode.signatures import SIGNATURES
+
+
+class TestSignatures(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(__file__), "data")
+
+    def test_get_signature_types(self):
+        assert get_signature_types(get_png_sample(640, 480, 8, 6, 0), SIGNATURES) == (
+            "PNG image data, 640 x 480, 8-bit/color RGBA, non-interlaced",
+            "image/png",
+        )
+        assert get_signature_types(b"BZh91AY&SY", SIGNATURES) == (
+            "bzip2 compressed data, block size = 900k",
+            "application/x-bzip2",
+        )
+        assert get_signature_types(b"\xca\xfe\xba\xbe\x00\x00\x00\x32", SIGNATURES) == (
+            "compiled Java class data, version 50.0 (Java 1.6)",
+            "application/x-java-applet",
+        )
+
+    def test_get_signature_types_is_not_confident_on_unexpected_headers(self):
+        # a Mach-O universal binary uses the Java class magic
+        assert not get_signature_types(b"\xca\xfe\xba\xbe\x00\x00\x00\x02", SIGNATURES)
+        assert not get_signature_types(b"GIF88a\x01\x00\x01\x00", SIGNATURES)
+        assert not get_signature_types(b"BZh0", SIGNATURES)
+        assert not get_signature_types(get_png_sample(1, 1, 3, 2, 0), SIGNATURES)
+        assert not get_signature_types(b"\x89PNG", SIGNATURES)
+        assert not get_signature_types(b"", SIGNATURES)
+
+    def test_signatures_samples_agree_with_libmagic(self):
+        for signature in get_verified_signatures():
+            for sample in signature.samples:
+                expected = magic2.file_type("", buf=sample), magic2.mime_type("", buf=sample)
+                assert get_signature_types(sample) == expected
+
+    def test_signatures_agree_with_libmagic_on_test_files(self):
+        test_dir = self.get_test_loc("filetest")
+        matched = 0
+        for top, _, files in os.walk(test_dir):
+            for name in files:
+                location = os.path.join(top, name)
+                if os.path.islink(location):
+                    continue
+                types = get_signature_types(read_file_start(location, 1024))
+                if types:
+                    matched += 1
+                    expected = magic2.file_type(location), magic2.mime_type(location)
+                    assert types == expected, location
+        assert matched
+
+    def test_type_uses_signatures_if_enabled(self):
+        test_file = self.get_test_loc("contenttype/compiled/java/old.class")
+        expected = magic2.file_type(test_file), magic2.mime_type(test_file)
+        with mock.patch.object(contenttype, "USE_SIGNATURES", True):
+            with mock.patch.object(magic2, "_detect") as detect:
+                T = Type(test_file)
+                assert (T.filetype_file, T.mimetype_file) == expected
+                assert not detect.called